@@ -1,5 +1,13 @@
 from .bay import IsolationBay, Bay
-from .patient import Patient, PatientGenerator
+from .patient import Patient, PatientGenerator, Arrivals
 from .ward import Ward
+from .array_ward import ArrayWard
+from .continuous_ward import ContinuousWard
+from .hospital import Hospital
+from .patient_table import PatientTable
+from .batch import BatchSimulation
 from .parameters import Parameters
 from .history import History
+from .random_streams import RandomStreams
+from .profiler import Profiler
+from .snapshot import WardSnapshot
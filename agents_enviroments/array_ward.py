@@ -0,0 +1,272 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List
+import numpy as np
+from .parameters import Parameters
+from .patient_table import NONE, BayView, PatientTable, PatientView
+from .random_streams import RandomStreams
+from .ward import Ward, bay_hazard
+
+if TYPE_CHECKING:
+    from .patient import Patient
+    from .bay import Bay
+
+
+class ArrayWard(Ward):
+
+    def __init__(self, bays: List[Bay], params: Parameters, streams: RandomStreams = None):
+        """Ward backed by a columnar PatientTable.
+
+        Daily phases run as array operations over the table. `bays` and
+        `patients` are exposed as BayView/PatientView objects so movement
+        strategies written for `Ward` keep working. Admitted `Patient` objects
+        are copied into the table, the daily event attributes (`new_patients`,
+        `new_infections`, ...) hold patient ids. Transmission always uses the
+        hazard mode.
+
+        Parameters
+        ----------
+        bays : List[Bay]
+            Bays (and isolation bays) of the ward, in admission order. Only
+            their layout is read, they are not attached to the ward and can
+            be reused by another one
+        params : Parameters
+            Model parameters
+        streams : RandomStreams, optional
+            Random streams of the run, see `Ward`
+        """
+        super().__init__([], params, transmission_mode="hazard", streams=streams)
+        self.bay_capacity = np.array([bay.capacity for bay in bays])
+        self.bay_is_iso = np.array([bay.is_isobay for bay in bays], dtype=bool)
+        self.bay_count = np.zeros(len(bays), dtype=np.int64)
+        self.bay_slots: List[List[int]] = [[] for _ in bays]
+        self.table = PatientTable(int(self.bay_capacity.sum()))
+        self.bays: List[BayView] = [BayView(self, i, bay)
+                                    for i, bay in enumerate(bays)]
+        # Cache the layout of the views instead of the template bays
+        self.index_bays()
+        self.new_patients = np.array([], dtype=np.int64)
+        self.new_infections = np.array([], dtype=np.int64)
+        self.screened_patients = np.array([], dtype=np.int64)
+        self.new_detected_patients = np.array([], dtype=np.int64)
+        self.patients_removed = np.array([], dtype=np.int64)
+        self.healed_patients = np.array([], dtype=np.int64)
+
+    def attach(self, slot: int, bay: int):
+        """Place the patient of a slot inside a bay"""
+        slot, bay = int(slot), int(bay)
+        self.table.bay[slot] = bay
+        self.bay_slots[bay].append(slot)
+        self.bay_count[bay] += 1
+
+    def detach(self, slot: int):
+        """Take the patient of a slot out of its bay, the slot stays occupied"""
+        bay = self.table.bay[slot]
+        self.bay_slots[bay].remove(slot)
+        self.bay_count[bay] -= 1
+        self.table.bay[slot] = NONE
+
+    def discharge(self, mask: np.ndarray) -> np.ndarray:
+        """Remove the patients of the masked slots from the ward and return their ids"""
+        slots = np.flatnonzero(mask)
+        for slot in slots:
+            self.detach(slot)
+        self.table.remove(slots)
+        return self.table.id[slots]
+
+    def _views(self, mask: np.ndarray) -> List[PatientView]:
+        """Views of the masked slots in bay order"""
+        return [PatientView(self, slot) for slots in self.bay_slots for slot in slots if mask[slot]]
+
+    @property
+    def suc_patients(self) -> List[PatientView]:
+        """Suceptible patients inside bays in ward"""
+        return self._views(self.table.colonisation == 0)
+
+    @property
+    def col_patients(self) -> List[PatientView]:
+        """Colonized patients inside bays in ward"""
+        return self._views(self.table.colonisation == 1)
+
+    @property
+    def detected_patients(self) -> List[PatientView]:
+        """Colonized patients inside bays in ward (detected)"""
+        return self._views(self.table.detection == 1)
+
+    @property
+    def patients(self) -> List[PatientView]:
+        return self._views(self.table.in_ward)
+
+    def free_isobays(self) -> List[BayView]:
+        """Isolation bays with a free bed, in ward order"""
+        free = self.bay_is_iso & (self.bay_count < self.bay_capacity)
+        return [self.bays[index] for index in np.flatnonzero(free)]
+
+    def isolation_candidates(self, limit: int = None) -> List[PatientView]:
+        """Patients outside isolation with a detection status, see `Ward.isolation_candidates`"""
+        table = self.table
+        in_ward = table.in_ward
+        outside = in_ward & ~self.bay_is_iso[np.where(in_ward, table.bay, 0)]
+        return self._views(outside & (table.detection != 0))[:limit]
+
+    @property
+    def capacity(self):
+        """Total ward capacity"""
+        return int(self.bay_capacity.sum())
+
+    @property
+    def total_patients(self) -> int:
+        """Total patients inside bays in ward"""
+        return int(self.bay_count.sum())
+
+    @property
+    def total_col_patients(self) -> int:
+        """Total colonized patients inside bays in ward"""
+        table = self.table
+        return int(table.colonisation[table.in_ward].sum())
+
+    def admit_patient(self, patient: Patient):
+        """Copy a patient into the first available bay, see `Ward.admit_patient`
+
+        Returns
+        -------
+        PatientView
+            view of the admited patient or None if all bays are full
+        """
+        for bay in np.flatnonzero(self.bay_count < self.bay_capacity):
+            if self.bay_is_iso[bay]:
+                prob = self.params.isolation_prob
+                # Isolation bay probability
+                if self.streams.admission.next() >= prob:
+                    continue
+            slot = self.table.add(patient, bay)
+            self.attach(slot, bay)
+            if patient.colonisation_status:
+                self.primary_cases += 1
+            return PatientView(self, slot)
+        return None
+
+    def admit_patients(self, patients: List[Patient]) -> int:
+        """Same as admit_patient but takes an array and updates history
+
+        Parameters
+        ----------
+        patients : [Patients]
+            list of patients
+        returns:
+            number of patient not admited
+        """
+        # Free beds in admission order, the patients placed before the first
+        # free isolation bed need no isolation draw and are copied at once
+        free_beds = np.repeat(np.arange(len(self.bays)),
+                              self.bay_capacity - self.bay_count)
+        free_beds = free_beds[:len(patients)]
+        isolation = self.bay_is_iso[free_beds]
+        direct = int(np.argmax(isolation)) if isolation.any() else len(
+            free_beds)
+        slots = self.table.add_patients(patients[:direct], free_beds[:direct])
+        for slot, bay in zip(slots, free_beds[:direct]):
+            self.attach(slot, bay)
+        self.primary_cases += int(self.table.colonisation[slots].sum())
+        patients_admited = self.table.id[slots].tolist()
+        for patient in patients[direct:]:
+            patient_admited = self.admit_patient(patient)
+            if patient_admited:
+                patients_admited.append(patient_admited.id)
+        self.new_patients = np.array(patients_admited, dtype=np.int64)
+        return len(patients) - len(patients_admited)
+
+    def remove_patients(self) -> np.ndarray:
+        """Discharge/remove patients when length of stay is met
+        """
+        table = self.table
+        # Slots left outside a bay by a movement strategy are released
+        self.table.remove(np.flatnonzero(table.occupied & ~table.in_ward))
+        remaining_stay = np.trunc(table.length_stay - table.time)
+        self.patients_removed = self.discharge(
+            table.in_ward & (remaining_stay == 0))
+        return self.patients_removed
+
+    def generate_transmission(self):
+        """Generate new infections with the hazard mode, see `Ward.hazard_transmission`"""
+        table = self.table
+        in_ward = table.in_ward
+        num_of_bays = len(self.bays)
+        colonised = in_ward & (table.colonisation == 1)
+        detected = np.bincount(table.bay[colonised & (table.decolonisation == 1)],
+                               minlength=num_of_bays)
+        undetected = np.bincount(table.bay[colonised & (table.decolonisation != 1)],
+                                 minlength=num_of_bays)
+        suc_slots = np.flatnonzero(in_ward & (table.colonisation == 0))
+        hazard = bay_hazard(self.params, self.bay_count, undetected,
+                            detected, self.total_patients)
+        infect_prob = 1 - np.exp(-hazard[table.bay[suc_slots]])
+        infected = suc_slots[self.streams.transmission.take(
+            len(suc_slots)) < infect_prob]
+        table.colonisation[infected] = 1
+        self.new_infections = table.id[infected]
+        self.secondary_cases += len(infected)
+        return
+
+    def generate_treatment(self, discharge_healed=True):
+        """Generate treatment for each patient and remove if patient is healed"""
+        table = self.table
+        on_treatment = table.in_ward & (table.detection == 1)
+        start = on_treatment & (table.treatment_time == NONE)
+        due = np.flatnonzero(on_treatment & (table.treatment_time == 0))
+        table.treatment_time[on_treatment & (table.treatment_time > 0)] -= 1
+        table.treatment_time[start] = 5
+        healed = due[self.streams.treatment.take(
+            len(due)) < self.params.treatment_prob]
+        table.colonisation[healed] = 0
+        table.detection[healed] = 0
+        table.decolonisation[healed] = 0
+        healed_mask = np.zeros(table.size, dtype=bool)
+        healed_mask[healed] = True
+        if discharge_healed:
+            self.healed_patients = self.discharge(healed_mask)
+        else:
+            self.healed_patients = table.id[healed]
+
+    def screen_patients(self):
+        """Screen each patient in ward is patient is not screened yet
+        This might change the patient detection status
+         """
+        table = self.table
+        result_length = self.params.result_length
+        screen_interval = self.params.screen_interval
+        screened = table.in_ward & (table.detection == 0) & \
+            (table.time % screen_interval == 1)
+        table.result_time[screened] = table.time[screened] + result_length
+        table.detection[screened] = 2
+        table.hidden_detection[screened] = table.colonisation[screened]
+        self.screened_patients = table.id[screened]
+
+    def get_patient_results(self):
+        """Get the result if available.
+        This might change the patient detection status
+         """
+        table = self.table
+        ready = table.in_ward & (table.detection == 2) & \
+            (table.result_time == table.time)
+        table.detection[ready] = table.hidden_detection[ready]
+        table.result_time[ready] = NONE
+        table.hidden_detection[ready] = NONE
+        detected = ready & (table.detection == 1)
+        table.colonisation[detected] = 1
+        table.decolonisation[detected] = 1
+        self.new_detected_patients = table.id[detected]
+
+    def forward_time(self):
+        """Forward all patient time"""
+        self.time += 1
+        self.table.time[self.table.in_ward] += 1
+
+    def occupancy_stats(self):
+        """Show current patients capacity"""
+        stats = {}
+        for i, bay in enumerate(self.bays):
+            bay_key = "Bay-{}".format(i + 1)
+            stats.update(
+                {bay_key: {"Patients": int(self.bay_count[i]), "Capacity": bay.capacity}})
+        stats.update({"Total": self.total_patients, "Capacity": self.capacity})
+        return stats
@@ -0,0 +1,241 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List
+import numpy as np
+from .parameters import Parameters
+from .patient_table import NONE, _to_column
+from .random_streams import RandomStreams
+from .ward import bay_hazard
+
+if TYPE_CHECKING:
+    from .bay import Bay
+    from .patient import Patient
+    from .movement_strategy import MovementStrategy
+
+RESULT_DTYPE = np.dtype([
+    ("primary_cases", np.int64),
+    ("secondary_cases", np.int64),
+    ("total_screens", np.int64),
+    ("total_detection", np.int64),
+    ("total_healed", np.int64),
+])
+
+# Patient state columns, each of shape (replicates, beds)
+COLUMNS = ("colonisation", "detection", "decolonisation", "hidden_detection",
+           "time", "length_stay", "result_time", "treatment_time")
+
+
+class BatchSimulation:
+
+    def __init__(self, bays: List[Bay], params: Parameters, strategies: List[MovementStrategy] = None,
+                 replicates: int = 100, seed=None):
+        """Run several replicates of one ward configuration in lockstep.
+
+        Ward state is stored as (replicate x bed) arrays, every bed belongs
+        to one bay and beds are laid out in bay order. Each replicate follows
+        the same daily phases as `Ward` (transmission uses the hazard mode)
+        and draws from its own RandomStreams.
+
+        Parameters
+        ----------
+        bays : List[Bay]
+            Bays (and isolation bays) used as the ward layout, in admission order
+        params : Parameters
+            Model parameters
+        strategies : List[MovementStrategy], optional
+            Movement strategies applied each day, they must implement
+            `move_patients_batch` (TypeError otherwise), by default None
+        replicates : int, optional
+            Number of replicates, by default 100
+        seed : int, SeedSequence or list, optional
+            Seed spawned into one stream per replicate, or a list with one
+            seed per replicate (which then sets the number of replicates)
+        """
+        if isinstance(seed, (list, tuple, np.ndarray)):
+            self.streams = [RandomStreams(s) for s in seed]
+        else:
+            if not isinstance(seed, np.random.SeedSequence):
+                seed = np.random.SeedSequence(seed)
+            self.streams = [RandomStreams(s)
+                            for s in seed.spawn(replicates)]
+        self.replicates = len(self.streams)
+        self.params = params
+        self.strategies = strategies or []
+        for strategy in self.strategies:
+            if not hasattr(strategy, "move_patients_batch"):
+                raise TypeError(f"{strategy} has no batched implementation")
+        self.bay_capacity = np.array([bay.capacity for bay in bays])
+        self.bay_is_iso = np.array([bay.is_isobay for bay in bays], dtype=bool)
+        self.bed_bay = np.repeat(np.arange(len(bays)), self.bay_capacity)
+        self.bed_is_iso = self.bay_is_iso[self.bed_bay]
+        # One hot (beds x bays) matrix to count patients per bay
+        self.bed_onehot = np.eye(len(bays), dtype=np.int64)[self.bed_bay]
+        self.reset()
+
+    @property
+    def num_of_beds(self):
+        return len(self.bed_bay)
+
+    def reset(self):
+        """Empty every replicate ward"""
+        shape = (self.replicates, self.num_of_beds)
+        self.occupied = np.zeros(shape, dtype=bool)
+        self.colonisation = np.zeros(shape, dtype=np.int8)
+        self.detection = np.zeros(shape, dtype=np.int8)
+        self.decolonisation = np.zeros(shape, dtype=np.int8)
+        self.hidden_detection = np.full(shape, NONE, dtype=np.int8)
+        self.time = np.zeros(shape, dtype=np.int64)
+        self.length_stay = np.zeros(shape, dtype=float)
+        self.result_time = np.full(shape, NONE, dtype=np.int64)
+        self.treatment_time = np.full(shape, NONE, dtype=np.int64)
+        self.results = np.zeros(self.replicates, dtype=RESULT_DTYPE)
+        self.day = 0
+
+    def bay_counts(self, mask: np.ndarray) -> np.ndarray:
+        """Count masked beds in each bay, shape (replicates, bays)"""
+        return mask.astype(np.int64) @ self.bed_onehot
+
+    def move(self, rows, src, dst):
+        """Move patients from beds `src` to empty beds `dst` of the same rows"""
+        for column in COLUMNS:
+            values = getattr(self, column)
+            values[rows, dst] = values[rows, src]
+        self.occupied[rows, src] = False
+        self.occupied[rows, dst] = True
+
+    def swap(self, row, bed, other_bed):
+        """Swap the patients of two beds of one replicate"""
+        for column in COLUMNS:
+            values = getattr(self, column)
+            values[row, [bed, other_bed]] = values[row, [other_bed, bed]]
+
+    def draw(self, stream: str, size: int) -> np.ndarray:
+        """Take uniforms from one stream of each replicate, shape (replicates, size)"""
+        return np.stack([getattr(streams, stream).take(size) for streams in self.streams])
+
+    def run(self, patient_sequence: List[List[Patient]]) -> np.ndarray:
+        """Simulate every replicate over the same sequence of admissions
+
+        Parameters
+        ----------
+        patient_sequence : List[List[Patient]]
+            Patients arriving each day, the patients are only read
+
+        Returns
+        -------
+        ndarray
+            Structured array (RESULT_DTYPE) with one row per replicate
+        """
+        for patients in patient_sequence:
+            self.step(patients)
+        return self.results
+
+    def step(self, patients: List[Patient]):
+        """Simulate one day of every replicate"""
+        num_of_iso = int(self.bay_is_iso.sum())
+        admission_u = self.draw("admission", len(patients) * num_of_iso).reshape(
+            self.replicates, len(patients), num_of_iso)
+        transmission_u = self.draw("transmission", self.num_of_beds)
+        treatment_u = self.draw("treatment", self.num_of_beds)
+
+        self.remove_patients()
+        self.screen_patients()
+        self.get_patient_results()
+        self.admit_patients(patients, admission_u)
+        self.generate_transmission(transmission_u)
+        self.generate_treatment(treatment_u)
+        for strategy in self.strategies:
+            strategy.move_patients_batch(self)
+        self.time[self.occupied] += 1
+        self.day += 1
+
+    def remove_patients(self):
+        """Discharge patients when length of stay is met"""
+        remaining_stay = np.trunc(self.length_stay - self.time)
+        self.occupied &= remaining_stay != 0
+
+    def screen_patients(self):
+        """Screen patients due for screening, see `Patient.screen_test`"""
+        result_length = self.params.result_length
+        screen_interval = self.params.screen_interval
+        screened = self.occupied & (self.detection == 0) & \
+            (self.time % screen_interval == 1)
+        self.result_time[screened] = self.time[screened] + result_length
+        self.detection[screened] = 2
+        self.hidden_detection[screened] = self.colonisation[screened]
+        self.results["total_screens"] += screened.sum(axis=1)
+
+    def get_patient_results(self):
+        """Return screening results that are due, see `Patient.get_result`"""
+        ready = self.occupied & (self.detection == 2) & \
+            (self.result_time == self.time)
+        self.detection[ready] = self.hidden_detection[ready]
+        self.result_time[ready] = NONE
+        self.hidden_detection[ready] = NONE
+        detected = ready & (self.detection == 1)
+        self.colonisation[detected] = 1
+        self.decolonisation[detected] = 1
+        self.results["total_detection"] += detected.sum(axis=1)
+
+    def admit_patients(self, patients: List[Patient], admission_u: np.ndarray):
+        """Admit the same patients into every replicate, see `Ward.admit_patient`
+
+        Parameters
+        ----------
+        patients : List[Patient]
+            patients arriving today
+        admission_u : ndarray
+            uniforms of shape (replicates, patients, isolation bays) for the
+            isolation bay draws
+        """
+        rows = np.arange(self.replicates)
+        free = self.bay_capacity - self.bay_counts(self.occupied)
+        for i, patient in enumerate(patients):
+            available = free > 0
+            # Isolation bays only take the patient with isolation_prob
+            available[:, self.bay_is_iso] &= admission_u[:, i,
+                                                         :] < self.params.isolation_prob
+            admited = available.any(axis=1)
+            bay = np.argmax(available, axis=1)
+            empty = ~self.occupied & (self.bed_bay == bay[:, None])
+            bed = np.argmax(empty, axis=1)
+            row, bed, bay = rows[admited], bed[admited], bay[admited]
+            self.occupied[row, bed] = True
+            self.colonisation[row, bed] = patient.colonisation_status
+            self.detection[row, bed] = patient.detection_status
+            self.decolonisation[row, bed] = patient.decolonisation_status
+            self.hidden_detection[row, bed] = _to_column(patient.hidden_detection_status)
+            self.time[row, bed] = patient.time
+            self.length_stay[row, bed] = patient.length_stay
+            self.result_time[row, bed] = _to_column(patient.result_time)
+            self.treatment_time[row, bed] = _to_column(patient.treatment_time)
+            free[row, bay] -= 1
+            if patient.colonisation_status:
+                self.results["primary_cases"][row] += 1
+
+    def generate_transmission(self, transmission_u: np.ndarray):
+        """Generate new infections with the hazard mode, see `Ward.hazard_transmission`"""
+        colonised = self.occupied & (self.colonisation == 1)
+        n_bay = self.bay_counts(self.occupied)
+        detected = self.bay_counts(colonised & (self.decolonisation == 1))
+        undetected = self.bay_counts(colonised & (self.decolonisation != 1))
+        hazard = bay_hazard(self.params, n_bay, undetected,
+                            detected, n_bay.sum(axis=1))
+        infect_prob = 1 - np.exp(-hazard[:, self.bed_bay])
+        infected = self.occupied & (self.colonisation == 0) & \
+            (transmission_u < infect_prob)
+        self.colonisation[infected] = 1
+        self.results["secondary_cases"] += infected.sum(axis=1)
+
+    def generate_treatment(self, treatment_u: np.ndarray):
+        """Treat detected patients and discharge the healed, see `Patient.give_treatment`"""
+        on_treatment = self.occupied & (self.detection == 1)
+        start = on_treatment & (self.treatment_time == NONE)
+        due = on_treatment & (self.treatment_time == 0)
+        self.treatment_time[on_treatment & (self.treatment_time > 0)] -= 1
+        self.treatment_time[start] = 5
+        healed = due & (treatment_u < self.params.treatment_prob)
+        self.colonisation[healed] = 0
+        self.detection[healed] = 0
+        self.decolonisation[healed] = 0
+        self.occupied &= ~healed
+        self.results["total_healed"] += healed.sum(axis=1)
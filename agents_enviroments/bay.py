@@ -1,7 +1,8 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Dict, List
 if TYPE_CHECKING:
     from .patient import Patient
+    from .ward import Ward
 
 
 class Bay:
@@ -12,6 +13,13 @@ class Bay:
         self.id = Bay.num_of_bays
         self.capacity = capacity
         self.patients: List[Patient] = []
+        # Patients by id and status counters, kept up to date on add/remove
+        # and by the Patient status attributes
+        self.index: Dict[int, Patient] = {}
+        self.num_of_detected = 0
+        self.num_of_colonised = 0
+        self.num_of_decolonising = 0
+        self.ward: Ward = None
 
     def __repr__(self) -> dict:
         return f"Bay<{self.id}>,\
@@ -19,6 +27,13 @@ class Bay:
                 num_of_detected<{self.num_of_detected}>\n\
                 num_of_patients: {self.num_of_patients}"
 
+    def __getstate__(self):
+        # Copies of a bay do not report to the ward, Ward.__setstate__
+        # registers the bays of a copied ward again
+        state = self.__dict__.copy()
+        state["ward"] = None
+        return state
+
     @property
     def num_of_patients(self):
         """Number of patients inside bay"""
@@ -49,19 +64,57 @@ class Bay:
                 undetected_patients.append(patient)
         return undetected_patients
 
-    @property
-    def num_of_detected(self):
-        return len(self.detected)
-
     @property
     def num_of_undetected(self):
-        return len(self.undetected)
+        return len(self.patients) - self.num_of_detected
 
-    def get_patient(self, id):
-        for patient in self.patients:
-            if patient.id == id:
+    def last_patient(self, detected: bool) -> Patient:
+        """Most recently added patient that is detected (or undetected)"""
+        for patient in reversed(self.patients):
+            if (patient.detection_status == 1) == detected:
                 return patient
-        raise Exception(f"Patient with id {id} not found")
+        return None
+
+    def _count(self, patient: Patient, sign: int):
+        """Add (sign=1) or remove (sign=-1) a patient from the counters"""
+        colonised = patient.colonisation_status == 1
+        self.num_of_detected += sign * (patient.detection_status == 1)
+        self.num_of_colonised += sign * colonised
+        self.num_of_decolonising += sign * \
+            (colonised and patient.decolonisation_status == 1)
+        ward = self.ward
+        if ward is not None:
+            ward.count_patient(patient, sign)
+
+    def update_patient(self, patient: Patient, attr: str, value):
+        """Change a status attribute of a patient and update the counters"""
+        if self.index.get(patient.id) is not patient:
+            # The patient has left this bay
+            patient.__dict__[attr] = value
+            return
+        self._count(patient, -1)
+        patient.__dict__[attr] = value
+        self._count(patient, 1)
+
+    def check_counters(self):
+        """Recount every counter from the patients list and raise on mismatch"""
+        expected = {
+            "index": {patient.id: patient for patient in self.patients},
+            "num_of_detected": sum(patient.detection_status == 1 for patient in self.patients),
+            "num_of_colonised": sum(patient.colonisation_status == 1 for patient in self.patients),
+            "num_of_decolonising": sum(patient.colonisation_status == 1 and patient.decolonisation_status == 1
+                                       for patient in self.patients),
+        }
+        for name, value in expected.items():
+            if getattr(self, name) != value:
+                raise Exception(
+                    f"Bay {self.id} counter {name} is {getattr(self, name)}, recount gives {value}")
+
+    def get_patient(self, id):
+        try:
+            return self.index[id]
+        except KeyError:
+            raise Exception(f"Patient with id {id} not found")
 
     def add_patient(self, patient):
         from .patient import Patient
@@ -72,13 +125,23 @@ class Bay:
                 "Bay is at full capacity cannot add more patients !")
         patient.set_location(self)
         self.patients.append(patient)
+        self.index[patient.id] = patient
+        self._count(patient, 1)
+        if self.ward is not None:
+            self.ward.patient_added(patient)
         return
 
-    def remove_patient(self, patient):
+    def remove_patient(self, patient, moving=False):
+        """Remove a patient, who leaves the ward unless `moving` to another
+        bay of it"""
         from .patient import Patient
         if not isinstance(patient, Patient):
             raise TypeError(f"{type(patient)} is not of Patient Type")
         self.patients.remove(patient)
+        del self.index[patient.id]
+        self._count(patient, -1)
+        if self.ward is not None:
+            self.ward.patient_removed(patient, moving)
         return
 
     def remove_patient_id(self, patient_id) -> Patient:
@@ -89,11 +152,9 @@ class Bay:
         patient_id : int
             Patient id to remove
         """
-        for patient in self.patients:
-            if patient.id == patient_id:
-                self.patients.remove(patient)
-                return patient
-        raise Exception(f"Patient with id {patient_id} not found")
+        patient = self.get_patient(patient_id)
+        self.remove_patient(patient)
+        return patient
 
 
 class IsolationBay(Bay):
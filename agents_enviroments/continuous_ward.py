@@ -0,0 +1,316 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List
+import heapq
+import math
+import numpy as np
+from .history import DayRecord, History
+from .parameters import Parameters
+from .random_streams import RandomStreams
+from .sum_tree import SumTree
+from .ward import Ward, bay_hazard
+
+if TYPE_CHECKING:
+    from .bay import Bay
+    from .patient import Patient, Arrivals
+    from .movement_strategy import MovementStrategy
+
+METHODS = ("ssa", "tau")
+# Scheduled events, events due at the same time run in this order
+DISCHARGE, SCREEN, RESULT, HEAL = range(4)
+# Days of treatment before the first chance of healing, see Patient.give_treatment
+TREATMENT_DAYS = 5
+
+
+class ContinuousWard(Ward):
+
+    def __init__(self, bays: List[Bay], params: Parameters, method: str = "ssa",
+                 tau_tol: float = 0.03, streams: RandomStreams = None):
+        """Ward simulated in continuous time.
+
+        A suceptible patient in bay b is colonised at rate bay_hazard, the
+        daily model uses the same rate as 1 - exp(-hazard) per day. The
+        within bay part of the rate is kept per bay in a SumTree and the
+        ward part is shared by every suceptible patient, so the next
+        infection is picked in O(log B). Other changes are scheduled events:
+
+        - discharge at admission + length of stay
+        - screenings and results on the same days as `Ward`
+        - healing TREATMENT_DAYS after detection plus an exponential time
+          with daily probability treatment_prob, so the chance of still
+          being colonised after each whole day matches the daily draws
+
+        Admissions and movement strategies happen at the start of each day
+        and `run` records the usual History columns binned by day.
+
+        Parameters
+        ----------
+        bays : List[Bay]
+            Bays (and isolation bays) of the ward, in admission order
+        params : Parameters
+            Model parameters
+        method : str, optional
+            "ssa" for the exact stochastic simulation algorithm or "tau" for
+            adaptive tau-leaping, by default "ssa"
+        tau_tol : float, optional
+            Tau-leaping tolerance, the relative change of the suceptible
+            count of a bay allowed in one leap (larger is faster and less
+            accurate), by default 0.03
+        streams : RandomStreams, optional
+            Random streams of the run, see `Ward`
+        """
+        if method not in METHODS:
+            raise ValueError(
+                f"Unknown method {method}, expected one of {METHODS}")
+        self.method = method
+        self.tau_tol = tau_tol
+        self.events = []
+        self.next_event = {}
+        self._sequence = 0
+        self._exact_steps = 0
+        super().__init__(bays, params, transmission_mode="hazard", streams=streams)
+
+    def index_bays(self):
+        num_of_bays = len(self.bays)
+        # Per bay suceptible count, colonised weight and within bay rate
+        self.suceptible = SumTree(num_of_bays)
+        self.weight = SumTree(num_of_bays)
+        self.within = SumTree(num_of_bays)
+        self._dirty = set(range(num_of_bays))
+        super().index_bays()
+
+    def count_patient(self, patient: Patient, sign: int):
+        super().count_patient(patient, sign)
+        self._dirty.add(self.bay_index[id(patient.location)])
+
+    def _refresh(self):
+        """Update the rate trees of the bays changed since the last event"""
+        k = self.params.k
+        for index in self._dirty:
+            bay = self.bays[index]
+            n = bay.num_of_patients
+            detected = bay.num_of_decolonising
+            suceptible = n - bay.num_of_colonised
+            weight = bay.num_of_colonised - detected + k * detected
+            self.suceptible[index] = suceptible
+            self.weight[index] = weight
+            self.within[index] = suceptible * weight / (n - 1) if n > 1 else 0
+        self._dirty.clear()
+
+    def rates(self):
+        """Total within bay and ward wide infection rates"""
+        self._refresh()
+        params = self.params
+        n_ward = self.total_patients
+        within = params.C * params.V * params.m * self.within.total
+        ward = 0
+        if n_ward > 1:
+            ward = params.C * params.V * (1 - params.m) * self.weight.total * \
+                self.suceptible.total / (n_ward - 1)
+        return within, ward
+
+    def _schedule(self, time: float, kind: int, patient: Patient):
+        self._sequence += 1
+        self.next_event[(kind, patient.id)] = time
+        heapq.heappush(self.events, (time, kind, self._sequence, patient))
+
+    def schedule_patient(self, patient: Patient, first_day: int = None):
+        """Schedule the discharge, screenings and pending result of a patient"""
+        if (DISCHARGE, patient.id) in self.next_event:
+            # Moved between bays
+            return
+        if first_day is None:
+            first_day = self.time + 1
+        self._schedule(max(self.time, self.time + patient.length_stay - patient.time),
+                       DISCHARGE, patient)
+        interval = self.params.screen_interval
+        if interval > 1:
+            start = patient.time + first_day - self.time
+            day = start + (1 - start) % interval
+            self._schedule(self.time + day - patient.time, SCREEN, patient)
+        if patient.detection_status == 2 and patient.result_time is not None:
+            result_day = self.time + patient.result_time - patient.time
+            if result_day >= first_day:
+                self._schedule(result_day, RESULT, patient)
+
+    def _start_treatments(self):
+        """Schedule healing of the patients detected since the last call"""
+        treatment_prob = self.params.treatment_prob
+        for patient in self._pending_treatment.values():
+            if patient.detection_status != 1 or not self.has_patient(patient):
+                continue
+            # End of the countdown, see Ward.transfer_patient
+            self._in_treatment[patient.id] = self.time + TREATMENT_DAYS
+            patient.treatment_time = TREATMENT_DAYS
+            if treatment_prob <= 0:
+                continue
+            healing = 0
+            if treatment_prob < 1:
+                u = self.streams.treatment.next()
+                healing = math.log(1 - u) / math.log(1 - treatment_prob)
+            self._schedule(self.time + TREATMENT_DAYS + healing, HEAL, patient)
+        self._pending_treatment = {}
+
+    def _fire_next(self):
+        """Run the next scheduled event"""
+        time, kind, _, patient = heapq.heappop(self.events)
+        if self.next_event.get((kind, patient.id)) != time:
+            # Replaced by a later event
+            return
+        del self.next_event[(kind, patient.id)]
+        if not self.has_patient(patient):
+            return
+        if kind == DISCHARGE:
+            patient.location.remove_patient(patient)
+            self.patients_removed.append(patient)
+        elif kind == SCREEN:
+            screened = patient.screen_test(
+                length=self.params.result_length, interval=self.params.screen_interval)
+            if screened:
+                self.screened_patients.append(screened)
+                self._schedule(time + self.params.result_length,
+                               RESULT, patient)
+            self._schedule(time + self.params.screen_interval, SCREEN, patient)
+        elif kind == RESULT:
+            detected = patient.get_result()
+            if detected:
+                self.new_detected_patients.append(detected)
+        elif kind == HEAL:
+            self._in_treatment.pop(patient.id, None)
+            if patient.detection_status == 1:
+                patient.colonisation_status = 0
+                patient.detection_status = 0
+                patient.decolonisation_status = 0
+                patient.treatment_time = 0
+                self.healed_patients.append(patient)
+                patient.location.remove_patient(patient)
+        self._start_treatments()
+
+    def _colonise(self, patient: Patient):
+        patient.colonisation_status = 1
+        self.new_infections.append(patient)
+        self.secondary_cases += 1
+
+    def _infect_next(self, within: float, ward: float):
+        """Colonise one suceptible patient picked proportionally to their rate"""
+        params = self.params
+        u = self.streams.transmission.next() * (within + ward)
+        if u < within:
+            index = self.within.find(u / (params.C * params.V * params.m))
+        else:
+            index = self.suceptible.find(
+                (u - within) / ward * self.suceptible.total)
+        suceptible = [patient for patient in self.bays[index].patients
+                      if patient.colonisation_status != 1]
+        if suceptible:
+            self._colonise(suceptible[int(
+                self.streams.transmission.next() * len(suceptible))])
+
+    def _leap(self, t_stop: float, total: float) -> bool:
+        """Tau-leaping step, returns False when exact steps are cheaper"""
+        if self._exact_steps > 0:
+            self._exact_steps -= 1
+            return False
+        n_bay = np.array([bay.num_of_patients for bay in self.bays])
+        detected = np.array([bay.num_of_decolonising for bay in self.bays])
+        colonised = np.array([bay.num_of_colonised for bay in self.bays])
+        suceptible = n_bay - colonised
+        hazard = bay_hazard(self.params, n_bay, colonised - detected,
+                            detected, self.total_patients)
+        rates = suceptible * hazard
+        active = rates > 0
+        # Expected infections in a leap change no bay count by more than
+        # tau_tol (and at least one patient)
+        tau = np.min(np.maximum(self.tau_tol *
+                     suceptible[active], 1) / rates[active])
+        if tau < 10 / total:
+            # A leap would hold a few events, take 100 exact steps instead
+            self._exact_steps = 100
+            return False
+        tau = min(tau, t_stop - self.time)
+        if tau <= 0:
+            return False
+        rng = self.streams.transmission.rng
+        counts = np.minimum(rng.poisson(rates * tau), suceptible)
+        self.time += tau
+        for index in np.flatnonzero(counts):
+            patients = [patient for patient in self.bays[index].patients
+                        if patient.colonisation_status != 1]
+            for choice in rng.choice(len(patients), counts[index], replace=False):
+                self._colonise(patients[choice])
+        return True
+
+    def run_until(self, t_end: float):
+        """Run every event before `t_end` and move the clock to `t_end`"""
+        while True:
+            t_next = self.events[0][0] if self.events else math.inf
+            t_stop = min(t_next, t_end)
+            within, ward = self.rates()
+            total = within + ward
+            if self.method == "tau" and total > 0 and self._leap(t_stop, total):
+                continue
+            if total > 0:
+                t = self.time - \
+                    math.log(1 - self.streams.transmission.next()) / total
+                if t < t_stop:
+                    self.time = t
+                    self._infect_next(within, ward)
+                    continue
+            if t_next < t_end:
+                self.time = t_next
+                self._fire_next()
+                continue
+            self.time = t_end
+            return
+
+    def clear_day(self):
+        self.new_patients = []
+        self.new_infections = []
+        self.screened_patients = []
+        self.new_detected_patients = []
+        self.patients_removed = []
+        self.healed_patients = []
+
+    def step(self, arrivals: List[Patient], strategies: List[MovementStrategy] = ()) -> DayRecord:
+        """Simulate one day: events due at its start, admissions and strategies,
+        then every event until the next day
+
+        Returns
+        -------
+        DayRecord
+            Events counted over the day and the ward state at its end
+        """
+        day = self.time
+        self.clear_day()
+        while self.events and self.events[0][0] <= day:
+            self._fire_next()
+        self.admit_patients(arrivals)
+        self._start_treatments()
+        for strategy in strategies:
+            self.move_patients(strategy)
+        self.run_until(day + 1)
+        return self.day_record()
+
+    def run(self, arrivals: Arrivals, strategies: List[MovementStrategy] = None,
+            history: History = None) -> History:
+        """Simulate one day per item of `arrivals`
+
+        Parameters
+        ----------
+        arrivals : Arrivals or List[List[Patient]]
+            Patients arriving each day
+        strategies : List[MovementStrategy], optional
+            Movement strategies applied after each day's admissions
+        history : History, optional
+            History the days are recorded in, by default a new one
+
+        Returns
+        -------
+        History
+            Events counted over each day and the ward state at its end
+        """
+        strategies = strategies or []
+        if history is None:
+            history = History(horizon=len(arrivals))
+        for patients in arrivals:
+            history.add_record(self.step(patients, strategies))
+        return history
@@ -1,57 +1,101 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from numpy import ndarray
+from collections import namedtuple
 import numpy as np
 
+# Keys of Ward.history_dict and the History column they are recorded in
+HISTORY_KEYS = {
+    "new_patients": "new_patients",
+    "colonized": "colonized",
+    "new_infections": "new_infections",
+    "total": "total",
+    "new_detected_patients": "new_detected",
+    "screened_patients": "screened",
+    "healed_patients": "healed",
+    "removed_patients": "removed",
+}
+HISTORY_DTYPE = np.dtype([("time", np.int64)] +
+                         [(column, np.int64) for column in HISTORY_KEYS.values()])
+# One day of history as returned by Ward.step, in column order
+DayRecord = namedtuple("DayRecord", HISTORY_KEYS.values())
+
+
+class _HistoryColumn:
+    """Zero-copy view of the recorded days of one column"""
+
+    def __init__(self, column):
+        self.column = column
+
+    def __get__(self, history: History, owner=None):
+        if history is None:
+            return self
+        return history.data[self.column][:history.current_time]
+
 
-@dataclass(init=True)
 class History:
-    new_patients: ndarray = np.array([])
-    colonized: ndarray = np.array([])
-    new_infections: ndarray = np.array([])
-    total: ndarray = np.array([])
-    new_detected: ndarray = np.array([])
-    screened: ndarray = np.array([])
-    healed: ndarray = np.array([])
-    removed: ndarray = np.array([])
-    current_time: int = 0
-    time = []
-
-    def add(self, key, values: ndarray):
-        if key == "new_patients":
-            self.new_patients = np.append(self.new_patients, values)
-        elif key == "colonized":
-            self.colonized = np.append(self.colonized, values)
-        elif key == "new_infections":
-            self.new_infections = np.append(self.new_infections, values)
-        elif key == "new_detected_patients":
-            self.new_detected = np.append(
-                self.new_detected, values)
-        elif key == "screened_patients":
-            self.screened = np.append(self.screened, values)
-        elif key == "healed_patients":
-            self.healed = np.append(self.healed, values)
-        elif key == "removed_patients":
-            self.removed = np.append(self.removed, values)
-        elif key == "total":
-            self.total = np.append(self.total, values)
-        else:
+    time = _HistoryColumn("time")
+    new_patients = _HistoryColumn("new_patients")
+    colonized = _HistoryColumn("colonized")
+    new_infections = _HistoryColumn("new_infections")
+    total = _HistoryColumn("total")
+    new_detected = _HistoryColumn("new_detected")
+    screened = _HistoryColumn("screened")
+    healed = _HistoryColumn("healed")
+    removed = _HistoryColumn("removed")
+
+    def __init__(self, horizon: int = 64):
+        """Daily ward history stored in one preallocated structured array.
+
+        Parameters
+        ----------
+        horizon : int, optional
+            Number of days to preallocate, the array doubles when more days
+            are recorded, by default 64
+        """
+        self.reset(horizon)
+
+    def reset(self, horizon: int = None):
+        if horizon is None:
+            horizon = len(self.data)
+        self.data = np.zeros(max(horizon, 1), dtype=HISTORY_DTYPE)
+        self.current_time: int = 0
+
+    def _reserve(self):
+        """Make room for the row of the current day"""
+        if self.current_time == len(self.data):
+            data = np.zeros(2 * len(self.data), dtype=HISTORY_DTYPE)
+            data[:self.current_time] = self.data
+            self.data = data
+
+    def add(self, key, values: int):
+        """Set one value of the current day, visible once the day is recorded"""
+        if key not in HISTORY_KEYS:
             raise ValueError(f"Unknown Key {key}")
+        self._reserve()
+        self.data[HISTORY_KEYS[key]][self.current_time] = values
 
     def add_from_dict(self, hist_dict):
-        for key, value in hist_dict.items():
-            self.add(key, value)
-        self.time.append(self.current_time)
+        """Record a day from a Ward.history_dict with a single row write"""
+        for key in hist_dict:
+            if key not in HISTORY_KEYS:
+                raise ValueError(f"Unknown Key {key}")
+        self._reserve()
+        # Keys missing from the dict keep the value set with add
+        row = self.data[self.current_time]
+        self.data[self.current_time] = (self.current_time, *(
+            hist_dict.get(key, row[column]) for key, column in HISTORY_KEYS.items()))
         self.current_time += 1
 
-    def reset(self):
-        self.new_patients: ndarray = np.array([])
-        self.colonized: ndarray = np.array([])
-        self.new_infections: ndarray = np.array([])
-        self.total: ndarray = np.array([])
-        self.new_detected: ndarray = np.array([])
-        self.screened: ndarray = np.array([])
-        self.healed: ndarray = np.array([])
-        self.removed: ndarray = np.array([])
-        self.current_time: int = 0
-        self.time = []
+    def add_record(self, record: DayRecord):
+        """Record a day from a DayRecord (see Ward.step)"""
+        self._reserve()
+        self.data[self.current_time] = (self.current_time, *record)
+        self.current_time += 1
+
+    def to_numpy(self) -> np.ndarray:
+        """Structured array of the recorded days (a view)"""
+        return self.data[:self.current_time]
+
+    def to_frame(self):
+        """Recorded days as a pandas DataFrame indexed by time"""
+        import pandas as pd
+        return pd.DataFrame(self.to_numpy()).set_index("time")
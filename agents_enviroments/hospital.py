@@ -0,0 +1,293 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Tuple
+import multiprocessing
+import numpy as np
+from .history import History, HISTORY_KEYS
+from .patient import Patient
+from .patient_table import NONE, TRANSFER_DTYPE, decode_patients, encode_patients
+
+if TYPE_CHECKING:
+    from .ward import Ward
+    from .patient import Arrivals
+    from .movement_strategy import MovementStrategy
+
+# One day of one ward as sent back by a shard: the History row and the
+# transfers admitted (colonised or not) or turned away for lack of a bed
+DAY_DTYPE = np.dtype([(column, np.int64) for column in HISTORY_KEYS.values()] +
+                     [("transfers_in", np.int64), ("colonised_in", np.int64), ("blocked", np.int64)])
+
+
+class WardShard:
+
+    def __init__(self, indexes: List[int], wards: List[Ward], arrivals: List[Arrivals],
+                 strategies: List[MovementStrategy], transfer: np.ndarray):
+        """Wards of a hospital simulated together, in one process.
+
+        Parameters
+        ----------
+        indexes : List[int]
+            Hospital index of each ward
+        wards : List[Ward]
+            The wards
+        arrivals : List[Arrivals]
+            Patients arriving each day at each ward
+        strategies : List[MovementStrategy]
+            Movement strategies applied in every ward
+        transfer : ndarray
+            Rows of the hospital transfer matrix for these wards
+        """
+        self.indexes = list(indexes)
+        self.wards = wards
+        self.arrivals = [iter(patients) for patients in arrivals]
+        self.strategies = strategies
+        self.transfer = transfer
+
+    def step(self, incoming: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Simulate one day of every ward, then pick the patients leaving.
+
+        Transferred patients are admitted before the day's arrivals.
+
+        Parameters
+        ----------
+        incoming : ndarray
+            Patients transferred to these wards (TRANSFER_DTYPE)
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            One DAY_DTYPE row per ward and the patients transferred out
+            (TRANSFER_DTYPE)
+        """
+        days = np.zeros(len(self.wards), dtype=DAY_DTYPE)
+        outgoing = []
+        for k, (index, ward) in enumerate(zip(self.indexes, self.wards)):
+            rows = incoming[incoming["ward"] == index]
+            transferred = decode_patients(rows)
+            record = ward.step(
+                transferred + list(next(self.arrivals[k])), self.strategies)
+            admitted = {patient.id for patient in ward.new_patients}
+            transferred_in = np.array([patient.id in admitted for patient in transferred],
+                                      dtype=bool)
+            # Colonised on admission, from the rows as the patients may have
+            # been colonised or healed during the day
+            days[k] = (*record, transferred_in.sum(),
+                       (rows["colonisation"][transferred_in] == 1).sum(),
+                       len(transferred) - transferred_in.sum())
+            outgoing.append(self.transfer_out(ward, self.transfer[k], index))
+        return days, np.concatenate(outgoing)
+
+    @staticmethod
+    def transfer_out(ward: Ward, transfer: np.ndarray, source: int = NONE) -> np.ndarray:
+        """Draw the patients leaving a ward, each goes to ward j with
+        probability transfer[j]"""
+        cumulative = np.cumsum(transfer)
+        if cumulative[-1] <= 0:
+            return np.zeros(0, dtype=TRANSFER_DTYPE)
+        patients = ward.patients
+        u = ward.streams.transfer.take(len(patients))
+        leaving = np.flatnonzero(u < cumulative[-1])
+        wards = np.searchsorted(cumulative, u[leaving], side="right")
+        patients = [ward.transfer_patient(patients[i]) for i in leaving]
+        return encode_patients(patients, wards, source)
+
+    def summary(self) -> np.ndarray:
+        """Cases counted by each ward over the run, shape (wards, 2)"""
+        return np.array([(ward.primary_cases, ward.secondary_cases) for ward in self.wards],
+                        dtype=np.int64).reshape(-1, 2)
+
+
+class _LocalShard:
+    """Shard run in the calling process"""
+
+    def __init__(self, shard: WardShard):
+        self.shard = shard
+
+    def send(self, incoming: np.ndarray):
+        self.reply = self.shard.step(incoming)
+
+    def receive(self):
+        return self.reply
+
+    def close(self) -> np.ndarray:
+        return self.shard.summary()
+
+    def terminate(self):
+        pass
+
+
+def _serve_shard(connection, shard: WardShard):
+    """Worker loop: step the shard for every incoming array until None"""
+    try:
+        while True:
+            incoming = connection.recv()
+            if incoming is None:
+                connection.send(shard.summary())
+                return
+            connection.send(shard.step(incoming))
+    except Exception as error:
+        connection.send(error)
+    finally:
+        connection.close()
+
+
+class _ProcessShard:
+    """Shard living in a worker process, only transfers and day rows go
+    through the pipe"""
+
+    def __init__(self, shard: WardShard):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve_shard, args=(child, shard), daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, incoming: np.ndarray):
+        self.connection.send(incoming)
+
+    def receive(self):
+        reply = self.connection.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self) -> np.ndarray:
+        self.send(None)
+        summary = self.receive()
+        self.process.join()
+        return summary
+
+    def terminate(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+
+class Hospital:
+
+    def __init__(self, wards: List[Ward], transfer, strategies: List[MovementStrategy] = None,
+                 workers: int = 1):
+        """Several wards exchanging patients.
+
+        Each day every ward runs `Ward.step` on its own, then every patient
+        of ward i is transferred to ward j with probability transfer[i, j]
+        (drawn from the ward's `transfer` stream). Transferred patients keep
+        their state and are admitted to their new ward the next day, before
+        its arrivals. A transfer to a full ward is turned away and leaves the
+        hospital.
+
+        Wards are split into shards that can run in worker processes. A
+        worker keeps its wards for the whole run, so only the transferred
+        patients (as TRANSFER_DTYPE rows) and one row of counts per ward go
+        through the pipes each day. Results do not depend on `workers`.
+
+        Parameters
+        ----------
+        wards : List[Ward]
+            Wards of the hospital, each with its own bays, parameters and
+            random streams
+        transfer : array_like
+            Daily transfer probabilities, shape (wards, wards), the diagonal
+            is ignored and rows must sum to at most 1
+        strategies : List[MovementStrategy], optional
+            Movement strategies applied in every ward, by default None
+        workers : int, optional
+            Number of worker processes, 1 runs the wards in this process
+            (which then holds their final state), by default 1
+        """
+        transfer = np.array(transfer, dtype=float)
+        if transfer.shape != (len(wards), len(wards)):
+            raise ValueError(
+                f"Transfer matrix of shape {transfer.shape}, expected {(len(wards), len(wards))}")
+        np.fill_diagonal(transfer, 0)
+        if (transfer < 0).any() or (transfer.sum(axis=1) > 1).any():
+            raise ValueError(
+                "Transfer probabilities must be non negative with rows summing to at most 1")
+        self.wards = wards
+        self.transfer = transfer
+        self.strategies = strategies or []
+        self.workers = workers
+
+    def shards(self, arrivals: List[Arrivals]) -> List[WardShard]:
+        """Split the wards round robin into one shard per worker"""
+        num_of_shards = max(min(self.workers, len(self.wards)), 1)
+        shards = []
+        for first in range(num_of_shards):
+            indexes = list(range(first, len(self.wards), num_of_shards))
+            shards.append(WardShard(indexes, [self.wards[i] for i in indexes],
+                                    [arrivals[i] for i in indexes], self.strategies,
+                                    self.transfer[indexes]))
+        return shards
+
+    def run(self, arrivals: List[Arrivals]) -> History:
+        """Simulate the hospital for as many days as the shortest arrivals
+
+        Parameters
+        ----------
+        arrivals : List[Arrivals]
+            Patients arriving each day at each ward (Arrivals or
+            List[List[Patient]])
+
+        Returns
+        -------
+        History
+            Hospital History, the sum of the ward histories where transfers
+            are not counted as new patients and turned away transfers are
+            counted as removed. Ward histories are kept in `histories`,
+            transfer counts in `transfers` and `blocked`, and the patients
+            transferred on the last day in `in_transit`.
+        """
+        if len(arrivals) != len(self.wards):
+            raise ValueError(
+                f"Got arrivals for {len(arrivals)} wards, expected {len(self.wards)}")
+        days = min(len(patients) for patients in arrivals)
+        self.histories = [History(horizon=days) for _ in self.wards]
+        self.history = History(horizon=days)
+        self.transfers = np.zeros(self.transfer.shape, dtype=np.int64)
+        self.blocked = np.zeros(len(self.wards), dtype=np.int64)
+        colonised_in = 0
+        shards = self.shards(arrivals)
+        runner = _LocalShard if self.workers <= 1 else _ProcessShard
+        runners = []
+        try:
+            for shard in shards:
+                runners.append(runner(shard))
+            incoming = np.zeros(0, dtype=TRANSFER_DTYPE)
+            for _ in range(days):
+                for shard, shard_runner in zip(shards, runners):
+                    shard_runner.send(
+                        incoming[np.isin(incoming["ward"], shard.indexes)])
+                outgoing = []
+                hospital_day = np.zeros(1, dtype=DAY_DTYPE)[0]
+                for shard, shard_runner in zip(shards, runners):
+                    ward_days, leaving = shard_runner.receive()
+                    for index, ward_day in zip(shard.indexes, ward_days):
+                        self.histories[index].add_record(
+                            ward_day[list(HISTORY_KEYS.values())].tolist())
+                        self.blocked[index] += ward_day["blocked"]
+                        for column in DAY_DTYPE.names:
+                            hospital_day[column] += ward_day[column]
+                    outgoing.append(leaving)
+                # Ward order, whatever the sharding
+                incoming = np.concatenate(outgoing)
+                incoming = incoming[np.argsort(
+                    incoming["source"], kind="stable")]
+                np.add.at(self.transfers,
+                          (incoming["source"], incoming["ward"]), 1)
+                colonised_in += hospital_day["colonised_in"]
+                hospital_day["new_patients"] -= hospital_day["transfers_in"]
+                hospital_day["removed"] += hospital_day["blocked"]
+                self.history.add_record(
+                    hospital_day[list(HISTORY_KEYS.values())].tolist())
+            self.in_transit = incoming
+            summaries = np.concatenate(
+                [shard_runner.close() for shard_runner in runners])
+        finally:
+            for shard_runner in runners:
+                shard_runner.terminate()
+        order = np.concatenate([shard.indexes for shard in shards])
+        cases = np.zeros((len(self.wards), 2), dtype=np.int64)
+        cases[order] = summaries
+        self.ward_cases = cases
+        self.primary_cases = int(cases[:, 0].sum() - colonised_in)
+        self.secondary_cases = int(cases[:, 1].sum())
+        return self.history
@@ -2,11 +2,12 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 import math
-from copy import deepcopy
+import numpy as np
 if TYPE_CHECKING:
     from .bay import Bay
     from .ward import Ward
     from .patient import Patient
+    from .batch import BatchSimulation
 
 
 def change_patient_location(patient: Patient, new_bay: Bay):
@@ -16,15 +17,15 @@ def change_patient_location(patient: Patient, new_bay: Bay):
     # if not isinstance(new_bay, Bay):
     #     raise TypeError(f"{type(new_bay)} is not of Bay Type")
     old_bay = patient.location
-    old_bay.remove_patient(patient)
+    old_bay.remove_patient(patient, moving=True)
     new_bay.add_patient(patient)
 
 
 def switch_patients_location(patient: Patient, other_patient: Patient):
     bay = patient.location
     other_bay = other_patient.location
-    bay.remove_patient(patient)
-    other_bay.remove_patient(other_patient)
+    bay.remove_patient(patient, moving=True)
+    other_bay.remove_patient(other_patient, moving=True)
     bay.add_patient(other_patient)
     other_bay.add_patient(patient)
 
@@ -34,6 +35,9 @@ class MovementStrategy(ABC):
     def move_patients(self, ward: Ward):
         pass
 
+    # Strategies that also move the patients of every replicate of a
+    # BatchSimulation define move_patients_batch(simulation)
+
 
 class IsolateInfectedStrategy(MovementStrategy):
 
@@ -42,13 +46,29 @@ class IsolateInfectedStrategy(MovementStrategy):
 
     def move_patients(self, ward: Ward):
         # Find available isolation bay in ward
-        available_isobay = [
-            isobay for isobay in ward.isobays if not isobay.is_full]
-        for patient in ward.patients:
-            if len(available_isobay) == 0:
-                return
-            if patient.detection_status and not patient.location.is_isobay:
-                change_patient_location(patient, available_isobay.pop())
+        available_isobay = ward.free_isobays()
+        if len(available_isobay) == 0:
+            return
+        candidates = ward.isolation_candidates(len(available_isobay))
+        for patient in candidates:
+            change_patient_location(patient, available_isobay.pop())
+        if ward.profiler is not None:
+            ward.profiler.count(f"{self}.moves", len(candidates))
+
+    def move_patients_batch(self, simulation: BatchSimulation):
+        # Pair the k-th detected patient outside isolation (in bed order)
+        # with the k-th free isolation bed counted from the last bay
+        candidates = simulation.occupied & (simulation.detection != 0) & \
+            ~simulation.bed_is_iso
+        free = ~simulation.occupied & simulation.bed_is_iso
+        num_moves = np.minimum(candidates.sum(axis=1), free.sum(axis=1))
+        candidate_rank = np.cumsum(candidates, axis=1) - 1
+        free_rank = np.cumsum(free[:, ::-1], axis=1)[:, ::-1] - 1
+        rows, src = np.nonzero(
+            candidates & (candidate_rank < num_moves[:, None]))
+        dst_rows, dst = np.nonzero(free & (free_rank < num_moves[:, None]))
+        order = np.lexsort((free_rank[dst_rows, dst], dst_rows))
+        simulation.move(rows, src, dst[order])
 
 
 class GroupInfectedStrategy(MovementStrategy):
@@ -57,6 +77,7 @@ class GroupInfectedStrategy(MovementStrategy):
         return "GroupInfectedStrategy"
 
     def switch_detected_undetected(self, from_bay: Bay, to_bay: Bay):
+        detected = from_bay.last_patient(detected=True)
         # If no undetected patients , we will move the patient if it is avaliable
         if to_bay.num_of_undetected == 0:
             if to_bay.is_full:
@@ -64,27 +85,21 @@ class GroupInfectedStrategy(MovementStrategy):
                 raise Exception(
                     "Bad Function Call : To bay {} is full of detected patients".format(to_bay.id))
             # If available then we will move patients to the bay
-            detected = deepcopy(from_bay).detected.pop()
-            detected = from_bay.get_patient(detected.id)
             change_patient_location(detected, to_bay)
             return
-        #  Prevent unwanted mutablity
-        detected = deepcopy(from_bay).detected.pop()
-        undected = deepcopy(to_bay).undetected.pop()
-        detected = from_bay.get_patient(detected.id)
-        undected = to_bay.get_patient(undected.id)
+        undected = to_bay.last_patient(detected=False)
         switch_patients_location(detected, undected)
 
     def move_patients(self, ward: Ward):
         max_capacity = ward.non_isobays[0].capacity
-        # Move infected patients from least infected bay to the most infected bay
-        bays_sort = ward.non_isobays
-        bays_sort = sorted(bays_sort, key=lambda b: b.num_of_detected)
+        # Move infected patients from least infected bay to the most infected bay.
+        # Bays keep their detected counters, so the order is sorted once and
+        # each move only touches the two bays under the pointers
+        bays_sort = sorted(ward.non_isobays, key=lambda b: b.num_of_detected)
         i = 0
-        j = len(ward.non_isobays) - 1
-        while True:
-            if i == j:
-                break
+        j = len(bays_sort) - 1
+        moves = 0
+        while i != j:
             if bays_sort[i].num_of_detected == 0:
                 i += 1
                 continue
@@ -92,3 +107,50 @@ class GroupInfectedStrategy(MovementStrategy):
                 j -= 1
                 continue
             self.switch_detected_undetected(bays_sort[i], bays_sort[j])
+            moves += 1
+        if ward.profiler is not None:
+            ward.profiler.count(f"{self}.bays_sorted", len(bays_sort))
+            ward.profiler.count(f"{self}.moves", moves)
+
+    def move_patients_batch(self, simulation: BatchSimulation):
+        general = np.flatnonzero(~simulation.bay_is_iso)
+        max_capacity = simulation.bay_capacity[general[0]]
+        detected = simulation.occupied & (simulation.detection == 1)
+        num_of_detected = simulation.bay_counts(detected)[:, general]
+        # Nothing to group with less than two bays holding detected patients
+        for row in np.flatnonzero((num_of_detected > 0).sum(axis=1) > 1):
+            self._group_replicate(simulation, row, general, max_capacity)
+
+    def _group_replicate(self, simulation: BatchSimulation, row, general, max_capacity):
+        """Same two pointer walk as move_patients for one replicate"""
+        bed_bay = simulation.bed_bay
+        occupied = simulation.occupied[row]
+        detection = simulation.detection[row]
+        count = simulation.bay_counts(
+            occupied & (detection == 1))[general]
+        bays_sort = general[np.argsort(count, kind="stable")]
+        num_of_detected = dict(zip(general, count))
+        i = 0
+        j = len(bays_sort) - 1
+        while i != j:
+            from_bay, to_bay = bays_sort[i], bays_sort[j]
+            if num_of_detected[from_bay] == 0:
+                i += 1
+                continue
+            if num_of_detected[to_bay] == max_capacity:
+                j -= 1
+                continue
+            detected = np.flatnonzero(
+                occupied & (detection == 1) & (bed_bay == from_bay))[-1]
+            undetected = np.flatnonzero(
+                occupied & (detection != 1) & (bed_bay == to_bay))
+            if len(undetected) == 0:
+                empty = np.flatnonzero(~occupied & (bed_bay == to_bay))
+                if len(empty) == 0:
+                    raise Exception(
+                        "Bad Function Call : To bay {} is full of detected patients".format(to_bay))
+                simulation.move(row, detected, empty[0])
+            else:
+                simulation.swap(row, detected, undetected[-1])
+            num_of_detected[from_bay] -= 1
+            num_of_detected[to_bay] += 1
@@ -2,16 +2,61 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, List
 __author__ = "Iman-Budi Pranakasih (10118004)"
 from copy import copy
+import os
 
 import numpy as np
-from matplotlib import pyplot as plt
 
 if TYPE_CHECKING:
     from .bay import Bay
+    from .random_streams import UniformBuffer
+
+
+class _Status:
+    """Patient status attribute that keeps the counters of its bay up to date"""
+
+    def __set_name__(self, owner, name):
+        self.attr = "_" + name
+
+    def __get__(self, patient: Patient, owner=None):
+        if patient is None:
+            return self
+        return patient.__dict__[self.attr]
+
+    def __set__(self, patient: Patient, value):
+        location = patient.__dict__.get("location")
+        if location is not None and patient.__dict__[self.attr] == value:
+            return
+        if location is not None:
+            location.update_patient(patient, self.attr, value)
+        else:
+            patient.__dict__[self.attr] = value
+
+
+class _Time:
+    """Patient time, read from the ward clock while the patient is in a ward"""
+
+    def __get__(self, patient: Patient, owner=None):
+        if patient is None:
+            return self
+        start = patient.__dict__.get("_start")
+        if start is None:
+            return patient.__dict__["_time"]
+        return patient.location.ward.time - start
+
+    def __set__(self, patient: Patient, value):
+        start = patient.__dict__.get("_start")
+        if start is None:
+            patient.__dict__["_time"] = value
+        else:
+            patient.__dict__["_start"] = patient.location.ward.time - value
 
 
 class Patient:
     num_of_patients = 0
+    colonisation_status = _Status()
+    detection_status = _Status()
+    decolonisation_status = _Status()
+    time = _Time()
 
     def __init__(self, colonisation_status: int = 0, detection_status: int = 0, decolonisation_status: int = 0, length_stay: int = 10):
         """
@@ -24,12 +69,12 @@ class Patient:
         """
         Patient.num_of_patients += 1
         self.id = Patient.num_of_patients
+        self.location = None
         self.colonisation_status = colonisation_status
         self.detection_status = detection_status
         self.decolonisation_status = decolonisation_status
         # Hidden detection are use to store patient colonization stateat screening time
         self.hidden_detection_status = None
-        self.location = None
         # According to the paper this will have an inital gamma distribution and will change as each time interval passes.
         # Used to avoid 0 time length of stay
         self.length_stay = length_stay
@@ -45,6 +90,16 @@ class Patient:
         """Time remaining from length of stay"""
         return int(self.length_stay - self.time)
 
+    def start_clock(self, now: int):
+        """Follow the ward clock (now is the ward time) instead of counting days"""
+        self._start = now - self.time
+
+    def stop_clock(self, now: int):
+        """Keep the time reached when leaving the ward"""
+        if self.__dict__.get("_start") is not None:
+            self._time = now - self._start
+            self._start = None
+
     def set_location(self, bay: Bay):
         from .bay import Bay
         """Move patient to bay"""
@@ -52,22 +107,23 @@ class Patient:
             raise TypeError(f"{type(bay)} is not of Bay Type")
         self.location = bay
 
-    def infect_prob(self, prob):
-        """Infect the patient and change colonisation status with a probability"""
+    def infect_prob(self, prob, rng: UniformBuffer = None):
+        """Infect the patient and change colonisation status with a probability
+        drawn from `rng` (the global NumPy random state if not given)"""
         if self.colonisation_status == 1:
             raise Exception("Patient already colonised")
-        self.colonisation_status = np.random.choice([1, 0], p=[prob, 1 - prob])
-        if self.colonisation_status:
+        u = rng.next() if rng is not None else np.random.random_sample()
+        # Only a change goes through the counters of the bay and ward
+        if u < prob:
+            self.colonisation_status = 1
             return self
         return
 
     def screen_test(self, length=3, interval=4):
-        # ? Is it possible to make test length not bounded by interval ?
-        # ? ^^^  Needs multiple hidden detection status for the patient
-        """Apply screening process to patient with a certain interval with (length) of time until result"""
-        if length >= interval:
-            raise Exception(
-                "Length of test cannot be greater or equal to interval")
+        """Apply screening process to patient with a certain interval with (length) of time until result.
+        A patient awaiting a result is not screened again, so the result can
+        take longer than the interval.
+        """
         # Check if patient has been screened and awaiting result
         if self.detection_status == 2:
             # Don't screen patient again
@@ -104,24 +160,25 @@ class Patient:
         #  Dont return if not yet screened or not yet detected
         return None
 
-    def check_healed(self, prob=0.9):
+    def check_healed(self, prob=0.9, rng: UniformBuffer = None):
         """
         This function will heal the paient given a probability
         for patient to recover from the disease and discharged.
         Note : Giving treament should be a increasing probability with respect to
         the time patients is in the ward
         """
-        healed = np.random.choice([1, 0], p=[prob, 1 - prob])
+        u = rng.next() if rng is not None else np.random.random_sample()
+        healed = int(u < prob)
         if healed:
             self.colonisation_status = 0
             self.detection_status = 0
             self.decolonisation_status = 0
         return healed
 
-    def give_treatment(self, treatment_prob):
+    def give_treatment(self, treatment_prob, rng: UniformBuffer = None):
         if self.treatment_time is not None:
             if self.treatment_time == 0:
-                if self.check_healed(treatment_prob):
+                if self.check_healed(treatment_prob, rng):
                     return self
             else:
                 self.treatment_time -= 1
@@ -144,11 +201,77 @@ class Patient:
                 Decolonisation: {self.decolonisation_status}"
 
 
+# Arrays of Arrivals, in constructor order
+ARRIVALS_ARRAYS = ("offsets", "colonisation", "length_stay")
+
+
+class Arrivals:
+
+    def __init__(self, offsets: np.ndarray, colonisation: np.ndarray, length_stay: np.ndarray):
+        """Compact sequence of admitted patients.
+
+        Patients of day i are the rows offsets[i]:offsets[i + 1] of the
+        colonisation and length_stay arrays. Iterating yields the patients of
+        each day as new Patient objects, so one Arrivals can feed many runs.
+
+        Parameters
+        ----------
+        offsets : ndarray
+            Day offsets into the patient arrays, of length days + 1
+        colonisation : ndarray
+            Colonisation status on admission of each patient
+        length_stay : ndarray
+            Length of stay of each patient
+        """
+        self.offsets = offsets
+        self.colonisation = colonisation
+        self.length_stay = length_stay
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for day in range(len(self)):
+            yield self.patients(day)
+
+    @property
+    def admissions(self) -> np.ndarray:
+        """Number of patients admited each day"""
+        return np.diff(self.offsets)
+
+    def patients(self, day: int) -> List[Patient]:
+        """Materialise the patients of one day"""
+        start, end = self.offsets[day], self.offsets[day + 1]
+        return [Patient(colonisation_status=int(colonisation), length_stay=float(length_stay))
+                for colonisation, length_stay in zip(self.colonisation[start:end], self.length_stay[start:end])]
+
+    def to_patients(self) -> List[List[Patient]]:
+        """Materialise the patients of every day"""
+        return list(self)
+
+    def save(self, directory: str):
+        """Save the arrays as .npy files of a directory (created if needed)"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRIVALS_ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = "r") -> Arrivals:
+        """Load arrivals saved with `save`, memory mapped read-only by
+        default so processes loading the same files share their pages"""
+        return cls(*(np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+                     for name in ARRIVALS_ARRAYS))
+
+
 class PatientGenerator:
 
-    def __init__(self, poisson_lambda=None, gamma_k=None, gamma_scale=None, colonized_prob=None) -> None:
-        """Generate list of patients with specific attributes and probability distributions
+    def __init__(self, poisson_lambda=None, gamma_k=None, gamma_scale=None, colonized_prob=None,
+                 rng: np.random.Generator = None) -> None:
+        """Generate list of patients with specific attributes and probability distributions.
+        Draws come from `rng` (for example RandomStreams.arrivals), or from the
+        global NumPy random state if not given.
         """
+        self.rng = rng if rng is not None else np.random
         self.poisson_lambda = poisson_lambda
         self.gamma_k = gamma_k
         self.gamma_scale = gamma_scale
@@ -179,8 +302,21 @@ class PatientGenerator:
         self.col_gamma_scale = gamma_scale
 
     def reset_history(self):
-        self.admission_dist: List[int] = []
-        self.length_stay_dist: List[int] = []
+        self.arrivals: Arrivals = None
+
+    @property
+    def admission_dist(self) -> np.ndarray:
+        """Admissions per day of the last generated sequence"""
+        if self.arrivals is None:
+            return np.array([], dtype=np.int64)
+        return self.arrivals.admissions
+
+    @property
+    def length_stay_dist(self) -> np.ndarray:
+        """Lengths of stay of the last generated sequence"""
+        if self.arrivals is None:
+            return np.array([])
+        return self.arrivals.length_stay
 
     def set_var(self, poisson_lambda=3, gamma_k=5, gamma_scale=1):
         """Set variable for admission rate (poisson distribution
@@ -213,24 +349,54 @@ class PatientGenerator:
         patients_array = []
 
         # Get the number of patients admited in a day
-        num_admit_patients = np.random.poisson(self.poisson_lambda)
+        num_admit_patients = self.rng.poisson(self.poisson_lambda)
 
         for _ in range(num_admit_patients):
             # Generate the patient infection status
-            colonized_status = np.random.choice(
-                [1, 0], p=[colonized_prob, 1 - colonized_prob])
+            colonized_status = int(self.rng.random() < colonized_prob)
             # Get the patients length of stay from the gamma distribution
             if colonized_status and self.use_col_dist:
-                length_stay = np.random.gamma(
+                length_stay = self.rng.gamma(
                     self.col_gamma_k, scale=self.col_gamma_scale)
             else:
-                length_stay = np.random.gamma(
+                length_stay = self.rng.gamma(
                     self.gamma_k, scale=self.gamma_scale)
             # Generate the patients
             patients_array.append(
                 Patient(colonisation_status=colonized_status, length_stay=length_stay))
         return patients_array
 
+    def generate_arrivals(self, colonized_prob: float = None, time=350) -> Arrivals:
+        """Generate the patients admited over `time` days as compact arrays.
+        Draws every daily admission count, colonisation status and length of stay
+        with one call per distribution.
+
+        Parameters
+        ----------
+        colonized_prob : float, optional
+            Probability/Distribution of colonization during admission, by default None
+
+        Returns
+        -------
+        Arrivals
+            sequence of admited patients
+        """
+        if not colonized_prob and colonized_prob != 0:
+            colonized_prob = self.colonized_prob
+        num_admit_patients = self.rng.poisson(self.poisson_lambda, size=time)
+        offsets = np.concatenate([[0], np.cumsum(num_admit_patients)])
+        colonisation = (self.rng.random(
+            offsets[-1]) < colonized_prob).astype(np.int8)
+        length_stay = np.empty(offsets[-1])
+        col_dist = colonisation.astype(bool) & self.use_col_dist
+        if self.use_col_dist:
+            length_stay[col_dist] = self.rng.gamma(
+                self.col_gamma_k, scale=self.col_gamma_scale, size=col_dist.sum())
+        length_stay[~col_dist] = self.rng.gamma(
+            self.gamma_k, scale=self.gamma_scale, size=(~col_dist).sum())
+        self.arrivals = Arrivals(offsets, colonisation, length_stay)
+        return self.arrivals
+
     def generate_sequence(self, colonized_prob: float = None, time=350) -> List[List[Patient]]:
         """Generate list of patients to be admited to the ward inside sequence 
 
@@ -244,35 +410,14 @@ class PatientGenerator:
         list[list[Patient]]
             sequence of list of patients
         """
-        if not colonized_prob and colonized_prob != 0:
-            colonized_prob = self.colonized_prob
-        # Get the patients for each day
-        patient_sequence = [self.generate(
-            colonized_prob=colonized_prob) for _ in range(time)]
-        for patient_arr in patient_sequence:
-            self.admission_dist.append(len(patient_arr))
-            for patient in patient_arr:
-                self.length_stay_dist.append(patient.length_stay)
-        return patient_sequence
+        return self.generate_arrivals(colonized_prob=colonized_prob, time=time).to_patients()
 
     def show_admit(self):
-        """Show admission rate distribution"""
-        dist_pos = self.admission_dist
-        size = np.array(dist_pos, dtype=object).size
-        print(size)
-        plt.hist(dist_pos, weights=np.ones(size) / size)
-        plt.title("Poisson Discrete")
-        plt.xlabel("Num of patient admited each day")
-        plt.ylabel("Probability distribution")
-        plt.show()
+        """Show admission rate distribution (imports matplotlib, see `viz`)"""
+        from .viz import show_admit
+        show_admit(self)
 
     def show_length_stay(self):
-        """Show length of stay distribution"""
-        dist_gamma = self.length_stay_dist
-        size = np.array(dist_gamma, dtype=object).size
-        print(size)
-        plt.hist(dist_gamma, weights=np.ones(size) / size)
-        plt.title("Gamma Distribution")
-        plt.xlabel("Length of stay ")
-        plt.ylabel("Probability distribution")
-        plt.show()
+        """Show length of stay distribution (imports matplotlib, see `viz`)"""
+        from .viz import show_length_stay
+        show_length_stay(self)
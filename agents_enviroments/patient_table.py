@@ -0,0 +1,324 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List
+import numpy as np
+from .patient import Patient
+
+if TYPE_CHECKING:
+    from .bay import Bay
+    from .array_ward import ArrayWard
+
+# Integer columns use NONE where the Patient attribute would be None
+NONE = -1
+
+# Patient state sent between wards at day boundaries, from ward `source`
+# to ward `ward`
+TRANSFER_DTYPE = np.dtype([
+    ("source", np.int32),
+    ("ward", np.int32),
+    ("colonisation", np.int8),
+    ("detection", np.int8),
+    ("decolonisation", np.int8),
+    ("hidden_detection", np.int8),
+    ("time", np.int64),
+    ("length_stay", float),
+    ("result_time", np.int64),
+    ("treatment_time", np.int64),
+])
+
+
+class PatientTable:
+
+    def __init__(self, size: int):
+        """Columnar (structure of arrays) store of patients.
+
+        Each row is a slot that holds one patient, freed slots are kept in
+        `free_slots` and reused on admission. A slot belongs to the ward when
+        its `bay` is set (not NONE).
+
+        Parameters
+        ----------
+        size : int
+            Number of slots, usually the ward capacity
+        """
+        self.size = size
+        self.id = np.zeros(size, dtype=np.int64)
+        self.occupied = np.zeros(size, dtype=bool)
+        self.colonisation = np.zeros(size, dtype=np.int8)
+        self.detection = np.zeros(size, dtype=np.int8)
+        self.decolonisation = np.zeros(size, dtype=np.int8)
+        self.hidden_detection = np.full(size, NONE, dtype=np.int8)
+        self.bay = np.full(size, NONE, dtype=np.int32)
+        self.time = np.zeros(size, dtype=np.int64)
+        self.length_stay = np.zeros(size, dtype=float)
+        self.result_time = np.full(size, NONE, dtype=np.int64)
+        self.treatment_time = np.full(size, NONE, dtype=np.int64)
+        # Popped from the end so the lowest slots are used first
+        self.free_slots: List[int] = list(range(size - 1, -1, -1))
+
+    @property
+    def in_ward(self) -> np.ndarray:
+        """Mask of slots holding a patient inside a bay"""
+        return self.bay != NONE
+
+    def add(self, patient: Patient, bay: int) -> int:
+        """Copy a patient into a free slot and return the slot"""
+        if not self.free_slots:
+            raise Exception("Patient table is full")
+        slot = self.free_slots.pop()
+        self.id[slot] = patient.id
+        self.occupied[slot] = True
+        self.colonisation[slot] = patient.colonisation_status
+        self.detection[slot] = patient.detection_status
+        self.decolonisation[slot] = patient.decolonisation_status
+        self.hidden_detection[slot] = _to_column(
+            patient.hidden_detection_status)
+        self.bay[slot] = bay
+        self.time[slot] = patient.time
+        self.length_stay[slot] = patient.length_stay
+        self.result_time[slot] = _to_column(patient.result_time)
+        self.treatment_time[slot] = _to_column(patient.treatment_time)
+        return slot
+
+    def add_patients(self, patients: List[Patient], bays) -> np.ndarray:
+        """Copy several patients into free slots at once and return the slots"""
+        if len(patients) > len(self.free_slots):
+            raise Exception("Patient table is full")
+        slots = np.array(self.free_slots[::-1][:len(patients)], dtype=np.int64)
+        del self.free_slots[len(self.free_slots) - len(patients):]
+        self.id[slots] = [patient.id for patient in patients]
+        self.occupied[slots] = True
+        self.colonisation[slots] = [
+            patient.colonisation_status for patient in patients]
+        self.detection[slots] = [
+            patient.detection_status for patient in patients]
+        self.decolonisation[slots] = [
+            patient.decolonisation_status for patient in patients]
+        self.hidden_detection[slots] = [_to_column(
+            patient.hidden_detection_status) for patient in patients]
+        self.bay[slots] = bays
+        self.time[slots] = [patient.time for patient in patients]
+        self.length_stay[slots] = [
+            patient.length_stay for patient in patients]
+        self.result_time[slots] = [_to_column(
+            patient.result_time) for patient in patients]
+        self.treatment_time[slots] = [_to_column(
+            patient.treatment_time) for patient in patients]
+        return slots
+
+    def remove(self, slots):
+        """Free slots so they can be reused on admission"""
+        for slot in slots:
+            self.occupied[slot] = False
+            self.bay[slot] = NONE
+            self.free_slots.append(int(slot))
+
+
+def _to_column(value):
+    return NONE if value is None else value
+
+
+def _from_column(value):
+    value = int(value)
+    return None if value == NONE else value
+
+
+def encode_patients(patients: List[Patient], wards, source: int = NONE) -> np.ndarray:
+    """Pack patients into a TRANSFER_DTYPE array, bound for `wards`"""
+    rows = np.zeros(len(patients), dtype=TRANSFER_DTYPE)
+    rows["source"] = source
+    rows["ward"] = wards
+    rows["colonisation"] = [patient.colonisation_status for patient in patients]
+    rows["detection"] = [patient.detection_status for patient in patients]
+    rows["decolonisation"] = [
+        patient.decolonisation_status for patient in patients]
+    rows["hidden_detection"] = [_to_column(
+        patient.hidden_detection_status) for patient in patients]
+    rows["time"] = [patient.time for patient in patients]
+    rows["length_stay"] = [patient.length_stay for patient in patients]
+    rows["result_time"] = [_to_column(patient.result_time)
+                           for patient in patients]
+    rows["treatment_time"] = [_to_column(
+        patient.treatment_time) for patient in patients]
+    return rows
+
+
+def decode_patients(rows: np.ndarray) -> List[Patient]:
+    """New Patient objects from a TRANSFER_DTYPE array"""
+    patients = []
+    for row in rows:
+        patient = Patient(colonisation_status=int(row["colonisation"]),
+                          detection_status=int(row["detection"]),
+                          decolonisation_status=int(row["decolonisation"]),
+                          length_stay=float(row["length_stay"]))
+        patient.hidden_detection_status = _from_column(row["hidden_detection"])
+        patient.time = int(row["time"])
+        patient.result_time = _from_column(row["result_time"])
+        patient.treatment_time = _from_column(row["treatment_time"])
+        patients.append(patient)
+    return patients
+
+
+class _Column:
+    """Patient attribute stored in a PatientTable column"""
+
+    def __init__(self, column, nullable=False):
+        self.column = column
+        self.nullable = nullable
+
+    def __get__(self, view: PatientView, owner=None):
+        if view is None:
+            return self
+        value = getattr(view.ward.table, self.column)[view.slot]
+        if self.nullable:
+            return _from_column(value)
+        return value.item()
+
+    def __set__(self, view: PatientView, value):
+        if self.nullable:
+            value = _to_column(value)
+        getattr(view.ward.table, self.column)[view.slot] = value
+
+
+class PatientView:
+    """Patient-like access to one slot of an ArrayWard patient table"""
+    colonisation_status = _Column("colonisation")
+    detection_status = _Column("detection")
+    decolonisation_status = _Column("decolonisation")
+    hidden_detection_status = _Column("hidden_detection", nullable=True)
+    time = _Column("time")
+    length_stay = _Column("length_stay")
+    result_time = _Column("result_time", nullable=True)
+    treatment_time = _Column("treatment_time", nullable=True)
+
+    def __init__(self, ward: ArrayWard, slot: int):
+        self.ward = ward
+        self.slot = int(slot)
+
+    @property
+    def id(self):
+        return int(self.ward.table.id[self.slot])
+
+    @property
+    def location(self) -> BayView:
+        bay = self.ward.table.bay[self.slot]
+        if bay == NONE:
+            return None
+        return self.ward.bays[bay]
+
+    @property
+    def remaining_stay(self):
+        """Time remaining from length of stay"""
+        return int(self.length_stay - self.time)
+
+    def __eq__(self, other):
+        return isinstance(other, PatientView) and other.ward is self.ward and other.slot == self.slot
+
+    def __hash__(self):
+        return hash((id(self.ward), self.slot))
+
+    def __repr__(self):
+        location = self.location.id if self.location else "NotAssigned"
+        return f"PatientView<{self.id}>,\
+                Bay<{location}>\n\
+                Colonized: {self.colonisation_status}\n\
+                Detection: {self.detection_status}\n\
+                Decolonisation: {self.decolonisation_status}"
+
+
+class BayView:
+    """Bay-like access to the patients of one bay of an ArrayWard"""
+
+    def __init__(self, ward: ArrayWard, index: int, bay: Bay):
+        self.ward = ward
+        self.index = index
+        self.id = bay.id
+        self.capacity = bay.capacity
+        self.is_isobay = bay.is_isobay
+
+    def __repr__(self) -> str:
+        return f"BayView<{self.id}>,\
+                capacity<{self.capacity}>\n\
+                num_of_detected<{self.num_of_detected}>\n\
+                num_of_patients: {self.num_of_patients}"
+
+    @property
+    def slots(self) -> List[int]:
+        """Table slots of the patients in the bay, in arrival order"""
+        return self.ward.bay_slots[self.index]
+
+    @property
+    def patients(self) -> List[PatientView]:
+        return [PatientView(self.ward, slot) for slot in self.slots]
+
+    @property
+    def num_of_patients(self):
+        """Number of patients inside bay"""
+        return len(self.slots)
+
+    @property
+    def is_full(self):
+        """Check is the bay is at full capacity"""
+        return len(self.slots) == self.capacity
+
+    @property
+    def detected(self) -> List[PatientView]:
+        detection = self.ward.table.detection
+        return [PatientView(self.ward, slot) for slot in self.slots if detection[slot] == 1]
+
+    @property
+    def undetected(self) -> List[PatientView]:
+        detection = self.ward.table.detection
+        return [PatientView(self.ward, slot) for slot in self.slots if detection[slot] != 1]
+
+    def last_patient(self, detected: bool) -> PatientView:
+        """Most recently added patient that is detected (or undetected)"""
+        detection = self.ward.table.detection
+        for slot in reversed(self.slots):
+            if (detection[slot] == 1) == detected:
+                return PatientView(self.ward, slot)
+        return None
+
+    @property
+    def num_of_detected(self):
+        return len(self.detected)
+
+    @property
+    def num_of_undetected(self):
+        return len(self.undetected)
+
+    def get_patient(self, id):
+        for slot in self.slots:
+            if self.ward.table.id[slot] == id:
+                return PatientView(self.ward, slot)
+        raise Exception(f"Patient with id {id} not found")
+
+    def add_patient(self, patient):
+        """Add a patient to the bay, a Patient object is copied into the table"""
+        if self.is_full:
+            raise Exception(
+                "Bay is at full capacity cannot add more patients !")
+        if isinstance(patient, PatientView):
+            self.ward.attach(patient.slot, self.index)
+            return
+        from .patient import Patient
+        if not isinstance(patient, Patient):
+            raise TypeError(f"{type(patient)} is not of Patient Type")
+        self.ward.attach(self.ward.table.add(patient, self.index), self.index)
+
+    def remove_patient(self, patient: PatientView, moving=False):
+        if not isinstance(patient, PatientView):
+            raise TypeError(f"{type(patient)} is not of PatientView Type")
+        self.ward.detach(patient.slot)
+        return
+
+    def remove_patient_id(self, patient_id) -> PatientView:
+        """Remove a patients and returns them
+
+        Parameters
+        ----------
+        patient_id : int
+            Patient id to remove
+        """
+        patient = self.get_patient(patient_id)
+        self.remove_patient(patient)
+        return patient
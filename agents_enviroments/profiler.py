@@ -0,0 +1,103 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+import json
+import time
+
+
+class Profiler:
+
+    def __init__(self):
+        """Wall time and call counts of nested phases, plus work counters.
+
+        Phases are recorded by their stack path, for example
+        "run;steps;step;generate_transmission", with the time spent inside
+        them (children included). Instrumented code only calls the profiler
+        when one is attached, see `Ward.step`.
+        """
+        self.times: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._stack: List[tuple] = []
+
+    def start(self, name: str):
+        """Enter a phase, nested in the current one"""
+        path = self._stack[-1][0] + ";" + name if self._stack else name
+        self._stack.append((path, time.perf_counter()))
+
+    def stop(self):
+        """Leave the current phase"""
+        path, start = self._stack.pop()
+        self.times[path] += time.perf_counter() - start
+        self.calls[path] += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start(name)
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def count(self, name: str, value: int = 1):
+        """Add to a work counter"""
+        self.counters[name] += value
+
+    def merge(self, other):
+        """Add the times, calls and counters of another Profiler (or of its
+        `to_dict`)"""
+        if isinstance(other, dict):
+            other = Profiler.from_dict(other)
+        for path, seconds in other.times.items():
+            self.times[path] += seconds
+            self.calls[path] += other.calls[path]
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        return self
+
+    def to_dict(self) -> dict:
+        """JSON friendly report"""
+        return {
+            "phases": {path: {"time": self.times[path], "calls": self.calls[path]}
+                       for path in sorted(self.times)},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    @classmethod
+    def from_dict(cls, report: dict):
+        profiler = cls()
+        for path, phase in report["phases"].items():
+            profiler.times[path] = phase["time"]
+            profiler.calls[path] = phase["calls"]
+        profiler.counters.update(report["counters"])
+        return profiler
+
+    def self_times(self) -> Dict[str, float]:
+        """Time spent in each phase outside its child phases"""
+        own = dict(self.times)
+        for path, seconds in self.times.items():
+            parent = path.rpartition(";")[0]
+            if parent in own:
+                own[parent] -= seconds
+        return own
+
+    def collapsed(self) -> str:
+        """Phases in the collapsed stack format of flamegraph.pl and
+        speedscope, one "path microseconds" line per phase"""
+        return "".join(f"{path} {max(round(seconds * 1e6), 0)}\n"
+                       for path, seconds in sorted(self.self_times().items()))
+
+    def write(self, prefix: str, **extra):
+        """Write `prefix`.json (`to_dict` with the `extra` fields) and
+        `prefix`.folded"""
+        with open(prefix + ".json", "w") as file:
+            json.dump({**self.to_dict(), **extra}, file, indent=2, default=str)
+        with open(prefix + ".folded", "w") as file:
+            file.write(self.collapsed())
+
+
+def profile_phase(profiler: Profiler, name: str):
+    """Context manager timing a phase, doing nothing without a profiler"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.phase(name)
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Independent components of the simulation, each gets its own stream
+STREAMS = ("arrivals", "transmission", "treatment", "admission", "transfer")
+
+
+class UniformBuffer:
+
+    def __init__(self, rng: np.random.Generator, block_size: int = 4096):
+        """Uniform [0, 1) numbers pre-drawn from a Generator in blocks.
+
+        The values handed out do not depend on the block size, taking n then
+        m numbers gives the same values as taking n + m at once.
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+            Generator the blocks are drawn from
+        block_size : int, optional
+            Number of uniforms drawn at each refill, by default 4096
+        """
+        self.rng = rng
+        self.block_size = block_size
+        self.buffer = np.empty(0)
+        self.position = 0
+        self.refilled = 0
+
+    @property
+    def drawn(self) -> int:
+        """Number of uniforms handed out so far"""
+        return self.refilled - (len(self.buffer) - self.position)
+
+    def _refill(self, size: int):
+        """Keep the unused values and draw at least `size` more"""
+        block = max(self.block_size, size)
+        self.buffer = np.concatenate(
+            [self.buffer[self.position:], self.rng.random(block)])
+        self.position = 0
+        self.refilled += block
+
+    def next(self) -> float:
+        """Next uniform number"""
+        if self.position == len(self.buffer):
+            self._refill(1)
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+
+    def take(self, size: int) -> np.ndarray:
+        """Next `size` uniform numbers as an array"""
+        if self.position + size > len(self.buffer):
+            self._refill(size)
+        values = self.buffer[self.position:self.position + size]
+        self.position += size
+        return values
+
+
+class RandomStreams:
+
+    def __init__(self, seed=None, block_size: int = 4096):
+        """Independent random streams of one simulation run.
+
+        The seed is expanded with SeedSequence.spawn into one Generator per
+        component (see STREAMS), so a run only depends on its own seed and not
+        on which process or in which order it runs. `arrivals` is a plain
+        Generator, the other components draw from UniformBuffers.
+
+        Parameters
+        ----------
+        seed : int or SeedSequence, optional
+            Seed of the run, by default a seed drawn from the global NumPy
+            random state (so np.random.seed keeps notebooks reproducible)
+        block_size : int, optional
+            Block size of the uniform buffers, by default 4096
+        """
+        if seed is None:
+            seed = np.random.randint(2**31 - 1)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed = seed
+        generators = [np.random.default_rng(child)
+                      for child in seed.spawn(len(STREAMS))]
+        self.generators = dict(zip(STREAMS, generators))
+        self.arrivals = self.generators["arrivals"]
+        self.transmission = UniformBuffer(
+            self.generators["transmission"], block_size)
+        self.treatment = UniformBuffer(
+            self.generators["treatment"], block_size)
+        self.admission = UniformBuffer(
+            self.generators["admission"], block_size)
+        self.transfer = UniformBuffer(
+            self.generators["transfer"], block_size)
+
+    @property
+    def buffers(self):
+        """Name and UniformBuffer of each buffered stream"""
+        return {name: stream for name, stream in vars(self).items()
+                if isinstance(stream, UniformBuffer)}
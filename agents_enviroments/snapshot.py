@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict
+from .parameters import Parameters
+from .random_streams import RandomStreams
+
+if TYPE_CHECKING:
+    from .ward import Ward
+
+
+class WardSnapshot:
+
+    def __init__(self, ward: Ward):
+        """State of a Ward between two days, to branch several runs from a
+        shared burn-in.
+
+        The ward is kept as its `Ward.export_state` (patients packed in one
+        array, timing wheels and counters rebuilt on restore) and the random
+        streams as generator states and the unused uniforms of each buffer,
+        so a snapshot is a few arrays and dicts: cheap to pickle and send to
+        worker processes.
+
+        Parameters
+        ----------
+        ward : Ward
+            Ward to snapshot, after `forward_time` (or `step`). Subclasses
+            keep more state and are not supported
+        """
+        from .ward import Ward
+        if type(ward) is not Ward:
+            raise TypeError(f"Only Ward can be snapshot, got {type(ward).__name__}")
+        self.ward = ward.export_state()
+        self.streams = self.stream_state(ward.streams)
+
+    @property
+    def time(self) -> int:
+        return self.ward["time"]
+
+    @property
+    def primary_cases(self) -> int:
+        return self.ward["primary_cases"]
+
+    @property
+    def secondary_cases(self) -> int:
+        return self.ward["secondary_cases"]
+
+    @staticmethod
+    def stream_state(streams: RandomStreams) -> Dict[str, object]:
+        return {
+            "seed": streams.seed,
+            "generators": {name: generator.bit_generator.state
+                           for name, generator in streams.generators.items()},
+            "buffers": {name: (buffer.buffer[buffer.position:].copy(), buffer.refilled,
+                               buffer.block_size)
+                        for name, buffer in streams.buffers.items()},
+        }
+
+    def restore_streams(self) -> RandomStreams:
+        """Random streams in the state they were in at the snapshot"""
+        state = self.streams
+        buffers = state["buffers"]
+        streams = RandomStreams(state["seed"], next(iter(buffers.values()))[2])
+        for name, generator in streams.generators.items():
+            generator.bit_generator.state = state["generators"][name]
+        for name, buffer in streams.buffers.items():
+            values, buffer.refilled, buffer.block_size = buffers[name]
+            buffer.buffer = values.copy()
+            buffer.position = 0
+        return streams
+
+    def restore(self, params: Parameters = None, streams: RandomStreams = None) -> Ward:
+        """New Ward in the state of the snapshot
+
+        Parameters
+        ----------
+        params : Parameters, optional
+            Parameters of the branch, by default those of the snapshot.
+            Screenings are scheduled with the new screen_interval from the
+            snapshot day, results already due keep their day
+        streams : RandomStreams, optional
+            Random streams of the branch, by default the streams in their
+            state at the snapshot, so every branch draws the same numbers
+            (common random numbers)
+
+        Returns
+        -------
+        Ward
+            Ward on the snapshot day, with new Bay and Patient objects
+        """
+        from .ward import Ward
+        return Ward.from_state(self.ward, params, streams if streams is not None
+                               else self.restore_streams())
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class SumTree:
+
+    def __init__(self, size: int):
+        """Binary tree of non negative weights with O(log n) updates and
+        sampling proportional to the weights.
+
+        Leaves are stored in the second half of `nodes` and every inner node
+        holds the sum of its two children. Inner nodes are recomputed from
+        their children on update, so sums do not drift.
+
+        Parameters
+        ----------
+        size : int
+            Number of leaves
+        """
+        self.size = size
+        self.capacity = 1
+        while self.capacity < size:
+            self.capacity *= 2
+        self.nodes = np.zeros(2 * self.capacity)
+
+    @property
+    def total(self) -> float:
+        return self.nodes[1]
+
+    def __getitem__(self, index: int) -> float:
+        return self.nodes[self.capacity + index]
+
+    def __setitem__(self, index: int, value: float):
+        node = self.capacity + index
+        self.nodes[node] = value
+        node //= 2
+        while node:
+            self.nodes[node] = self.nodes[2 * node] + self.nodes[2 * node + 1]
+            node //= 2
+
+    def find(self, value: float) -> int:
+        """Leaf where the running sum of the weights passes `value`, a value
+        uniform in [0, total) picks a leaf proportionally to its weight"""
+        node = 1
+        while node < self.capacity:
+            left = self.nodes[2 * node]
+            if value < left:
+                node = 2 * node
+            else:
+                value -= left
+                node = 2 * node + 1
+        # Rounding can step past the last positive leaf
+        index = node - self.capacity
+        while self.nodes[self.capacity + index] <= 0 and index > 0:
+            index -= 1
+        return index
@@ -0,0 +1,45 @@
+from typing import Any, List
+
+
+class TimingWheel:
+
+    def __init__(self, size: int = 64):
+        """Calendar of items due on absolute days, stored in a ring of buckets.
+
+        An item due on `day` goes to bucket day % size, so adding and taking
+        the items of a day only touches one bucket. Items due more than
+        `size` days ahead share a bucket with nearer ones and stay there
+        until their own day comes round. `pop` has to be called for every
+        day in order, items of a skipped day are returned the next time
+        their bucket is popped.
+
+        Parameters
+        ----------
+        size : int, optional
+            Number of buckets, by default 64 (longer than most stays)
+        """
+        self.size = size
+        self.slots: List[list] = [[] for _ in range(size)]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, day: int, item: Any):
+        """Schedule an item on an absolute day"""
+        self.slots[day % self.size].append((day, item))
+        self.count += 1
+
+    def pop(self, day: int) -> List[Any]:
+        """Take the items due on (or before) `day`, in scheduling order"""
+        slot = self.slots[day % self.size]
+        if not slot:
+            return []
+        due = [item for item_day, item in slot if item_day <= day]
+        if len(due) != len(slot):
+            self.slots[day % self.size] = [
+                (item_day, item) for item_day, item in slot if item_day > day]
+        else:
+            self.slots[day % self.size] = []
+        self.count -= len(due)
+        return due
@@ -0,0 +1,34 @@
+"""Plots of the simulation inputs. Imports matplotlib, so the rest of the
+package never imports this module at import time (see
+`PatientGenerator.show_admit`)."""
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+from matplotlib import pyplot as plt
+
+if TYPE_CHECKING:
+    from .patient import PatientGenerator
+
+
+def show_admit(generator: PatientGenerator):
+    """Show admission rate distribution"""
+    dist_pos = generator.admission_dist
+    size = np.array(dist_pos, dtype=object).size
+    print(size)
+    plt.hist(dist_pos, weights=np.ones(size) / size)
+    plt.title("Poisson Discrete")
+    plt.xlabel("Num of patient admited each day")
+    plt.ylabel("Probability distribution")
+    plt.show()
+
+
+def show_length_stay(generator: PatientGenerator):
+    """Show length of stay distribution"""
+    dist_gamma = generator.length_stay_dist
+    size = np.array(dist_gamma, dtype=object).size
+    print(size)
+    plt.hist(dist_gamma, weights=np.ones(size) / size)
+    plt.title("Gamma Distribution")
+    plt.xlabel("Length of stay ")
+    plt.ylabel("Probability distribution")
+    plt.show()
@@ -1,7 +1,15 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Dict, List
+from bisect import bisect_left, insort
+import heapq
+import math
 from agents_enviroments.movement_strategy import MovementStrategy
 from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams
+from agents_enviroments.timing_wheel import TimingWheel
+from agents_enviroments.history import DayRecord
+from agents_enviroments.profiler import Profiler
+from agents_enviroments.patient_table import NONE, TRANSFER_DTYPE, decode_patients, encode_patients
 import numpy as np
 
 if TYPE_CHECKING:
@@ -10,11 +18,94 @@ if TYPE_CHECKING:
     from .history import History
 
 
+TRANSMISSION_MODES = ("pairwise", "hazard")
+# Patient state of `Ward.export_state`: the bay index (in ward order), the
+# columns of a transfer and the day of the next healing draw of patients
+# in treatment
+STATE_DTYPE = np.dtype([("bay", np.int32)] +
+                       [(name, TRANSFER_DTYPE[name]) for name in TRANSFER_DTYPE.names
+                        if name not in ("source", "ward")] +
+                       [("treatment_day", np.int64)])
+# Patient dicts of the Ward whose order sets the order of the draws
+ORDERED = ("_suc_patients", "_col_patients", "_detected_patients", "_to_isolate",
+           "_pending_treatment")
+
+
+def bay_hazard(params: Parameters, n_bay, undetected, detected, n_ward):
+    """Total transmission hazard felt by a suceptible patient in each bay.
+
+    Summing the pairwise rates of `Ward.transmission_prob` over every colonised
+    patient gives, for a suceptible patient in bay b,
+
+        C * V * (m * w_b / (n_b - 1) + (1 - m) * W / (n_ward - 1))
+
+    where w_b = undetected_b + k * detected_b and W is the sum of w_b over the
+    ward. Counts are taken along the last axis so a leading axis can be used
+    to evaluate several wards at once.
+
+    Parameters
+    ----------
+    params : Parameters
+        Ward parameters (C, V, m and k are used)
+    n_bay : ndarray
+        Number of patients in each bay
+    undetected : ndarray
+        Number of colonised patients in each bay not under decolonisation
+    detected : ndarray
+        Number of colonised patients in each bay under decolonisation
+    n_ward : int or ndarray
+        Number of patients in the ward
+
+    Returns
+    -------
+    ndarray
+        Hazard for a suceptible patient in each bay
+    """
+    n_bay = np.asarray(n_bay, dtype=float)
+    weight = np.asarray(undetected, dtype=float) + \
+        params.k * np.asarray(detected, dtype=float)
+    weight_ward = weight.sum(axis=-1, keepdims=True)
+    n_ward = np.reshape(np.asarray(n_ward, dtype=float),
+                        weight_ward.shape)
+    # A bay (or ward) holding only the suceptible patient has no colonised
+    # patients either, so the empty terms are simply zero
+    same_bay = np.divide(weight, n_bay - 1, out=np.zeros_like(weight),
+                         where=n_bay > 1)
+    other = np.divide(weight_ward, n_ward - 1,
+                      out=np.zeros_like(weight_ward), where=n_ward > 1)
+    return params.C * params.V * (params.m * same_bay + (1 - params.m) * other)
+
+
 class Ward:
 
-    def __init__(self, bays: List[Bay], params: Parameters):
+    def __init__(self, bays: List[Bay], params: Parameters, transmission_mode: str = "pairwise",
+                 streams: RandomStreams = None, debug: bool = False):
+        """Ward of bays and the patients inside them
+
+        Parameters
+        ----------
+        bays : List[Bay]
+            Bays (and isolation bays) of the ward, in admission order
+        params : Parameters
+            Model parameters
+        transmission_mode : str, optional
+            How `generate_transmission` draws new infections, either
+            "pairwise" (every suceptible/colonised pair) or "hazard"
+            (one batched draw from per bay counts), by default "pairwise"
+        streams : RandomStreams, optional
+            Random streams of the run, by default streams seeded from the
+            global NumPy random state
+        debug : bool, optional
+            Recount every patient after each phase and raise if the
+            incremental counters disagree, by default False
+        """
+        if transmission_mode not in TRANSMISSION_MODES:
+            raise ValueError(
+                f"Unknown transmission mode {transmission_mode}, expected one of {TRANSMISSION_MODES}")
         self.bays = bays
         self.params = params
+        self.transmission_mode = transmission_mode
+        self.streams = streams if streams is not None else RandomStreams()
         # Dynamic Atributes in ward for Patients Status
         self.primary_cases = 0
         self.secondary_cases = 0
@@ -25,58 +116,307 @@ class Ward:
         self.patients_removed: List[Patient] = []
         self.healed_patients: List[Patient] = []
         self.time = 0
+        self.debug = debug
+        # Set a Profiler to time the phases of `step`
+        self.profiler: Profiler = None
+        self.index_bays()
+
+    def index_bays(self):
+        """Cache the bay layout, count and schedule the patients already inside
+        the bays. Bays then report every admission, removal and status change
+        to `count_patient`, so the totals below are kept up to date.
+
+        Patients in the ward follow the ward clock (see `Patient.start_clock`)
+        and their discharge, screenings, results and healing draws are kept
+        in timing wheels keyed by ward day, so each phase only visits the
+        patients due that day.
+        """
+        from .bay import Bay
+        self._isobays = [bay for bay in self.bays if bay.is_isobay]
+        self._non_isobays = [bay for bay in self.bays if not bay.is_isobay]
+        self._capacity = sum(bay.capacity for bay in self.bays)
+        self.bay_index = {id(bay): i for i, bay in enumerate(self.bays)}
+        self._total_patients = 0
+        self._total_col_patients = 0
+        self._suc_patients: Dict[int, Patient] = {}
+        self._col_patients: Dict[int, Patient] = {}
+        self._detected_patients: Dict[int, Patient] = {}
+        # Detected (or awaiting result) patients outside the isolation bays
+        self._to_isolate: Dict[int, Patient] = {}
+        # Sorted indexes of the bays with a free bed
+        self._open_bays: List[int] = []
+        self._open_isobays: List[int] = []
+        self.discharges = TimingWheel()
+        self.screenings = TimingWheel()
+        self.results = TimingWheel()
+        self.treatments = TimingWheel()
+        # Detected patients that have not started treatment, and the day of
+        # the next healing draw of the patients in treatment
+        self._pending_treatment: Dict[int, Patient] = {}
+        self._in_treatment: Dict[int, int] = {}
+        for bay in self.bays:
+            self.update_bay(bay)
+            if isinstance(bay, Bay):
+                if bay.ward is not None:
+                    for patient in bay.patients:
+                        patient.stop_clock(bay.ward.time)
+                bay.ward = self
+                for patient in bay.patients:
+                    self.count_patient(patient, 1)
+                    patient.start_clock(self.time)
+                    self.schedule_patient(patient, first_day=self.time)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Copied bays are new objects
+        self.bay_index = {id(bay): i for i, bay in enumerate(self.bays)}
+        from .bay import Bay
+        for bay in self.bays:
+            if isinstance(bay, Bay):
+                bay.ward = self
+
+    def export_state(self) -> dict:
+        """State of the ward between two days (after `forward_time`), as
+        arrays and numbers that pickle cheaply, see `from_state`.
+
+        Patients are packed into one STATE_DTYPE array in bed order. Timing
+        wheels and counters are not exported, `from_state` rebuilds them
+        with `index_bays`, only the order of the ORDERED patient dicts
+        (which sets the order of the draws) is kept, as rows of the patient
+        array. Random streams are not part of the state. Subclasses keeping
+        more state must extend both methods.
+        """
+        patients = self.patients
+        state = encode_patients(patients, NONE)
+        rows = np.zeros(len(patients), dtype=STATE_DTYPE)
+        for name in STATE_DTYPE.names:
+            if name in state.dtype.names:
+                rows[name] = state[name]
+        rows["bay"] = [self.bay_index[id(patient.location)] for patient in patients]
+        rows["treatment_day"] = [self._in_treatment.get(patient.id, NONE)
+                                 for patient in patients]
+        index = {patient.id: row for row, patient in enumerate(patients)}
+        return {
+            "params": self.params,
+            "transmission_mode": self.transmission_mode,
+            "time": self.time,
+            "primary_cases": self.primary_cases,
+            "secondary_cases": self.secondary_cases,
+            "isobays": np.array([bay.is_isobay for bay in self.bays]),
+            "capacities": np.array([bay.capacity for bay in self.bays], dtype=np.int32),
+            "patients": rows,
+            "orders": {name: np.array([index[patient_id] for patient_id in getattr(self, name)],
+                                      dtype=np.int32)
+                       for name in ORDERED},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, params: Parameters = None, streams: RandomStreams = None):
+        """New ward in a state of `export_state`, with new Bay and Patient objects
+
+        Parameters
+        ----------
+        state : dict
+            State returned by `export_state`
+        params : Parameters, optional
+            Parameters of the new ward, by default those of the state.
+            Screenings are scheduled with the new screen_interval from the
+            state day, results already due keep their day
+        streams : RandomStreams, optional
+            Random streams of the new ward, see `__init__`
+        """
+        from .bay import Bay, IsolationBay
+        bays = [IsolationBay() if is_isobay else Bay(int(capacity))
+                for is_isobay, capacity in zip(state["isobays"], state["capacities"])]
+        patients = decode_patients(state["patients"])
+        for patient, bay in zip(patients, state["patients"]["bay"]):
+            bays[bay].add_patient(patient)
+        ward = cls([], params if params is not None else state["params"],
+                   transmission_mode=state["transmission_mode"], streams=streams)
+        ward.time = state["time"]
+        ward.primary_cases = state["primary_cases"]
+        ward.secondary_cases = state["secondary_cases"]
+        ward.bays = bays
+        ward.index_bays()
+        # index_bays counts the patients in bed order and sends every
+        # detected patient to treatment, put back the order and the
+        # treatment state of the export
+        for name, order in state["orders"].items():
+            setattr(ward, name, {patients[row].id: patients[row] for row in order})
+        for patient, day in zip(patients, state["patients"]["treatment_day"]):
+            if day != NONE:
+                ward._schedule_treatment(patient, int(day))
+        return ward
+
+    def count_patient(self, patient: Patient, sign: int):
+        """Add (sign=1) or remove (sign=-1) a patient from the ward counters"""
+        colonised = patient.colonisation_status == 1
+        self._total_patients += sign
+        self._total_col_patients += sign * colonised
+        group = self._col_patients if colonised else self._suc_patients
+        if sign > 0:
+            group[patient.id] = patient
+            if patient.detection_status == 1:
+                self._detected_patients[patient.id] = patient
+                if patient.id not in self._in_treatment:
+                    self._pending_treatment[patient.id] = patient
+            if patient.detection_status != 0 and not patient.location.is_isobay:
+                self._to_isolate[patient.id] = patient
+        else:
+            del group[patient.id]
+            self._detected_patients.pop(patient.id, None)
+            self._to_isolate.pop(patient.id, None)
+
+    def patient_added(self, patient: Patient):
+        """Called by a bay after adding a patient (admission or move)"""
+        patient.start_clock(self.time)
+        self.update_bay(patient.location)
+        # Scheduling again after a move gives the same days, duplicates are
+        # dropped when the day comes
+        self.schedule_patient(patient)
+
+    def patient_removed(self, patient: Patient, moving: bool = False):
+        """Called by a bay after removing a patient (discharge or `moving`
+        to another bay)"""
+        patient.stop_clock(self.time)
+        self.update_bay(patient.location)
+        if not moving:
+            # Entries left in the timing wheels are dropped when their day
+            # comes, the treatment state goes with the patient
+            self._in_treatment.pop(patient.id, None)
+            self._pending_treatment.pop(patient.id, None)
+
+    def schedule_patient(self, patient: Patient, first_day: int = None):
+        """Schedule the discharge, screenings and pending result of a patient
+        from `first_day`, by default tomorrow as patients enter the ward
+        after the discharge, screening and result phases of the day
+        """
+        if first_day is None:
+            first_day = self.time + 1
+        self.schedule_discharge(patient, first_day)
+        self.schedule_screening(patient, first_day)
+        if patient.detection_status == 2 and patient.result_time is not None:
+            result_day = self.time + patient.result_time - patient.time
+            if result_day >= first_day:
+                self.results.add(result_day, patient)
+
+    def schedule_discharge(self, patient: Patient, first_day: int):
+        """Schedule the first day from `first_day` with int(length_stay - time) == 0"""
+        start = patient.time + first_day - self.time
+        day = max(start, math.floor(patient.length_stay))
+        if day < patient.length_stay + 1:
+            self.discharges.add(self.time + day - patient.time, patient)
+
+    def schedule_screening(self, patient: Patient, first_day: int):
+        """Schedule the first day from `first_day` with time % screen_interval == 1"""
+        interval = self.params.screen_interval
+        if interval <= 1:
+            return
+        start = patient.time + first_day - self.time
+        day = start + (1 - start) % interval
+        self.screenings.add(self.time + day - patient.time, patient)
+
+    def has_patient(self, patient: Patient) -> bool:
+        """Check that the patient is in a bay of this ward"""
+        bay = patient.location
+        return bay is not None and bay.ward is self and bay.index.get(patient.id) is patient
+
+    def bed_order(self, patient: Patient):
+        """Sort key following the order of `patients`"""
+        bay = patient.location
+        return self.bay_index[id(bay)], bay.patients.index(patient)
+
+    def _in_bed_order(self, patients: List[Patient]) -> List[Patient]:
+        """Patients still in the ward without duplicates, in the order of `patients`"""
+        unique = {patient.id: patient for patient in patients if self.has_patient(patient)}
+        return sorted(unique.values(), key=self.bed_order)
+
+    def update_bay(self, bay: Bay):
+        """Keep the free bed indexes up to date after a bay admits or discharges"""
+        index = self.bay_index[id(bay)]
+        open_bays = self._open_isobays if bay.is_isobay else self._open_bays
+        position = bisect_left(open_bays, index)
+        is_open = position < len(open_bays) and open_bays[position] == index
+        if bay.is_full and is_open:
+            del open_bays[position]
+        elif not bay.is_full and not is_open:
+            insort(open_bays, index)
+
+    def free_isobays(self) -> List[Bay]:
+        """Isolation bays with a free bed, in ward order"""
+        return [self.bays[index] for index in self._open_isobays]
+
+    def isolation_candidates(self, limit: int = None) -> List[Patient]:
+        """First `limit` patients outside isolation with a detection status
+        (detected or awaiting a result), in the order of `patients`
+        """
+        if limit is None:
+            return sorted(self._to_isolate.values(), key=self.bed_order)
+        return heapq.nsmallest(limit, self._to_isolate.values(), key=self.bed_order)
+
+    def check_counters(self):
+        """Recount every patient and raise if an incremental counter disagrees"""
+        for bay in self.bays:
+            bay.check_counters()
+        patients = [patient for bay in self.bays for patient in bay.patients]
+        counted = {
+            "total_patients": (self.total_patients, len(patients)),
+            "total_col_patients": (self.total_col_patients,
+                                   sum(patient.colonisation_status == 1 for patient in patients)),
+            "suc_patients": (self.suc_patients,
+                             [patient for patient in patients if patient.colonisation_status != 1]),
+            "col_patients": (self.col_patients,
+                             [patient for patient in patients if patient.colonisation_status == 1]),
+            "detected_patients": (self.detected_patients,
+                                  [patient for patient in patients if patient.detection_status == 1]),
+            "isolation_candidates": (self.isolation_candidates(),
+                                     [patient for patient in patients
+                                      if patient.detection_status != 0 and not patient.location.is_isobay]),
+            "free_isobays": (self.free_isobays(),
+                             [bay for bay in self.isobays if not bay.is_full]),
+            "open_bays": ([self.bays[index] for index in self._open_bays],
+                          [bay for bay in self.non_isobays if not bay.is_full]),
+        }
+        for name, (value, expected) in counted.items():
+            if isinstance(value, list):
+                # Compare membership, the incremental orders may differ
+                value = {item.id for item in value}
+                expected = {item.id for item in expected}
+            if value != expected:
+                raise Exception(
+                    f"Ward counter {name} is {value}, recount gives {expected}")
+
+    def _debug_check(self):
+        if self.debug:
+            self.check_counters()
 
     @property
     def isobays(self) -> List[Bay]:
-        return [bay for bay in self.bays if bay.is_isobay]
+        return self._isobays
 
     @property
     def non_isobays(self) -> List[Bay]:
-        return [bay for bay in self.bays if not bay.is_isobay]
+        return self._non_isobays
 
     @property
     def capacity(self):
         """Total ward capacity"""
-        total_capacity = 0
-        for bay in self.bays:
-            total_capacity += bay.capacity
-        return total_capacity
+        return self._capacity
 
     @property
     def suc_patients(self) -> List[Patient]:
         """Suceptible patients inside bays in ward"""
-        patients = []
-        if not self.bays:
-            return patients
-        for bay in self.bays:
-            for patient in bay.patients:
-                if patient.colonisation_status == 0:
-                    patients.append(patient)
-        return patients
+        return list(self._suc_patients.values())
 
     @property
     def col_patients(self) -> List[Patient]:
         """Colonized patients inside bays in ward (detected)"""
-        col_patients = []
-        if not self.bays:
-            return col_patients
-        for bay in self.bays:
-            for patient in bay.patients:
-                if patient.colonisation_status == 1:
-                    col_patients.append(patient)
-        return col_patients
+        return list(self._col_patients.values())
 
     @property
     def detected_patients(self) -> List[Patient]:
         """Colonized patients inside bays in ward (detected)"""
-        det_patients = []
-        if not self.bays:
-            return det_patients
-        for bay in self.bays:
-            for patient in bay.patients:
-                if patient.detection_status == 1:
-                    det_patients.append(patient)
-        return det_patients
+        return list(self._detected_patients.values())
 
     @property
     def total_new_infections(self):
@@ -93,23 +433,14 @@ class Ward:
         return all_patients
 
     @property
-    def total_patients(self) -> List[Patient]:
+    def total_patients(self) -> int:
         """Total patients inside bays in ward"""
-        patients = 0
-        if not self.bays:
-            return 0
-        for bay in self.bays:
-            patients += bay.num_of_patients
-        return patients
+        return self._total_patients
 
     @property
-    def total_col_patients(self) -> List[Patient]:
+    def total_col_patients(self) -> int:
         """Total colonized patients inside bays in ward (detected)"""
-        col_patients = 0
-        for bay in self.bays:
-            for patient in bay.patients:
-                col_patients += patient.colonisation_status
-        return col_patients
+        return self._total_col_patients
 
     def admit_patient(self, patient: Patient):
         """Method for admiting patient.
@@ -125,27 +456,27 @@ class Ward:
             boolean if the patient is admited
         """
 
-        # Choose an available bay for patient i
-        from .bay import IsolationBay
-        for bay in self.bays:
-            if bay.is_full:
-                continue
-            if isinstance(bay, IsolationBay):
-                prob = self.params.isolation_prob
-                # Isolation bay probability
-                if np.random.choice([1, 0], p=[prob, 1 - prob]):
-                    bay.add_patient(patient)
-                else:
-                    continue
-            else:
-                bay.add_patient(patient)
-            # Check if patient is infected on admission
-            if patient.colonisation_status:
-                self.primary_cases += 1
-            return patient
-        else:
+        # Choose an available bay for patient i, in ward order: every open
+        # isolation bay before the first open bay takes the patient with
+        # isolation_prob, otherwise the first open bay does
+        first_open = self._open_bays[0] if self._open_bays else len(self.bays)
+        chosen = None
+        for index in self._open_isobays:
+            if index > first_open:
+                break
+            if self.streams.admission.next() < self.params.isolation_prob:
+                chosen = self.bays[index]
+                break
+        if chosen is None and self._open_bays:
+            chosen = self.bays[first_open]
+        if chosen is None:
             # All bays are full / not available
             return None
+        chosen.add_patient(patient)
+        # Check if patient is infected on admission
+        if patient.colonisation_status:
+            self.primary_cases += 1
+        return patient
 
     def admit_patients(self, patients: List[Patient]) -> int:
         """Same as admit_patient but takes an array and updates history
@@ -166,18 +497,22 @@ class Ward:
             else:
                 patients_admited.append(patient_admited)
         self.new_patients = patients_admited
+        self._debug_check()
         return patients_not_admited
 
     def remove_patients(self) -> int:
         """Discharge/remove patients when length of stay is met
         """
         patients_removed = []
-        for bay in self.bays:
-            for patient in bay.patients:
-                if patient.remaining_stay == 0:
-                    bay.remove_patient(patient)
-                    patients_removed.append(patient)
+        for patient in self._in_bed_order(self.discharges.pop(self.time)):
+            if patient.remaining_stay == 0:
+                patient.location.remove_patient(patient)
+                patients_removed.append(patient)
+            else:
+                # Length of stay changed since admission
+                self.schedule_discharge(patient, self.time + 1)
         self.patients_removed = patients_removed
+        self._debug_check()
         return patients_removed
 
     def transmission_prob(self, patient_c: Patient, patient_s: Patient):
@@ -225,12 +560,22 @@ class Ward:
     @staticmethod
     def exp_trans_prob(lambda_t):
         """Exponential form of probability function"""
-        return 1 - np.math.exp(-lambda_t)
+        return 1 - math.exp(-lambda_t)
 
     def generate_transmission(self):
         """Generate the transmission reaction for each patient inside the ward.
         This function generates new infections. (Undetected)
         """
+        if self.transmission_mode == "hazard":
+            new_infections = self.hazard_transmission()
+        else:
+            new_infections = self.pairwise_transmission()
+        self.new_infections = new_infections
+        self.secondary_cases += len(new_infections)
+        self._debug_check()
+
+    def pairwise_transmission(self) -> List[Patient]:
+        """Draw every suceptible/colonised pair, the first successful pair infects"""
         new_infections = []
         suc_patient_arr = self.suc_patients
         col_patient_arr = self.col_patients
@@ -238,27 +583,95 @@ class Ward:
             for col_patient in col_patient_arr:
                 trans_prob = self.exp_trans_prob(
                     self.transmission_prob(col_patient, suc_patient))
-                new_infection = suc_patient.infect_prob(trans_prob)
+                new_infection = suc_patient.infect_prob(
+                    trans_prob, self.streams.transmission)
                 if new_infection:
                     new_infections.append(new_infection)
                     break
             continue
-        self.new_infections = new_infections
-        self.secondary_cases += len(new_infections)
-        return
+        return new_infections
+
+    def hazard_transmission(self) -> List[Patient]:
+        """Draw all new infections at once from per bay colonised counts.
+
+        The pairwise loop infects a suceptible patient unless every pair
+        fails, which happens with probability prod(exp(-lambda_c)) =
+        exp(-sum(lambda_c)). Colonised patients are fixed at the start of the
+        day, so suceptible patients are infected independently with
+        1 - exp(-hazard) in both modes. The distribution of `new_infections`
+        is the same, only the random stream differs so seeded runs are not
+        identical between modes.
+        """
+        suc_patient_arr = self.suc_patients
+        if not suc_patient_arr:
+            return []
+        n_bay = np.array([bay.num_of_patients for bay in self.bays])
+        colonised = np.array([bay.num_of_colonised for bay in self.bays])
+        detected = np.array([bay.num_of_decolonising for bay in self.bays])
+        suc_bay = [self.bay_index[id(patient.location)]
+                   for patient in suc_patient_arr]
+        hazard = bay_hazard(self.params, n_bay, colonised - detected,
+                            detected, self.total_patients)
+        infect_prob = 1 - np.exp(-hazard[suc_bay])
+        infected = self.streams.transmission.take(
+            len(suc_patient_arr)) < infect_prob
+        new_infections = []
+        for patient, is_infected in zip(suc_patient_arr, infected):
+            if is_infected:
+                patient.colonisation_status = 1
+                new_infections.append(patient)
+        return new_infections
 
     def generate_treatment(self, discharge_healed=True):
-        """Generate treatment for each patient and remove if patient is healed"""
+        """Generate treatment for each patient and remove if patient is healed.
+        Newly detected patients start treatment and get their first healing
+        draw once `treatment_time` has run down (see `Patient.give_treatment`),
+        the countdown itself is only written back on that day.
+        """
         healed_patients = []
-        for bay in self.bays:
-            for patient in bay.patients:
-                if patient.detection_status == 1:
-                    healed = patient.give_treatment(self.params.treatment_prob)
-                    if healed:
-                        healed_patients.append(healed)
-                        if discharge_healed:
-                            healed.location.remove_patient(healed)
+        due = self.treatments.pop(self.time)
+        for patient in self._pending_treatment.values():
+            if patient.detection_status != 1 or not self.has_patient(patient):
+                continue
+            if patient.treatment_time == 0:
+                self._in_treatment[patient.id] = self.time
+                due.append(patient)
+            else:
+                patient.give_treatment(self.params.treatment_prob)
+                self._schedule_treatment(
+                    patient, self.time + patient.treatment_time + 1)
+        self._pending_treatment = {}
+        for patient in self._in_bed_order(due):
+            if patient.detection_status != 1 or patient.id not in self._in_treatment:
+                self._in_treatment.pop(patient.id, None)
+                continue
+            patient.treatment_time = 0
+            healed = patient.give_treatment(
+                self.params.treatment_prob, self.streams.treatment)
+            if healed:
+                del self._in_treatment[healed.id]
+                healed_patients.append(healed)
+                if discharge_healed:
+                    healed.location.remove_patient(healed)
+            else:
+                self._schedule_treatment(patient, self.time + 1)
         self.healed_patients = healed_patients
+        self._debug_check()
+
+    def _schedule_treatment(self, patient: Patient, day: int):
+        self._in_treatment[patient.id] = day
+        self.treatments.add(day, patient)
+
+    def transfer_patient(self, patient: Patient) -> Patient:
+        """Take a patient out of the ward to move them to another ward.
+        The treatment countdown, only written back on the day of the healing
+        draw, is brought up to date so the other ward carries on with it.
+        """
+        draw_day = self._in_treatment.pop(patient.id, None)
+        if draw_day is not None:
+            patient.treatment_time = max(int(draw_day - self.time), 0)
+        patient.location.remove_patient(patient)
+        return patient
 
     def screen_patients(self):
         """Screen each patient in ward is patient is not screened yet
@@ -267,35 +680,121 @@ class Ward:
         screened_patients = []
         result_length = self.params.result_length
         screen_interval = self.params.screen_interval
-        for bay in self.bays:
-            for patient in bay.patients:
-                screened_patient = patient.screen_test(
-                    length=result_length, interval=screen_interval)
-                if screened_patient:
-                    screened_patients.append(screened_patient)
+        for patient in self._in_bed_order(self.screenings.pop(self.time)):
+            screened_patient = patient.screen_test(
+                length=result_length, interval=screen_interval)
+            if screened_patient:
+                screened_patients.append(screened_patient)
+                self.results.add(self.time + result_length, patient)
+            self.schedule_screening(patient, self.time + 1)
         self.screened_patients = screened_patients
+        self._debug_check()
 
     def get_patient_results(self):
         """Get the result if available.
         This might change the patient detection status
          """
         detected_patients = []
-        for bay in self.bays:
-            for patient in bay.patients:
-                detected = patient.get_result()
-                if detected:
-                    detected_patients.append(detected)
+        for patient in self._in_bed_order(self.results.pop(self.time)):
+            detected = patient.get_result()
+            if detected:
+                detected_patients.append(detected)
         self.new_detected_patients = detected_patients
+        self._debug_check()
 
     def move_patients(self, movement_strategy: MovementStrategy):
         movement_strategy.move_patients(self)
+        self._debug_check()
 
     def forward_time(self):
-        """Forward all patient time"""
+        """Forward all patient time, patients in the ward follow the ward clock"""
         self.time += 1
-        for bay in self.bays:
-            for patient in bay.patients:
-                patient.time += 1
+
+    def step(self, arrivals: List[Patient], strategies: List[MovementStrategy] = ()) -> DayRecord:
+        """Simulate one day: every phase in order, then forward time.
+
+        Phases only visit the patients due that day (see `index_bays`) and
+        the record is read from the counters the phases keep, so a day costs
+        no full pass over the ward. Same output as calling the phases one by
+        one. With a `profiler` set, each phase is timed in it with the
+        patients it acts on and the random numbers it draws.
+
+        Parameters
+        ----------
+        arrivals : List[Patient]
+            Patients arriving today
+        strategies : List[MovementStrategy], optional
+            Movement strategies applied after treatment, in order
+
+        Returns
+        -------
+        DayRecord
+            The day's History row, see `History.add_record`
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start("step")
+        self._phase("remove_patients", self.remove_patients)
+        self._phase("screen_patients", self.screen_patients)
+        self._phase("get_patient_results", self.get_patient_results)
+        self._phase("admit_patients", self.admit_patients, arrivals)
+        if profiler is not None:
+            # Pairs are drawn until one infects, so the product only bounds
+            # the pairs evaluated (one transmission draw each)
+            suceptible = self.total_patients - self.total_col_patients
+            if self.transmission_mode == "pairwise":
+                profiler.count("generate_transmission.pairs_bound",
+                               suceptible * self.total_col_patients)
+            else:
+                profiler.count("generate_transmission.patients", suceptible)
+        self._phase("generate_transmission", self.generate_transmission)
+        self._phase("generate_treatment", self.generate_treatment)
+        for strategy in strategies:
+            self._phase(str(strategy), self.move_patients, strategy)
+        if profiler is None:
+            record = self.day_record()
+            self.forward_time()
+            return record
+        profiler.start("day_record")
+        record = self.day_record()
+        self.forward_time()
+        profiler.stop()
+        profiler.stop()
+        profiler.count("remove_patients.patients", len(self.patients_removed))
+        profiler.count("screen_patients.patients", len(self.screened_patients))
+        profiler.count("get_patient_results.patients", len(self.new_detected_patients))
+        profiler.count("admit_patients.patients", len(self.new_patients))
+        profiler.count("generate_treatment.patients", len(self.healed_patients))
+        return record
+
+    def _phase(self, name: str, phase, *args):
+        """Run a phase of `step`, inside a profiler phase counting its draws
+        when a profiler is set"""
+        if self.profiler is None:
+            phase(*args)
+            return
+        buffers = self.streams.buffers
+        drawn = {stream: buffer.drawn for stream, buffer in buffers.items()}
+        self.profiler.start(name)
+        phase(*args)
+        self.profiler.stop()
+        for stream, buffer in buffers.items():
+            if buffer.drawn != drawn[stream]:
+                self.profiler.count(f"{name}.draws.{stream}",
+                                    buffer.drawn - drawn[stream])
+
+    def day_record(self) -> DayRecord:
+        """State of the ward and the day's events as one History row"""
+        return DayRecord(
+            new_patients=len(self.new_patients),
+            colonized=self.total_col_patients,
+            new_infections=len(self.new_infections),
+            total=self.total_patients,
+            new_detected=len(self.new_detected_patients),
+            screened=len(self.screened_patients),
+            healed=len(self.healed_patients),
+            removed=len(self.patients_removed),
+        )
 
     def history_dict(self):
         "Save the state of the ward and patients to history in dictionary"
@@ -2,16 +2,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import sys
+from results_store import read_summaries
 
 # %%
 var = sys.argv[1]
-df = pd.read_csv("output_{}.csv".format(var))
+# Mean secondary / primary cases of each value, aggregated by the sweep
+df = read_summaries(var, "secondary_per_primary")
 df.head()
 
 # %%
-df["ratio_ps"] = df["secondary_cases"] / df["primary_cases"]
-df["ratio_ps"].head()
-
-# %%
-df.groupby("{}".format(var))["ratio_ps"].mean().plot()
+df.set_index("value")["mean"].plot()
 plt.show()
@@ -1,19 +1,17 @@
 # %%
 import pandas as pd
 import matplotlib.pyplot as plt
+from results_store import read_summaries
 
 # %%
-df = pd.read_csv("output_strategies.csv")
+# Mean secondary / primary cases of each strategy, aggregated by the sweep
+df = read_summaries("strategies", "secondary_per_primary")
 df.head()
 
 # %%
-strategies = df["strategy"].unique()
+strategies = df["value"].unique()
 
 # %%
-df["ratio_ps"] = df["secondary_cases"] / df["primary_cases"]
-df["ratio_ps"].head()
-
-# %%
-result = df.groupby("strategy")["ratio_ps"].mean().sort_values().values
+result = df.set_index("value")["mean"].sort_values().values
 name = ["No Intervention", "Group", "Isolate", "Group and Isolate"]
 plt.barh(y=name, width=result)
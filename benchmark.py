@@ -0,0 +1,313 @@
+"""Benchmarks of the Ward phases and of whole runs.
+
+    python benchmark.py run --output baseline.json
+    python benchmark.py run --output new.json
+    python benchmark.py compare baseline.json new.json
+    python benchmark.py imports
+
+Each Ward case is a ward warmed up for WARMUP days, then copied and run for
+DAYS more days with every phase timed on its own, so the time of a phase is
+its time per simulated day. Warm-up uses the hazard transmission mode, which
+reaches the same kind of ward state much faster than pairwise on big wards.
+`compare` exits with status 1 when a benchmark got slower than the threshold.
+
+`imports` times the import of the modules worker processes load, with
+python -X importtime in a fresh interpreter, and exits with status 1 when
+one is over its budget or loads a plotting or analysis library.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from copy import deepcopy
+from statistics import median
+from typing import Dict, List
+import numpy as np
+import agents_enviroments
+import main
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.profiler import Profiler
+
+# (bays, isolation bays) of each ward size, from the default ward to 1,000 beds
+SIZES = {
+    "16_bays": (10, 6),
+    "264_beds": (40, 24),
+    "1000_beds": (160, 40),
+}
+# Admissions relative to the default load of 5 patients a day for 66 beds
+LOADS = (0.5, 1, 2)
+WARMUP = 30
+DAYS = 8
+GROUP = GroupInfectedStrategy()
+ISOLATE = IsolateInfectedStrategy()
+# Phases of Ward.step in order, screen_patients and get_patient_results
+# are timed together
+PHASES = {
+    "remove_patients": lambda ward, patients: ward.remove_patients(),
+    "screen_patients": lambda ward, patients: (ward.screen_patients(), ward.get_patient_results()),
+    "admit_patients": lambda ward, patients: ward.admit_patients(patients),
+    "generate_transmission": lambda ward, patients: ward.generate_transmission(),
+    "generate_treatment": lambda ward, patients: ward.generate_treatment(),
+    "GroupInfectedStrategy": lambda ward, patients: ward.move_patients(GROUP),
+    "IsolateInfectedStrategy": lambda ward, patients: ward.move_patients(ISOLATE),
+}
+END_TO_END = {
+    "NoStrategies": {"strategies": []},
+    "Group_Isolate": {"strategies": [GroupInfectedStrategy(), IsolateInfectedStrategy()]},
+}
+# Import time budget in seconds of the modules a worker process imports
+# (with the spawn start method, the script started too)
+IMPORT_BUDGETS = {
+    "agents_enviroments": 0.5,
+    "main": 0.8,
+    "design": 0.8,
+}
+# Packages the worker modules must not import at import time
+HEAVY_IMPORTS = ("matplotlib", "pandas", "tqdm")
+
+
+def make_ward(size: str, load: float, transmission_mode: str = "pairwise", seed: int = 0):
+    """Ward of one size after WARMUP days, and the arrivals of the DAYS after"""
+    num_of_bays, num_of_isobays = SIZES[size]
+    bays = [agents_enviroments.Bay() for _ in range(num_of_bays)] + \
+        [agents_enviroments.IsolationBay() for _ in range(num_of_isobays)]
+    beds = sum(bay.capacity for bay in bays)
+    params, _ = main.get_parameters({"V": 1.0})
+    streams = agents_enviroments.RandomStreams(seed)
+    generator = agents_enviroments.PatientGenerator(rng=streams.arrivals)
+    generator.set_var(poisson_lambda=5 * load * beds / 66, gamma_k=7, gamma_scale=1)
+    generator.set_col_length_dist(gamma_k=11, gamma_scale=1)
+    arrivals = generator.generate_arrivals(
+        colonized_prob=main.COLONIZED_PROB_ON_ADMIT, time=WARMUP + DAYS)
+    ward = agents_enviroments.Ward(bays, params=params, transmission_mode="hazard",
+                                   streams=streams)
+    for day in range(WARMUP):
+        ward.step(arrivals.patients(day), [GROUP, ISOLATE])
+    ward.transmission_mode = transmission_mode
+    return ward, arrivals
+
+
+def time_phases(ward, arrivals) -> Dict[str, float]:
+    """Seconds spent in each phase per day, over DAYS days of a copy of
+    `ward`, and per patient moved by each strategy (as "<strategy>/per_move")
+
+    The work of a strategy grows with the patients it moves, the time per
+    move shows whether a move gets slower on bigger wards.
+    """
+    ward = deepcopy(ward)
+    # Only the strategies report to the profiler outside of Ward.step, it
+    # counts their moves
+    ward.profiler = Profiler()
+    totals = dict.fromkeys(PHASES, 0.0)
+    for day in range(WARMUP, WARMUP + DAYS):
+        patients = arrivals.patients(day)
+        for name, phase in PHASES.items():
+            start = time.perf_counter()
+            phase(ward, patients)
+            totals[name] += time.perf_counter() - start
+        ward.forward_time()
+    times = {name: total / DAYS for name, total in totals.items()}
+    for strategy in (GROUP, ISOLATE):
+        moves = ward.profiler.counters[f"{strategy}.moves"]
+        if moves:
+            times[f"{strategy}/per_move"] = totals[str(strategy)] / moves
+    return times
+
+
+def summary(times: List[float]) -> dict:
+    return {"min": min(times), "median": median(times), "repeats": len(times)}
+
+
+def run_benchmarks(repeats: int = 5, quick: bool = False, pattern: str = "",
+                   transmission_mode: str = "pairwise") -> dict:
+    """Time every benchmark whose name contains `pattern`
+
+    Parameters
+    ----------
+    repeats : int, optional
+        Timings of each benchmark, by default 5
+    quick : bool, optional
+        Only the default ward size and load, by default False
+    pattern : str, optional
+        Substring of the benchmark names to run, by default every benchmark
+    transmission_mode : str, optional
+        Transmission mode of the Ward cases, by default "pairwise" as in
+        `main.run`
+
+    Returns
+    -------
+    dict
+        Environment under "meta" and {"min", "median", "repeats"} in
+        seconds for each benchmark under "benchmarks"
+    """
+    sizes = list(SIZES)[:1] if quick else list(SIZES)
+    loads = (1,) if quick else LOADS
+    benchmarks = {}
+    for size in sizes:
+        for load in loads:
+            prefix = f"ward/{size}/load_{load}/"
+            names = [prefix + phase for phase in PHASES]
+            if not any(pattern in name for name in names):
+                continue
+            ward, arrivals = make_ward(size, load, transmission_mode)
+            times = [time_phases(ward, arrivals) for _ in range(repeats)]
+            for phase in times[0]:
+                if pattern in prefix + phase:
+                    benchmarks[prefix + phase] = summary(
+                        [day[phase] for day in times])
+    for module in IMPORT_BUDGETS:
+        name = "import/" + module
+        if pattern in name:
+            benchmarks[name] = summary([import_time(module)[0] for _ in range(repeats)])
+    for name, mod in END_TO_END.items():
+        name = "main.run/" + name
+        if pattern not in name:
+            continue
+        times = []
+        for seed in range(repeats):
+            start = time.perf_counter()
+            main.run(1000 + seed, mod)
+            times.append(time.perf_counter() - start)
+        benchmarks[name] = summary(times)
+    meta = environment()
+    meta["transmission_mode"] = transmission_mode
+    return {"meta": meta, "benchmarks": benchmarks}
+
+
+def import_time(module: str) -> tuple:
+    """Import a module in a fresh interpreter with python -X importtime
+
+    Returns
+    -------
+    (float, set)
+        Seconds the import took (children included) and the names of
+        every module it imported
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, check=True)
+    seconds, modules = 0.0, set()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        modules.add(name)
+        if name == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, modules
+
+
+def check_imports(repeats: int = 3) -> List[str]:
+    """Problems of the import of each module of IMPORT_BUDGETS: over
+    budget (best of `repeats` imports) or importing HEAVY_IMPORTS"""
+    problems = []
+    for module, budget in IMPORT_BUDGETS.items():
+        times, modules = zip(*[import_time(module) for _ in range(repeats)])
+        print(f"{module}: {min(times) * 1e3:.1f}ms (budget {budget * 1e3:.0f}ms)")
+        if min(times) > budget:
+            problems.append(f"{module} imports in {min(times) * 1e3:.1f}ms, "
+                            f"over its budget of {budget * 1e3:.0f}ms")
+        heavy = sorted({name for name in modules[0] if name.split(".")[0] in HEAVY_IMPORTS})
+        if heavy:
+            problems.append(f"{module} imports {', '.join(heavy)}")
+    return problems
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(baseline: dict, new: dict, threshold: float = 0.1, stat: str = "median") -> List[tuple]:
+    """Compare two benchmark results
+
+    Returns
+    -------
+    List[tuple]
+        (name, baseline seconds, new seconds, ratio, flag) of the benchmarks
+        in both results, flag is "regression" when the ratio is above
+        1 + threshold, "improvement" below 1 / (1 + threshold), else ""
+    """
+    rows = []
+    for name, base in baseline["benchmarks"].items():
+        if name not in new["benchmarks"]:
+            continue
+        before, after = base[stat], new["benchmarks"][name][stat]
+        ratio = after / before if before > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "regression"
+        elif ratio < 1 / (1 + threshold):
+            flag = "improvement"
+        rows.append((name, before, after, ratio, flag))
+    return rows
+
+
+def print_compare(rows: List[tuple]):
+    width = max([len(row[0]) for row in rows], default=4)
+    print(f"{'name':<{width}}  {'before':>10}  {'after':>10}  {'ratio':>6}")
+    for name, before, after, ratio, flag in rows:
+        print(f"{name:<{width}}  {before * 1e3:>8.3f}ms  {after * 1e3:>8.3f}ms  {ratio:>6.2f}  {flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="time the benchmarks")
+    run_parser.add_argument("--output", default="benchmark.json",
+                            help="JSON file the results are written to")
+    run_parser.add_argument("--repeats", type=int, default=5,
+                            help="timings of each benchmark")
+    run_parser.add_argument("--quick", action="store_true",
+                            help="only the default ward size and load")
+    run_parser.add_argument("--filter", default="",
+                            help="only the benchmarks whose name contains this")
+    run_parser.add_argument("--transmission-mode", default="pairwise",
+                            choices=["pairwise", "hazard"],
+                            help="transmission mode of the Ward cases")
+    compare_parser = commands.add_parser(
+        "compare", help="flag regressions between two results")
+    compare_parser.add_argument("baseline", help="baseline JSON results")
+    compare_parser.add_argument("new", help="new JSON results")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative slowdown flagged as a regression")
+    compare_parser.add_argument("--stat", choices=["min", "median"], default="median",
+                                help="statistic compared")
+    imports_parser = commands.add_parser(
+        "imports", help="check the import time budgets of the worker modules")
+    imports_parser.add_argument("--repeats", type=int, default=3,
+                                help="imports of each module, the best one is kept")
+    args = parser.parse_args()
+    if args.command == "run":
+        results = run_benchmarks(args.repeats, args.quick, args.filter,
+                                 args.transmission_mode)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        for name, result in results["benchmarks"].items():
+            print(f"{name}: {result['median'] * 1e3:.3f}ms")
+    elif args.command == "imports":
+        problems = check_imports(args.repeats)
+        for problem in problems:
+            print(problem)
+        sys.exit(1 if problems else 0)
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        with open(args.new) as file:
+            new = json.load(file)
+        rows = compare(baseline, new, args.threshold, args.stat)
+        print_compare(rows)
+        sys.exit(1 if any(row[4] == "regression" for row in rows) else 0)
@@ -0,0 +1,334 @@
+"""Space-filling experiment designs and Sobol sensitivity indices.
+
+    python design.py --samples 64 --seeds 4 --method sobol
+
+Factors are declared as ranges of `Parameters` fields (`Uniform`,
+`IntRange`) or as lists of choices (`Choice`, for strategies or
+interval_result pairs). A design maps points of the unit hypercube, drawn
+with a Latin hypercube or a Sobol sequence with a random digital shift,
+to mods understood by `main.get_parameters`, so each point is simulated by
+`main.run` like a sweep point and shares its run cache.
+
+`sensitivity` uses the Saltelli scheme: two independent designs A and B
+of `n` points and, for each factor i, A with column i taken from B. The
+first order index is estimated as in Saltelli et al. (2010) and the total
+index with Jansen's estimator, from n * (factors + 2) points.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Sequence
+import numpy as np
+import main
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from results_store import DEFAULT_PATH, ResultsStore
+
+METHODS = ("sobol", "lhs")
+# Bits of the Sobol points, the largest design has 2 ** BITS points
+BITS = 30
+# Primitive polynomials and initial direction numbers of the Sobol
+# dimensions after the first, (degree, coefficients, m_1 ... m_degree),
+# from the new-joe-kuo-6.21201 table of Joe and Kuo (2008)
+DIRECTIONS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+]
+MAX_DIMENSIONS = len(DIRECTIONS) + 1
+
+
+class Uniform:
+
+    def __init__(self, low: float, high: float):
+        """Float factor uniform on [low, high]"""
+        if not low < high:
+            raise ValueError(f"low must be below high, got {low} and {high}")
+        self.low = low
+        self.high = high
+
+    def __call__(self, u: float) -> float:
+        return float(self.low + u * (self.high - self.low))
+
+
+class Choice:
+
+    def __init__(self, options: Sequence):
+        """Factor taking one of `options` with equal probability"""
+        if len(options) == 0:
+            raise ValueError("Choice needs at least one option")
+        self.options = list(options)
+
+    def __call__(self, u: float):
+        return self.options[min(int(u * len(self.options)), len(self.options) - 1)]
+
+
+class IntRange(Choice):
+
+    def __init__(self, low: int, high: int):
+        """Integer factor uniform on low, ..., high (both included)"""
+        super().__init__(range(low, high + 1))
+
+
+def direction_numbers(dimensions: int) -> np.ndarray:
+    """(dimensions, BITS) direction numbers of the Sobol sequence, as
+    BITS-bit integers"""
+    if not 0 < dimensions <= MAX_DIMENSIONS:
+        raise ValueError(f"Sobol points have 1 to {MAX_DIMENSIONS} dimensions, got {dimensions}")
+    v = np.zeros((dimensions, BITS), dtype=np.uint64)
+    v[0] = [1 << (BITS - 1 - i) for i in range(BITS)]
+    for j in range(1, dimensions):
+        degree, coefficients, m = DIRECTIONS[j - 1]
+        row = [m[i] << (BITS - 1 - i) for i in range(degree)]
+        for i in range(degree, BITS):
+            value = row[i - degree] ^ (row[i - degree] >> degree)
+            for k in range(1, degree):
+                if (coefficients >> (degree - 1 - k)) & 1:
+                    value ^= row[i - k]
+            row.append(value)
+        v[j] = row
+    return v
+
+
+def sobol(n: int, dimensions: int, rng: np.random.Generator = None) -> np.ndarray:
+    """First `n` points of the Sobol sequence in gray code order
+
+    With `rng`, every dimension is XORed with a random BITS-bit shift
+    (a random digital shift), which keeps the stratification of the
+    sequence but makes its points uniform and estimates unbiased.
+    Balance properties hold for `n` a power of two.
+    """
+    if not 0 < n <= 2 ** BITS:
+        raise ValueError(f"n must be in 1 to 2 ** {BITS}, got {n}")
+    v = direction_numbers(dimensions)
+    points = np.zeros((n, dimensions), dtype=np.uint64)
+    if n > 1:
+        # Point i differs from point i - 1 by the direction of the lowest
+        # zero bit of i - 1
+        index = np.arange(n - 1, dtype=np.uint64)
+        bit = np.zeros(n - 1, dtype=np.int64)
+        ones = index & ~(index + np.uint64(1))
+        while ones.any():
+            bit += ones > 0
+            ones >>= np.uint64(1)
+        points[1:] = np.bitwise_xor.accumulate(v[:, bit].T, axis=0)
+    if rng is not None:
+        points ^= rng.integers(0, 2 ** BITS, size=dimensions, dtype=np.uint64)
+    return points / 2.0 ** BITS
+
+
+def latin_hypercube(n: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    """`n` points with exactly one point in each of the n strata of every
+    dimension, placed at random inside its stratum"""
+    strata = np.argsort(rng.random((dimensions, n)), axis=1).T
+    return (strata + rng.random((n, dimensions))) / n
+
+
+class Design:
+
+    def __init__(self, factors: Dict[str, object], method: str = "sobol", seed: int = None):
+        """Space-filling design over `factors`
+
+        Parameters
+        ----------
+        factors : Dict[str, object]
+            `Uniform`, `IntRange` or `Choice` of each varied key of a mod,
+            a key of `main.get_params` or "interval_result", the others
+            keep their defaults
+        method : str, optional
+            "sobol" (Sobol sequence with a random digital shift) or "lhs"
+            (Latin hypercube), by default "sobol"
+        seed : int, optional
+            Seed of the randomisation, by default None
+        """
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+        if not factors:
+            raise ValueError("a design needs at least one factor")
+        self.factors = dict(factors)
+        self.method = method
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.factors)
+
+    def unit(self, n: int, dimensions: int = None) -> np.ndarray:
+        """(n, dimensions) points of the unit hypercube, one dimension per
+        factor by default"""
+        dimensions = dimensions or len(self.factors)
+        if self.method == "sobol":
+            return sobol(n, dimensions, self.rng)
+        return latin_hypercube(n, dimensions, self.rng)
+
+    def points(self, unit: np.ndarray) -> List[dict]:
+        """Mods of the rows of a (n, factors) array of unit points"""
+        return [{name: factor(u) for (name, factor), u in zip(self.factors.items(), row)}
+                for row in unit]
+
+    def sample(self, n: int) -> List[dict]:
+        return self.points(self.unit(n))
+
+    def saltelli(self, n: int) -> List[dict]:
+        """Mods of the Saltelli scheme: A, B, then A with column i from B
+        for each factor, n points each
+
+        With "sobol", A and B are the two halves of one 2 * factors
+        dimensional sequence.
+        """
+        d = len(self.factors)
+        if self.method == "sobol":
+            unit = self.unit(n, 2 * d)
+            a, b = unit[:, :d], unit[:, d:]
+        else:
+            a, b = self.unit(n), self.unit(n)
+        blocks = [a, b]
+        for i in range(d):
+            ab = a.copy()
+            ab[:, i] = b[:, i]
+            blocks.append(ab)
+        return self.points(np.concatenate(blocks))
+
+
+def sobol_indices(values: np.ndarray, names: List[str]) -> Dict[str, dict]:
+    """First order and total Sobol indices from the outputs of the Saltelli
+    scheme
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Outputs of the points of `Design.saltelli`, in the same order
+    names : List[str]
+        Factor names, in the order of the design
+
+    Returns
+    -------
+    Dict[str, dict]
+        {"first", "total"} indices of each factor, nan when the outputs
+        of A and B do not vary
+    """
+    d = len(names)
+    values = np.asarray(values, dtype=float)
+    if len(values) % (d + 2):
+        raise ValueError(f"expected a multiple of {d + 2} values, got {len(values)}")
+    blocks = values.reshape(d + 2, -1)
+    f_a, f_b, f_ab = blocks[0], blocks[1], blocks[2:]
+    variance = np.var(np.concatenate([f_a, f_b]))
+    indices = {}
+    for name, f_abi in zip(names, f_ab):
+        if variance == 0:
+            indices[name] = {"first": np.nan, "total": np.nan}
+            continue
+        indices[name] = {
+            "first": float(np.mean(f_b * (f_abi - f_a)) / variance),
+            "total": float(0.5 * np.mean((f_a - f_abi) ** 2) / variance),
+        }
+    return indices
+
+
+def evaluate(points: List[dict], seeds: List[int], metric: str = "secondary_per_primary",
+             workers: int = 1, batch: bool = False, output: str = DEFAULT_PATH,
+             axis: str = "design") -> np.ndarray:
+    """Mean of `metric` (see `main.METRICS`) over `seeds` at each point
+
+    Every point is simulated with the same seeds, so differences between
+    points are not blurred by the seeds. Rows are saved under `axis` with
+    their run key, and runs already in the store (from a sweep or an
+    earlier design) are read instead of simulated. Repeated points are
+    simulated once.
+    """
+    measure = main.METRICS[metric]
+    main.get_arrivals()
+    keys = [{seed: main.get_run_key(point, seed, batch) for seed in seeds}
+            for point in points]
+    rows = {}
+    with ResultsStore(output) as store:
+        rows.update(store.cached_rows(
+            [key for point_keys in keys for key in point_keys.values()]))
+        jobs, planned = {}, set()
+        for i, point_keys in enumerate(keys):
+            todo = [seed for seed, key in point_keys.items()
+                    if key not in rows and key not in planned]
+            planned.update(point_keys[seed] for seed in todo)
+            if todo:
+                jobs[i] = todo
+        from tqdm.auto import tqdm
+        pbar = tqdm(total=sum(len(todo) for todo in jobs.values()))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(main.run_chunk, points[i], todo, batch): i
+                       for i, todo in jobs.items()}
+            for future in as_completed(futures):
+                i = futures[future]
+                new_rows, _ = future.result()
+                for row in new_rows:
+                    row["run_key"] = keys[i][row["seed"]]
+                    rows[row["run_key"]] = row
+                store.add(axis, new_rows)
+                pbar.update(len(new_rows))
+        pbar.close()
+    means = np.full(len(points), np.nan)
+    for i, point_keys in enumerate(keys):
+        values = [value for value in (measure(rows[key]) for key in point_keys.values())
+                  if value is not None]
+        if values:
+            means[i] = np.mean(values)
+    return means
+
+
+def sensitivity(design: Design, n: int, seeds: List[int], metric: str = "secondary_per_primary",
+                workers: int = 1, batch: bool = False, output: str = DEFAULT_PATH) -> Dict[str, dict]:
+    """Sobol indices of `metric` from n * (factors + 2) design points,
+    each the mean over `seeds` (see `evaluate`)"""
+    points = design.saltelli(n)
+    values = evaluate(points, seeds, metric, workers, batch, output)
+    if np.isnan(values).any():
+        raise ValueError(f"{metric} is undefined at {int(np.isnan(values).sum())} design points, "
+                         "use more seeds or another metric")
+    return sobol_indices(values, design.names)
+
+
+if __name__ == '__main__':
+    factors = {
+        "C": Uniform(0.1, 1.2),
+        "V": Uniform(0.1, 1.2),
+        "k": Uniform(0.1, 0.9),
+        "m": Uniform(0.1, 0.9),
+        "strategies": Choice([[], [GroupInfectedStrategy()], [IsolateInfectedStrategy()],
+                              [GroupInfectedStrategy(), IsolateInfectedStrategy()]]),
+        "interval_result": Choice([[5, 4], [5, 3], [5, 2], [4, 3], [4, 2], [3, 2], [3, 1]]),
+    }
+    parser = argparse.ArgumentParser(description="Sobol sensitivity indices of the model")
+    parser.add_argument("--samples", type=int, default=64,
+                        help="points of each Saltelli block (a power of two for sobol)")
+    parser.add_argument("--seeds", type=int, default=4,
+                        help="seeds averaged at each design point")
+    parser.add_argument("--method", choices=METHODS, default="sobol",
+                        help="space-filling design")
+    parser.add_argument("--design-seed", type=int, default=0,
+                        help="seed of the design randomisation")
+    parser.add_argument("--metric", default="secondary_per_primary", choices=list(main.METRICS),
+                        help="output the indices are computed for")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--batch", action="store_true",
+                        help="simulate the seeds of a point with a BatchSimulation")
+    parser.add_argument("--output", default=DEFAULT_PATH,
+                        help="SQLite results database")
+    args = parser.parse_args()
+    design = Design(factors, method=args.method, seed=args.design_seed)
+    indices = sensitivity(design, args.samples, [i + 1000 for i in range(args.seeds)],
+                          metric=args.metric, workers=args.workers, batch=args.batch,
+                          output=args.output)
+    print(f"{'factor':<16}  {'first':>7}  {'total':>7}")
+    for name, index in indices.items():
+        print(f"{name:<16}  {index['first']:>7.3f}  {index['total']:>7.3f}")
@@ -1,14 +1,18 @@
 # %%
-import random
 import numpy as np
-from matplotlib import pyplot as plt
 import agents_enviroments
 from agents_enviroments import History
 from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy, MovementStrategy
-from tqdm.auto import tqdm
-import pandas as pd
 import os
-from typing import List
+import argparse
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Dict, List
+from results_store import DEFAULT_PATH, ResultsStore, run_key
+from online_stats import PointSummary, RunningStats
+from trajectory_archive import TrajectoryArchive, write_trajectory
+from agents_enviroments.profiler import Profiler, profile_phase
 
 
 def flatten(l: List[list]):
@@ -27,91 +31,660 @@ def get_params(mod: dict):
         "V": 1.0,
         "m": 0.9,
         "k": 0.4,
+        "treatment_prob": 0.9,
+        "isolation_prob": 0.01,
         "strategies": [],
         "screen_interval": 4,
         "result_length": 2,
     }
-    if list(mod.keys())[0] == "interval_result":
-        params.update(
-            {"screen_interval": mod["interval_result"][0],
-             "result_length": mod["interval_result"][1]}
-        )
-    else:
-        params.update(mod)
+    mod = dict(mod)
+    if "interval_result" in mod:
+        params["screen_interval"], params["result_length"] = mod.pop("interval_result")
+    params.update(mod)
     return params
 
 
-def main(seed: int, mod: dict, generation_seed: int = 10):
-    num_of_bays = 10
-    num_of_isobays = 6
-    colonized_prob_on_admit = 0.05
-    time = 150
+NUM_OF_BAYS = 10
+NUM_OF_ISOBAYS = 6
+COLONIZED_PROB_ON_ADMIT = 0.05
+TIME = 150
+# PatientGenerator settings of every run
+GENERATOR = {
+    "poisson_lambda": 5,
+    "gamma_k": 7,
+    "gamma_scale": 1,
+    "col_gamma_k": 11,
+    "col_gamma_scale": 1,
+    "colonized_prob": COLONIZED_PROB_ON_ADMIT,
+    "time": TIME,
+}
+# Part of every run key, bump it when a change of the model changes results
+# so cached runs are simulated again
+MODEL_VERSION = 1
+# Part of the key of the cached arrival sequences, bump it when a change of
+# generate_arrivals or PatientGenerator changes the sequences it draws
+ARRIVALS_VERSION = 1
+# Per run metrics adaptive replication can target, None when undefined
+METRICS = {
+    "secondary_per_primary": lambda row: row["secondary_cases"] / row["primary_cases"]
+    if row["primary_cases"] else None,
+    "secondary_cases": lambda row: row["secondary_cases"],
+    "total_screens": lambda row: row["total_screens"],
+    "total_detection": lambda row: row["total_detection"],
+}
+# Directory of the arrival sequences generated so far
+ARRIVALS_CACHE = ".arrivals"
+# Arrivals already loaded by this process, by cache key
+_arrivals = {}
+
 
-    np.random.seed(generation_seed)
-    random.seed(generation_seed)
+def get_parameters(mod: dict):
+    """Build the parameters and strategies of a run"""
     initial_params = get_params(mod)
     params = agents_enviroments.Parameters(
         C=initial_params["C"],
         V=initial_params["V"],
         m=initial_params["m"],
         k=initial_params["k"],
-        treatment_prob=0.9,
-        isolation_prob=0.01,
+        treatment_prob=initial_params["treatment_prob"],
+        isolation_prob=initial_params["isolation_prob"],
         screen_interval=initial_params["screen_interval"],
         result_length=initial_params["result_length"]
     )
     strategies: List[MovementStrategy] = initial_params["strategies"]
-    patient_generator = agents_enviroments.PatientGenerator()
+    return params, strategies
+
+
+def generate_arrivals(generation_seed: int = 10) -> agents_enviroments.Arrivals:
+    """Draw the arrival sequence of the GENERATOR settings"""
+    patient_generator = agents_enviroments.PatientGenerator(
+        rng=agents_enviroments.RandomStreams(generation_seed).arrivals)
     patient_generator.set_var(
-        poisson_lambda=5, gamma_k=7, gamma_scale=1)
+        poisson_lambda=GENERATOR["poisson_lambda"], gamma_k=GENERATOR["gamma_k"],
+        gamma_scale=GENERATOR["gamma_scale"])
     patient_generator.set_col_length_dist(
-        gamma_k=11, gamma_scale=1)
-    patient_sequence = patient_generator.generate_sequence(
-        colonized_prob=colonized_prob_on_admit, time=time)
-    # %%
-    bays = [agents_enviroments.Bay() for _ in range(num_of_bays)]
+        gamma_k=GENERATOR["col_gamma_k"], gamma_scale=GENERATOR["col_gamma_scale"])
+    return patient_generator.generate_arrivals(
+        colonized_prob=GENERATOR["colonized_prob"], time=GENERATOR["time"])
+
+
+def get_arrivals(generation_seed: int = 10, cache_dir: str = ARRIVALS_CACHE) -> agents_enviroments.Arrivals:
+    """Arrival sequence of the GENERATOR settings, generated once.
+
+    The arrays are saved as .npy files under `cache_dir` (in a directory
+    named after the settings) and memory mapped read-only, so every run
+    and every worker process shares one copy. Runs build their Patient
+    objects from the arrays.
+    """
+    key = run_key(version=ARRIVALS_VERSION, generator=GENERATOR,
+                  generation_seed=generation_seed)
+    if key in _arrivals:
+        return _arrivals[key]
+    directory = os.path.join(cache_dir, key[:16])
+    if not os.path.isdir(directory):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written aside and renamed so other processes never see half a cache
+        staging = tempfile.mkdtemp(dir=cache_dir)
+        generate_arrivals(generation_seed).save(staging)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Saved by another process in the meantime
+            shutil.rmtree(staging)
+    _arrivals[key] = agents_enviroments.Arrivals.load(directory)
+    return _arrivals[key]
+
+
+def get_simulation(mod: dict, generation_seed: int = 10):
+    """Build the parameters, strategies and patient sequence of a run"""
+    params, strategies = get_parameters(mod)
+    return params, strategies, get_arrivals(generation_seed)
+
+
+def get_run_settings(mod: dict, batch: bool = False, generation_seed: int = 10) -> dict:
+    """Everything the result of a run depends on but its seed"""
+    params, strategies = get_parameters(mod)
+    return dict(version=MODEL_VERSION, params=params.__dict__,
+                strategies=get_strategy_names(strategies), generator=GENERATOR,
+                generation_seed=generation_seed, batch=batch,
+                bays=[NUM_OF_BAYS, NUM_OF_ISOBAYS])
+
+
+def get_run_key(mod: dict, seed: int, batch: bool = False, generation_seed: int = 10) -> str:
+    """Cache key of a run, a hash of everything its result depends on"""
+    return run_key(seed=seed, **get_run_settings(mod, batch, generation_seed))
+
+
+def get_point_key(mod: dict, batch: bool = False, generation_seed: int = 10) -> str:
+    """Key of a sweep point, its run key without the seed"""
+    return run_key(**get_run_settings(mod, batch, generation_seed))
+
+
+def get_point_value(mod: dict):
+    """Value of a one key sweep point on its axis, a label for the
+    strategies and interval_result"""
+    (axis, value), = mod.items()
+    if axis == "strategies":
+        return get_strategy_names(value)
+    if axis == "interval_result":
+        return "_".join(map(str, value))
+    return value
+
+
+def get_bays() -> List[agents_enviroments.Bay]:
+    bays = [agents_enviroments.Bay() for _ in range(NUM_OF_BAYS)]
     isobays = [agents_enviroments.IsolationBay()
-               for _ in range(num_of_isobays)]
-    bays += isobays
-    ward = agents_enviroments.Ward(bays, params=params)
+               for _ in range(NUM_OF_ISOBAYS)]
+    return bays + isobays
+
+
+def save_results(mod: dict, rows: List[dict], store: ResultsStore = None):
+    """Append result rows of a sweep point to the results store"""
+    if store is None:
+        with ResultsStore() as store:
+            store.add(list(mod.keys())[0], rows)
+        return
+    store.add(list(mod.keys())[0], rows)
+
+
+def run(seed: int, mod: dict, generation_seed: int = 10, profiler: Profiler = None,
+        trajectory: tuple = None) -> dict:
+    """Simulate one seed and return its result row, timing its phases in
+    `profiler` if given and writing its daily history at the (archive data
+    file, row) `trajectory` if given (see `TrajectoryArchive`)"""
+    with profile_phase(profiler, "get_simulation"):
+        params, strategies, patient_sequence = get_simulation(
+            mod, generation_seed)
     # %%
-    np.random.seed(seed)
-    random.seed(seed)
-    history = History()
-    history.reset()
-    for patients in patient_sequence:
-        ward.remove_patients()
-        ward.screen_patients()
-        ward.get_patient_results()
-        ward.admit_patients(patients=patients)
-        ward.generate_transmission()
-        ward.generate_treatment()
-        for strategy in strategies:
-            strategy.move_patients(ward)
-        history.add_from_dict(ward.history_dict())
-        ward.forward_time()
+    ward = agents_enviroments.Ward(
+        get_bays(), params=params, streams=agents_enviroments.RandomStreams(seed))
+    ward.profiler = profiler
+    # %%
+    history = History(horizon=len(patient_sequence))
+    with profile_phase(profiler, "steps"):
+        for patients in patient_sequence:
+            history.add_record(ward.step(patients, strategies))
+    if trajectory is not None:
+        write_trajectory(*trajectory, history)
 
     # %%
+    return get_result(ward, history, strategies, seed)
+
 
-    filename = "output_{}.csv".format(list(mod.keys())[0])
+def get_result(ward: agents_enviroments.Ward, history: History, strategies: List[MovementStrategy],
+               seed: int) -> dict:
+    """Result row of a simulated ward"""
+    params = ward.params
     result_dict = {
-        "primary_cases": [ward.primary_cases],
-        "secondary_cases": [ward.secondary_cases],
-        "total_screens": [sum(history.screened)],
-        "total_detection": [sum(history.new_detected)],
-        "total_healed": [sum(history.healed)],
-        "strategy": [get_strategy_names(strategies)],
-        "interval_result": ["_".join([str(initial_params["screen_interval"]), str(initial_params["result_length"])])],
-        "seed": [seed],
+        "primary_cases": ward.primary_cases,
+        "secondary_cases": ward.secondary_cases,
+        "total_screens": int(history.screened.sum()),
+        "total_detection": int(history.new_detected.sum()),
+        "total_healed": int(history.healed.sum()),
+        "strategy": get_strategy_names(strategies),
+        "interval_result": "_".join([str(params.screen_interval), str(params.result_length)]),
+        "seed": seed,
+        "model_version": MODEL_VERSION,
     }
 
     result_dict.update(params.__dict__)
-    df = pd.DataFrame.from_dict(result_dict)
-    if os.path.exists(filename):
-        pd.concat([pd.read_csv(filename), df], axis=0).to_csv(
-            filename, index=False)
-    else:
-        df.to_csv(filename, index=False)
+    return result_dict
+
+
+def burn_in(seed: int, days: int, generation_seed: int = 10) -> agents_enviroments.WardSnapshot:
+    """Simulate the first `days` days of a seed with the default parameters
+    and no strategies, and snapshot the ward"""
+    params, strategies, patient_sequence = get_simulation({}, generation_seed)
+    ward = agents_enviroments.Ward(
+        get_bays(), params=params, streams=agents_enviroments.RandomStreams(seed))
+    for day in range(days):
+        ward.step(patient_sequence.patients(day), strategies)
+    return agents_enviroments.WardSnapshot(ward)
+
+
+def run_branch(snapshot: agents_enviroments.WardSnapshot, seed: int, mod: dict,
+               generation_seed: int = 10) -> dict:
+    """Carry on a burnt-in ward (see `burn_in`) with the parameters and
+    strategies of `mod` until the end of the arrivals.
+
+    The row counts the cases, screens, detections and healings of the days
+    after the burn-in only, and holds the burn-in length under "burn_in".
+    """
+    params, strategies, patient_sequence = get_simulation(mod, generation_seed)
+    ward = snapshot.restore(params)
+    history = History(horizon=len(patient_sequence) - snapshot.time)
+    for day in range(snapshot.time, len(patient_sequence)):
+        history.add_record(ward.step(patient_sequence.patients(day), strategies))
+    ward.primary_cases -= snapshot.primary_cases
+    ward.secondary_cases -= snapshot.secondary_cases
+    return {**get_result(ward, history, strategies, seed), "burn_in": snapshot.time}
+
+
+def run_forked(seed: int, mods: List[dict], days: int = 30, generation_seed: int = 10,
+               workers: int = 1) -> List[dict]:
+    """Simulate the burn-in of a seed once and branch it into every mod.
+
+    Every branch starts from the same census and, as the snapshot keeps
+    the random streams, draws the same random numbers, so the differences
+    between branches come from the mods alone (paired comparisons). With
+    `workers` above 1 the branches run on a process pool, which is sent
+    the snapshot.
+
+    Returns
+    -------
+    List[dict]
+        Row of each mod, see `run_branch`
+    """
+    snapshot = burn_in(seed, days, generation_seed)
+    if workers == 1:
+        return [run_branch(snapshot, seed, mod, generation_seed) for mod in mods]
+    get_arrivals(generation_seed)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_branch, [snapshot] * len(mods), [seed] * len(mods),
+                                 mods, [generation_seed] * len(mods)))
+
+
+def main(seed: int, mod: dict, generation_seed: int = 10):
+    save_results(mod, [run(seed, mod, generation_seed)])
+
+
+def run_batch(seeds: List[int], mod: dict, generation_seed: int = 10) -> List[dict]:
+    """Same as run but simulates all seeds at once with a BatchSimulation"""
+    params, strategies, patient_sequence = get_simulation(
+        mod, generation_seed)
+    simulation = agents_enviroments.BatchSimulation(
+        get_bays(), params=params, strategies=strategies, seed=seeds)
+    results = simulation.run(patient_sequence)
+
+    rows = []
+    for seed, result in zip(seeds, results):
+        result_dict = {name: int(result[name])
+                       for name in results.dtype.names}
+        result_dict.update({
+            "strategy": get_strategy_names(strategies),
+            "interval_result": "_".join([str(params.screen_interval), str(params.result_length)]),
+            "seed": seed,
+            "model_version": MODEL_VERSION,
+        })
+        result_dict.update(params.__dict__)
+        rows.append(result_dict)
+    return rows
+
+
+def main_batch(seeds: List[int], mod: dict, generation_seed: int = 10):
+    save_results(mod, run_batch(seeds, mod, generation_seed))
+
+
+def run_chunk(mod: dict, seeds: List[int], batch: bool = False, profile: bool = False,
+              trajectories: tuple = None) -> tuple:
+    """Simulate a chunk of seeds of one sweep point (runs inside a worker)
+
+    With `trajectories`, an (archive data file, {seed: row}) pair, the
+    daily history of each seed is written at its row (not with `batch`).
+
+    Returns
+    -------
+    (List[dict], List[dict])
+        Result rows and, when profiling, the profile report of each run
+        (of the whole chunk with `batch`)
+    """
+    path, archive_rows = trajectories if trajectories is not None else (None, {})
+
+    def trajectory(seed: int):
+        return (path, archive_rows[seed]) if seed in archive_rows else None
+
+    if not profile:
+        if batch:
+            return run_batch(seeds, mod), []
+        return [run(seed, mod, trajectory=trajectory(seed)) for seed in seeds], []
+    if batch:
+        profiler = Profiler()
+        with profiler.phase("run_batch"):
+            rows = run_batch(seeds, mod)
+        return rows, [{"seeds": seeds, **profiler.to_dict()}]
+    rows, reports = [], []
+    for seed in seeds:
+        profiler = Profiler()
+        with profiler.phase("run"):
+            rows.append(run(seed, mod, profiler=profiler, trajectory=trajectory(seed)))
+        reports.append({"seed": seed, **profiler.to_dict()})
+    return rows, reports
+
+
+def get_plan(mod_dicts: dict, seeds: List[int], chunk_size: int) -> List[tuple]:
+    """Split the sweep into (mod, seeds) chunks in the order of the serial loop"""
+    plan = []
+    for params, mods in mod_dicts.items():
+        for mod in mods:
+            for i in range(0, len(seeds), chunk_size):
+                plan.append(({params: mod}, seeds[i:i + chunk_size]))
+    return plan
+
+
+class SweepChunk:
+
+    def __init__(self, store: ResultsStore, mod: dict, seeds: List[int], batch: bool,
+                 keep_rows: bool, summaries: Dict[tuple, PointSummary], planned: set,
+                 archive: TrajectoryArchive = None):
+        """Runs of one chunk of a sweep, looked up in the run cache.
+
+        Each seed is either already saved under the axis of the chunk
+        (skipped), saved under another axis (its row is in `cached`),
+        simulated by an earlier chunk of the sweep (its key is in `copies`,
+        the row is taken once that chunk is saved) or simulated for this
+        chunk (in `todo`). Without `keep_rows`, the seeds the summary of
+        the point already holds count as saved. With an `archive`, runs
+        missing from it are simulated again for their trajectory (their
+        row is not saved twice) and the runs simulated get a row of it.
+
+        Parameters
+        ----------
+        store : ResultsStore
+            Output store of the sweep, the run cache
+        mod : dict
+            Sweep point of the chunk
+        seeds : List[int]
+            Seeds of the chunk, the order rows are saved in
+        batch : bool
+            Runs are BatchSimulation replicates
+        keep_rows : bool
+            Rows are saved, not only the summary of the point
+        summaries : Dict[tuple, PointSummary]
+            Summary of each (axis, point key), shared by the chunks of a
+            point and loaded from the store by the first one
+        planned : set
+            Run keys simulated by the chunks planned so far, the keys
+            simulated for this chunk are added
+        archive : TrajectoryArchive, optional
+            Archive the daily history of the runs is written to
+        """
+        self.mod = mod
+        self.seeds = seeds
+        self.keep_rows = keep_rows
+        self.axis = next(iter(mod))
+        self.point_key = get_point_key(mod, batch)
+        if (self.axis, self.point_key) not in summaries:
+            state = store.summary_state(self.axis, self.point_key)
+            summaries[self.axis, self.point_key] = PointSummary(METRICS) if state is None \
+                else PointSummary.from_state(state, METRICS)
+        self.summary = summaries[self.axis, self.point_key]
+        self.keys = {seed: get_run_key(mod, seed, batch) for seed in seeds}
+        saved = store.saved_keys(self.axis, self.keys.values()) if keep_rows else set()
+        # Rows saved before the summaries were, added to them when saved
+        self.backfill = [key for seed, key in self.keys.items()
+                         if key in saved and seed not in self.summary.seeds]
+        if not keep_rows:
+            saved.update(key for seed, key in self.keys.items()
+                         if seed in self.summary.seeds)
+        found = store.cached_rows(
+            [key for key in self.keys.values() if key not in saved])
+        self.cached = [found[key] for key in self.keys.values() if key in found]
+        missing = {seed: key for seed, key in self.keys.items()
+                   if key not in saved and key not in found}
+        self.copies = [key for key in missing.values() if key in planned]
+        self.todo = [seed for seed, key in missing.items() if key not in planned]
+        # Keys whose simulated rows are saved with the chunk
+        self.fresh = set(missing.values())
+        planned.update(missing.values())
+        self.archive = archive
+        self.archive_rows = {}
+        if archive is not None:
+            redo = [seed for seed, key in self.keys.items()
+                    if key not in archive and key not in planned]
+            planned.update(self.keys[seed] for seed in redo)
+            self.todo = sorted(self.todo + redo, key=seeds.index)
+            self.archive_rows = archive.reserve(self.keys[seed] for seed in self.todo)
+
+    def trajectories(self) -> tuple:
+        """Archive data file and row of each seed simulated, the
+        `trajectories` of `run_chunk`, None without an archive"""
+        if self.archive is None:
+            return None
+        return self.archive.data_path, {seed: self.archive_rows[self.keys[seed]]
+                                        for seed in self.todo}
+
+    def save(self, rows: List[dict], store: ResultsStore, copied: Dict[str, dict]):
+        """Save the rows of the chunk in seed order and the summary of its point
+
+        Parameters
+        ----------
+        rows : List[dict]
+            Rows of the seeds simulated for the chunk
+        store : ResultsStore
+            Output store of the sweep
+        copied : Dict[str, dict]
+            Rows of the `copies` of later chunks, by run key, filled in as
+            they are simulated when rows are not kept in the store
+        """
+        for row in rows:
+            row["run_key"] = self.keys[row["seed"]]
+            if row["run_key"] in copied:
+                copied[row["run_key"]] = row
+        rows = [row for row in rows if row["run_key"] in self.fresh]
+        if self.keep_rows:
+            rows += store.cached_rows(self.copies).values()
+        else:
+            rows += [copied[key] for key in self.copies]
+        # Copies, as cached rows may be shared with the chunks of other axes;
+        # the point key names the summary a row is counted in (`ResultsStore.gc`)
+        rows = sorted((dict(row, point_key=self.point_key) for row in self.cached + rows),
+                      key=lambda row: self.seeds.index(row["seed"]))
+        self.summary.update(store.cached_rows(self.backfill).values())
+        self.summary.update(rows)
+        if self.keep_rows:
+            save_results(self.mod, rows, store)
+        store.add_summary(self.axis, get_point_value(self.mod), self.point_key,
+                          self.summary.report(), self.summary.state())
+
+
+def sweep(mod_dicts: dict, seeds: List[int], workers: int = 1, chunk_size: int = 10, batch: bool = False,
+          output: str = DEFAULT_PATH, profile: str = None, keep_rows: bool = True,
+          trajectories: str = None):
+    """Run every (axis, value, seed) of the sweep on a process pool.
+
+    Chunks come back in completion order and are saved in plan order by
+    the parent process only, so the results do not depend on the number of
+    workers.
+
+    Rows are saved with their run key (see `get_run_key`) and the output
+    store doubles as the run cache: runs already saved under their axis
+    are skipped, runs saved under another axis are copied from the store,
+    and only the others are simulated. An interrupted sweep started again
+    carries on where it stopped.
+
+    As chunks are saved, the summary of their point (see `PointSummary`,
+    over every metric of METRICS) is updated and saved with them, so
+    `ResultsStore.read_summaries` gives the mean, variance, min, max and
+    quantiles of each point without reading the rows. With `keep_rows`
+    False only the summaries are saved, and the seeds a summary already
+    holds are not simulated again (nor added twice to it otherwise).
+
+    With `profile`, every simulated run is profiled (see `Profiler`) and
+    the reports are written to `profile`.json (aggregated and per run) and
+    `profile`.folded (aggregated, for flamegraph tools). Time spent saving
+    results in the parent is recorded as "save_results".
+
+    With `trajectories`, the daily history of every run is also written to
+    the TrajectoryArchive in that directory. Runs of the sweep missing from
+    the archive are simulated even when their row is saved (the row is not
+    saved twice).
+    """
+    if trajectories is not None and batch:
+        raise ValueError("Batch runs do not record their daily history")
+    plan = get_plan(mod_dicts, seeds, chunk_size)
+    # Generated before the workers start, which then only load it
+    arrivals = get_arrivals()
+    archive = None
+    if trajectories is not None:
+        archive = TrajectoryArchive(trajectories, days=len(arrivals))
+    total = Profiler()
+    runs = []
+    with ResultsStore(output) as store:
+        chunks, summaries, planned = [], {}, set()
+        for mod, chunk_seeds in plan:
+            chunks.append(SweepChunk(store, mod, chunk_seeds, batch, keep_rows,
+                                     summaries, planned, archive))
+        # Simulated rows copied by a later chunk, kept until then when rows
+        # are not saved
+        copied = {} if keep_rows else dict.fromkeys(
+            key for chunk in chunks for key in chunk.copies)
+        from tqdm.auto import tqdm
+        pbar = tqdm(total=sum(len(chunk.todo) for chunk in chunks))
+        finished = {i: ([], []) for i, chunk in enumerate(chunks) if not chunk.todo}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_chunk, chunk.mod, chunk.todo, batch, profile is not None,
+                                       chunk.trajectories()): i
+                       for i, chunk in enumerate(chunks) if chunk.todo}
+            completed = as_completed(futures)
+            next_chunk = 0
+            # Save the next chunk of the plan once it is finished, wait for
+            # another one otherwise
+            while next_chunk < len(chunks):
+                if next_chunk not in finished:
+                    future = next(completed)
+                    i = futures[future]
+                    finished[i] = future.result()
+                    if archive is not None:
+                        archive.commit(chunks[i].archive_rows)
+                    pbar.update(len(chunks[i].todo))
+                    continue
+                rows, reports = finished.pop(next_chunk)
+                chunk = chunks[next_chunk]
+                with profile_phase(total if profile else None, "save_results"):
+                    chunk.save(rows, store, copied)
+                for report in reports:
+                    total.merge(report)
+                    (axis, value), = chunk.mod.items()
+                    runs.append({"axis": axis, "value": value, **report})
+                next_chunk += 1
+    pbar.close()
+    if profile is not None:
+        total.write(profile, runs=runs)
+
+
+def adaptive_sweep(mod_dicts: dict, seeds: List[int], tolerance: float, relative: bool = False,
+                   metric: str = "secondary_per_primary", confidence: float = 0.95, workers: int = 1,
+                   chunk_size: int = 10, batch: bool = False, output: str = DEFAULT_PATH) -> List[dict]:
+    """Run each sweep point until its metric is known well enough.
+
+    Seeds are taken in order, `chunk_size` at a time per point, and the
+    running mean and variance of `metric` (see METRICS) are updated as each
+    chunk comes back. A point stops once the half width of the normal
+    confidence interval of the mean is at most `tolerance` (times the
+    absolute mean with `relative`), or when every seed is used. Stopping
+    only depends on the point's own results, so the runs of each point do
+    not depend on the number of workers (the row order in the store does).
+    Runs saved before are read from the store as in `sweep`.
+
+    Returns
+    -------
+    List[dict]
+        For each point its axis, value, the number of runs it used, the
+        mean and half width of the metric and whether it converged
+    """
+    points = [{axis: value}
+              for axis, values in mod_dicts.items() for value in values]
+    stats = [RunningStats() for _ in points]
+    used = [0] * len(points)
+    measure = METRICS[metric]
+
+    def converged(i: int) -> bool:
+        half_width = stats[i].half_width(confidence)
+        scale = abs(stats[i].mean) if relative else 1
+        return stats[i].count >= 2 and half_width <= tolerance * scale
+
+    def record(i: int, rows: List[dict]):
+        stats[i].update(value for value in map(measure, rows)
+                        if value is not None)
+        pbar.update(len(rows))
+
+    get_arrivals()
+    from tqdm.auto import tqdm
+    pbar = tqdm(total=len(points) * len(seeds))
+    with ProcessPoolExecutor(max_workers=workers) as executor, ResultsStore(output) as store:
+        # Equal points (e.g. the default V on the V and C axes) share run
+        # keys, a run in flight for one point is waited for by the others
+        # instead of being simulated again
+        futures = {}  # future -> (run key of each seed it simulates, chunks waiting)
+        running = {}  # run key -> future simulating it
+
+        def next_chunk(i: int):
+            # Chunks found in the store are recorded at once, the first
+            # missing one waits for the pool
+            while used[i] < len(seeds) and not converged(i):
+                mod = points[i]
+                chunk_seeds = seeds[used[i]:used[i] + chunk_size]
+                used[i] += len(chunk_seeds)
+                keys = {seed: get_run_key(mod, seed, batch)
+                        for seed in chunk_seeds}
+                found = store.cached_rows(keys.values())
+                saved = store.saved_keys(next(iter(mod)), keys.values())
+                save_results(mod, [found[key] for key in keys.values()
+                                   if key in found and key not in saved], store)
+                todo = [seed for seed, key in keys.items() if key not in found]
+                cached = [found[key] for key in keys.values() if key in found]
+                if todo:
+                    new = {seed: keys[seed] for seed in todo if keys[seed] not in running}
+                    if new:
+                        future = executor.submit(run_chunk, mod, list(new), batch)
+                        futures[future] = (new, [])
+                        running.update((key, future) for key in new.values())
+                    chunk = {"point": i, "keys": keys, "rows": cached,
+                             "waiting": {running[keys[seed]] for seed in todo}}
+                    for future in chunk["waiting"]:
+                        futures[future][1].append(chunk)
+                    return
+                record(i, cached)
+
+        for i in range(len(points)):
+            next_chunk(i)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                new, chunks = futures.pop(future)
+                rows, _ = future.result()
+                for row in rows:
+                    row["run_key"] = new[row["seed"]]
+                    del running[row["run_key"]]
+                for chunk in chunks:
+                    i, keys = chunk["point"], chunk["keys"]
+                    # Copies, each point saves the rows under its own axis
+                    chunk_rows = [dict(row) for row in rows
+                                  if keys.get(row["seed"]) == row["run_key"]]
+                    save_results(points[i], chunk_rows, store)
+                    chunk["rows"] += chunk_rows
+                    chunk["waiting"].remove(future)
+                    if not chunk["waiting"]:
+                        order = list(keys)
+                        record(i, sorted(chunk["rows"],
+                                         key=lambda row: order.index(row["seed"])))
+                        next_chunk(i)
+    pbar.close()
+    return [{"axis": axis, "value": value, "runs": used[i], "mean": stats[i].mean,
+             "half_width": stats[i].half_width(confidence), "converged": converged(i)}
+            for i, point in enumerate(points) for axis, value in point.items()]
+
+
+def get_sweep_keys(mod_dicts: dict, seeds: List[int], batch: bool = False) -> List[str]:
+    """Run keys of every (axis, value, seed) of a sweep"""
+    return [get_run_key(mod, seed, batch)
+            for mod, chunk_seeds in get_plan(mod_dicts, seeds, max(len(seeds), 1))
+            for seed in chunk_seeds]
+
+
+def gc(keep: List[str] = None, output: str = DEFAULT_PATH) -> int:
+    """Delete stale saved runs and the summaries of their points, and
+    return how many runs were deleted.
+
+    Without `keep`, runs saved under another MODEL_VERSION (or without a
+    run key) are stale, whatever saved them (sweeps, adaptive sweeps or
+    designs). With `keep`, for example the keys of one sweep
+    (`get_sweep_keys`), every run whose key is not in it is stale.
+    """
+    with ResultsStore(output) as store:
+        if keep is None:
+            return store.gc(version=MODEL_VERSION)
+        return store.gc(keep)
 
 
 if __name__ == '__main__':
@@ -123,10 +696,55 @@ if __name__ == '__main__':
         "strategies": [[], [GroupInfectedStrategy()], [IsolateInfectedStrategy()], [GroupInfectedStrategy(), IsolateInfectedStrategy()]],
         "interval_result": [[5, 4], [5, 3], [5, 2], [4, 3], [4, 2], [3, 2], [3, 1]]
     }
-    flat_count = flatten(mod_dicts.values())
-    pbar = tqdm(total=len(flat_count) * 100)
-    for params, mods in mod_dicts.items():
-        for mod in mods:
-            for i in range(100):
-                main(i + 1000, {params: mod})
-                pbar.update(1)
+    parser = argparse.ArgumentParser(description="Run the parameter sweep")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=10,
+                        help="number of seeds sent to a worker at once")
+    parser.add_argument("--seeds", type=int, default=100,
+                        help="number of seeds for each sweep point")
+    parser.add_argument("--batch", action="store_true",
+                        help="simulate each chunk with a BatchSimulation")
+    parser.add_argument("--output", default=DEFAULT_PATH,
+                        help="SQLite results database")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the phases of every run")
+    parser.add_argument("--profile-output", default="profile",
+                        help="prefix of the profile .json and .folded reports")
+    parser.add_argument("--no-rows", action="store_true",
+                        help="only save the summary of each point, not the row of each seed")
+    parser.add_argument("--trajectories", default=None,
+                        help="directory of a trajectory archive the daily history of every "
+                        "run is written to")
+    parser.add_argument("--gc", action="store_true",
+                        help="delete saved runs of an older model version, then exit")
+    parser.add_argument("--gc-sweep", action="store_true",
+                        help="with --gc, also delete saved runs that are not part of this sweep")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="run chunks of seeds per point until the confidence interval "
+                        "of --metric is narrow enough (--seeds is the cap)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="largest confidence interval half width of an adaptive point")
+    parser.add_argument("--relative", action="store_true",
+                        help="tolerance relative to the mean of the point")
+    parser.add_argument("--metric", default="secondary_per_primary", choices=list(METRICS),
+                        help="metric adaptive replication estimates")
+    args = parser.parse_args()
+    seeds = [i + 1000 for i in range(args.seeds)]
+    if args.gc:
+        keep = get_sweep_keys(mod_dicts, seeds, args.batch) if args.gc_sweep else None
+        deleted = gc(keep, output=args.output)
+        print(f"Deleted {deleted} stale runs")
+    elif args.adaptive:
+        report = adaptive_sweep(mod_dicts, seeds, args.tolerance, relative=args.relative,
+                                metric=args.metric, workers=args.workers,
+                                chunk_size=args.chunk_size, batch=args.batch, output=args.output)
+        for point in report:
+            print("{axis}={value}: {runs} runs, {mean:.4f} +- {half_width:.4f}".format(**point))
+        runs = sum(point["runs"] for point in report)
+        print(f"{runs} runs instead of {len(report) * len(seeds)}")
+    else:
+        sweep(mod_dicts, seeds=seeds, workers=args.workers,
+              chunk_size=args.chunk_size, batch=args.batch, output=args.output,
+              profile=args.profile_output if args.profile else None,
+              keep_rows=not args.no_rows, trajectories=args.trajectories)
@@ -0,0 +1,245 @@
+import math
+from collections import defaultdict
+from statistics import NormalDist
+from typing import Callable, Dict, Iterable, List
+
+# Quantiles reported by PointSummary, as (column, quantile)
+QUANTILES = (("q05", 0.05), ("q50", 0.5), ("q95", 0.95))
+
+
+class RunningStats:
+
+    def __init__(self):
+        """Mean and variance of a stream of values, updated one value at a
+        time with Welford's algorithm (no values are kept)"""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Add the values summarised by another RunningStats"""
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(value for value in (self.min, other.min) if value is not None)
+        self.max = max(value for value in (self.max, other.max) if value is not None)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, nan below two values"""
+        if self.count < 2:
+            return math.nan
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std_error(self) -> float:
+        return math.sqrt(self.variance / self.count) if self.count >= 2 else math.nan
+
+    def half_width(self, confidence: float = 0.95) -> float:
+        """Half width of the normal confidence interval of the mean"""
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * self.std_error
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "variance": self.variance,
+                "min": self.min, "max": self.max}
+
+    def state(self) -> dict:
+        """Exact state, JSON friendly, see `from_state`"""
+        return {"count": self.count, "mean": self.mean, "m2": self._m2,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        stats = cls()
+        stats.count, stats.mean, stats._m2 = state["count"], state["mean"], state["m2"]
+        stats.min, stats.max = state["min"], state["max"]
+        return stats
+
+
+class QuantileSketch:
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """Quantiles of a stream of values within a relative error, from
+        counts of logarithmic buckets (the DDSketch of Masson et al., 2019).
+
+        A value v > 0 falls in bucket ceil(log(v) / log(gamma)) with
+        gamma = (1 + a) / (1 - a), and a quantile is answered with the
+        middle of its bucket, within a relative error a of the true value.
+        Negative values are kept the same way by magnitude and zeros apart.
+        The number of buckets grows with the log of the value range only,
+        and sketches of two streams merge by adding their counts.
+
+        Parameters
+        ----------
+        relative_accuracy : float, optional
+            Relative error a of the quantiles, by default 0.01
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = defaultdict(int)
+        self.negative: Dict[int, int] = defaultdict(int)
+        self.zeros = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float):
+        self.count += 1
+        if value > 0:
+            self.positive[self._key(value)] += 1
+        elif value < 0:
+            self.negative[self._key(-value)] += 1
+        else:
+            self.zeros += 1
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Add the counts of a sketch with the same relative accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy merge")
+        for key, count in other.positive.items():
+            self.positive[key] += count
+        for key, count in other.negative.items():
+            self.negative[key] += count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Value of rank q * (count - 1), nan for an empty sketch"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def state(self) -> dict:
+        """Exact state, JSON friendly, see `from_state`"""
+        return {"relative_accuracy": self.relative_accuracy, "zeros": self.zeros,
+                "positive": {str(key): count for key, count in self.positive.items()},
+                "negative": {str(key): count for key, count in self.negative.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        sketch = cls(state["relative_accuracy"])
+        sketch.zeros = state["zeros"]
+        for name in ("positive", "negative"):
+            buckets = getattr(sketch, name)
+            for key, count in state[name].items():
+                buckets[int(key)] = count
+        sketch.count = sketch.zeros + sum(sketch.positive.values()) + \
+            sum(sketch.negative.values())
+        return sketch
+
+
+class PointSummary:
+
+    def __init__(self, metrics: Dict[str, Callable[[dict], float]], relative_accuracy: float = 0.01):
+        """Streaming summary of the result rows of one sweep point: the
+        running mean, variance, min and max and a quantile sketch of each
+        metric, and the seeds seen so far (a row of a seed already seen is
+        ignored, so a summary can be carried on after an interruption).
+
+        Parameters
+        ----------
+        metrics : Dict[str, Callable[[dict], float]]
+            Function of each metric computing it from a row, None when it
+            is undefined for that row (see `main.METRICS`)
+        relative_accuracy : float, optional
+            Relative error of the quantiles, by default 0.01
+        """
+        self.metrics = metrics
+        self.stats = {name: RunningStats() for name in metrics}
+        self.sketches = {name: QuantileSketch(relative_accuracy) for name in metrics}
+        self.seeds = set()
+
+    @property
+    def runs(self) -> int:
+        return len(self.seeds)
+
+    def add(self, row: dict):
+        if row["seed"] in self.seeds:
+            return
+        self.seeds.add(row["seed"])
+        for name, measure in self.metrics.items():
+            value = measure(row)
+            if value is not None:
+                self.stats[name].add(value)
+                self.sketches[name].add(value)
+
+    def update(self, rows: Iterable[dict]):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def report(self) -> List[dict]:
+        """One row per metric: the number of runs, of defined values, their
+        mean, variance, standard error, min, max and QUANTILES"""
+        rows = []
+        for name in self.metrics:
+            stats, sketch = self.stats[name], self.sketches[name]
+            row = {"metric": name, "runs": self.runs, **stats.to_dict(),
+                   "std_error": stats.std_error}
+            row.update({column: sketch.quantile(q) for column, q in QUANTILES})
+            rows.append(row)
+        return rows
+
+    def state(self) -> dict:
+        """Exact state, JSON friendly, see `from_state`"""
+        return {"seeds": sorted(self.seeds),
+                "stats": {name: stats.state() for name, stats in self.stats.items()},
+                "sketches": {name: sketch.state() for name, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict, metrics: Dict[str, Callable[[dict], float]]):
+        """Summary saved with `state`, metrics missing from it start empty"""
+        summary = cls(metrics)
+        summary.seeds = set(state["seeds"])
+        for name in metrics:
+            if name in state["stats"]:
+                summary.stats[name] = RunningStats.from_state(state["stats"][name])
+                summary.sketches[name] = QuantileSketch.from_state(state["sketches"][name])
+        return summary
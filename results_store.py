@@ -0,0 +1,350 @@
+from __future__ import annotations
+import hashlib
+import json
+import math
+import sqlite3
+from typing import TYPE_CHECKING, Dict, Iterable, List
+from online_stats import QUANTILES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_PATH = "results.sqlite"
+# Columns the analysis scripts filter on, and the run cache key
+INDEXED_COLUMNS = ["strategy", "interval_result", "C",
+                   "V", "m", "k", "screen_interval", "result_length", "run_key"]
+# Keys per query, below the SQLite limit of bound parameters
+QUERY_SIZE = 500
+# model_version of the rows saved before it was a column, the MODEL_VERSION
+# of main.py since run keys were introduced
+UNVERSIONED = 1
+
+
+class ResultsStore:
+
+    def __init__(self, path: str = DEFAULT_PATH, batch_size: int = 1000):
+        """Append-only store of sweep results in a SQLite database.
+
+        Rows are buffered in memory and written in batches to one `results`
+        table, with an `axis` column holding the swept parameter (the old
+        output_<axis>.csv name). The database runs in WAL mode so readers
+        do not block the writer, but only one process should write: the
+        sweep runner keeps the store in the parent and workers return rows.
+
+        A `summaries` table holds the running aggregates of each sweep
+        point (see `add_summary`), written in the same transaction as the
+        rows they include.
+
+        Parameters
+        ----------
+        path : str, optional
+            Database file, by default "results.sqlite"
+        batch_size : int, optional
+            Number of buffered rows that triggers a flush, by default 1000
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.buffer: List[dict] = []
+        # Summaries waiting to be written, by (axis, point key)
+        self.summaries: Dict[tuple, tuple] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def columns(self) -> List[str]:
+        cursor = self.connection.execute("PRAGMA table_info(results)")
+        return [row[1] for row in cursor.fetchall()]
+
+    def add(self, axis: str, rows: List[dict]):
+        """Buffer result rows of one sweep axis, flushing full batches"""
+        for row in rows:
+            self.buffer.append({"axis": axis, **row})
+        if len(self.buffer) + len(self.summaries) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows and summaries in one transaction"""
+        if not self.buffer and not self.summaries:
+            return
+        if self.buffer:
+            self._ensure_columns(self.buffer)
+        names = list(dict.fromkeys(
+            name for row in self.buffer for name in row))
+        query = "INSERT INTO results ({}) VALUES ({})".format(
+            ", ".join(_quote(name) for name in names), ", ".join("?" * len(names)))
+        with self.connection:
+            if self.buffer:
+                self.connection.executemany(
+                    query, [[_to_sql(row.get(name)) for name in names] for row in self.buffer])
+            if self.summaries:
+                self._write_summaries()
+        self.buffer = []
+        self.summaries = {}
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def _ensure_columns(self, rows: List[dict]):
+        """Create the results table and its indexes or add new columns"""
+        columns = self.columns
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        with self.connection:
+            if not columns:
+                self.connection.execute("CREATE TABLE results ({})".format(
+                    ", ".join(_quote(name) for name in names)))
+                for name in ["axis"] + [name for name in INDEXED_COLUMNS if name in names]:
+                    self.connection.execute("CREATE INDEX {} ON results (axis, {})".format(
+                        _quote(f"idx_{name}"), _quote(name)))
+                return
+            for name in names:
+                if name not in columns:
+                    self.connection.execute(
+                        "ALTER TABLE results ADD COLUMN {}".format(_quote(name)))
+                    if name in INDEXED_COLUMNS:
+                        self.connection.execute("CREATE INDEX {} ON results (axis, {})".format(
+                            _quote(f"idx_{name}"), _quote(name)))
+
+    def _ensure_summary_tables(self):
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (axis, value, point_key, metric, runs, count, "
+            "mean, variance, std_error, min, max, {}, PRIMARY KEY (axis, point_key, metric))".format(
+                ", ".join(column for column, _ in QUANTILES)))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS summary_states (axis, point_key, state, "
+            "PRIMARY KEY (axis, point_key))")
+
+    def _write_summaries(self):
+        self._ensure_summary_tables()
+        columns = ["axis", "value", "point_key", "metric", "runs", "count", "mean", "variance",
+                   "std_error", "min", "max"] + [column for column, _ in QUANTILES]
+        query = "INSERT OR REPLACE INTO summaries ({}) VALUES ({})".format(
+            ", ".join(columns), ", ".join("?" * len(columns)))
+        rows, states = [], []
+        for (axis, point_key), (value, report, state) in self.summaries.items():
+            for metric in report:
+                row = {"axis": axis, "value": value, "point_key": point_key, **metric}
+                rows.append([_to_sql(_finite(row[column])) for column in columns])
+            states.append((axis, point_key, json.dumps(state)))
+        self.connection.executemany(query, rows)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO summary_states VALUES (?, ?, ?)", states)
+
+    def add_summary(self, axis: str, value, point_key: str, report: List[dict], state: dict):
+        """Buffer the summary of a sweep point, replacing the one saved before.
+
+        Parameters
+        ----------
+        axis : str
+            Sweep axis of the point
+        value :
+            Value of the point on its axis, a number or a label
+        point_key : str
+            Key of the point (its run key without the seed)
+        report : List[dict]
+            One row per metric, with the columns of the summaries table
+            (see `PointSummary.report`)
+        state : dict
+            JSON friendly state the summary carries on from, see
+            `summary_state`
+        """
+        self.summaries[(axis, point_key)] = (value, report, state)
+        if len(self.buffer) + len(self.summaries) >= self.batch_size:
+            self.flush()
+
+    def summary_state(self, axis: str, point_key: str) -> dict:
+        """State saved with the last summary of a sweep point, None if there
+        is none"""
+        if (axis, point_key) in self.summaries:
+            return self.summaries[(axis, point_key)][2]
+        with self.connection:
+            self._ensure_summary_tables()
+        row = self.connection.execute(
+            "SELECT state FROM summary_states WHERE axis = ? AND point_key = ?",
+            (axis, point_key)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def read_summaries(self, axis: str = None, metric: str = None) -> pd.DataFrame:
+        """Read the summaries of the sweep points as a DataFrame, one row
+        per point and metric, optionally of one axis and one metric.
+
+        Rows are sorted by axis, value and metric, not in the order the
+        points were last updated in."""
+        import pandas as pd
+        self.flush()
+        with self.connection:
+            self._ensure_summary_tables()
+        clauses, values = [], []
+        for name, value in (("axis", axis), ("metric", metric)):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                values.append(value)
+        query = "SELECT * FROM summaries"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY axis, value, point_key, metric"
+        return pd.read_sql_query(query, self.connection, params=values)
+
+    def _select_keys(self, query: str, keys: List[str], values: list = ()) -> list:
+        """Run a query ending in "run_key IN" over `keys` in batches"""
+        self.flush()
+        if "run_key" not in self.columns:
+            return []
+        rows = []
+        for i in range(0, len(keys), QUERY_SIZE):
+            batch = keys[i:i + QUERY_SIZE]
+            cursor = self.connection.execute(
+                query + " ({})".format(", ".join("?" * len(batch))), [*values, *batch])
+            rows += cursor.fetchall()
+        return rows
+
+    def saved_keys(self, axis: str, keys: Iterable[str]) -> set:
+        """Run keys (see `run_key`) of `keys` already saved under a sweep axis"""
+        rows = self._select_keys(
+            "SELECT run_key FROM results WHERE axis = ? AND run_key IN", list(keys), [axis])
+        return {row[0] for row in rows}
+
+    def cached_rows(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Saved result row of each run key found, under any axis.
+
+        Rows are returned without the axis column and the columns they do
+        not have (NULL), ready to be added again under another axis.
+        """
+        self.flush()
+        columns = self.columns
+        rows = self._select_keys(
+            "SELECT * FROM results WHERE run_key IN", list(keys))
+        cached = {}
+        for values in rows:
+            row = {name: value for name, value in zip(columns, values)
+                   if value is not None and name != "axis"}
+            cached.setdefault(row["run_key"], row)
+        return cached
+
+    def gc(self, keep: Iterable[str] = None, version: int = None) -> int:
+        """Delete the stale rows and the summaries of their sweep points,
+        and return the number of rows deleted
+
+        Rows saved without a run key are stale, as are rows whose run key
+        is not in `keep` and, with `version`, rows whose model_version is
+        another one (UNVERSIONED for rows saved before it was recorded).
+        The next sweep of a point whose summary was deleted starts it
+        again from the rows left.
+        """
+        self.flush()
+        columns = self.columns
+        if not columns:
+            return 0
+        clauses, values = ["run_key IS NULL"], []
+        with self.connection:
+            if keep is not None:
+                self.connection.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS keep_keys (run_key TEXT PRIMARY KEY)")
+                self.connection.execute("DELETE FROM keep_keys")
+                self.connection.executemany("INSERT OR IGNORE INTO keep_keys VALUES (?)",
+                                            [(key,) for key in keep])
+                clauses.append("run_key NOT IN (SELECT run_key FROM keep_keys)")
+            if version is not None:
+                if "model_version" in columns:
+                    clauses.append("COALESCE(model_version, ?) != ?")
+                    values += [UNVERSIONED, version]
+                elif version != UNVERSIONED:
+                    clauses.append("1")
+            where = "1" if "run_key" not in columns else " OR ".join(clauses)
+            points = []
+            if "point_key" in columns:
+                points = self.connection.execute(
+                    "SELECT DISTINCT axis, point_key FROM results WHERE point_key IS NOT NULL "
+                    "AND ({})".format(where), values).fetchall()
+            cursor = self.connection.execute(
+                "DELETE FROM results WHERE {}".format(where), values)
+            if points:
+                self._ensure_summary_tables()
+                for table in ["summaries", "summary_states"]:
+                    self.connection.executemany(
+                        "DELETE FROM {} WHERE axis = ? AND point_key = ?".format(table), points)
+        self.connection.execute("VACUUM")
+        return cursor.rowcount
+
+    def read(self, axis: str = None, **filters) -> pd.DataFrame:
+        """Read results as a DataFrame
+
+        Parameters
+        ----------
+        axis : str, optional
+            Only rows of one sweep axis (e.g. "strategies"), by default all
+        **filters
+            Column equality filters, a list or tuple value matches any of
+            its items, e.g. read("k", strategy="NoStrategies", k=[0.1, 0.2])
+
+        Returns
+        -------
+        pd.DataFrame
+            matching rows without the axis column
+        """
+        import pandas as pd
+        self.flush()
+        columns = self.columns
+        if not columns:
+            return pd.DataFrame()
+        if axis is not None:
+            filters = {"axis": axis, **filters}
+        clauses = []
+        values = []
+        for name, value in filters.items():
+            if name not in columns:
+                raise ValueError(f"Unknown column {name}")
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            clauses.append("{} IN ({})".format(
+                _quote(name), ", ".join("?" * len(value))))
+            values += [_to_sql(item) for item in value]
+        query = "SELECT * FROM results"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        df = pd.read_sql_query(query, self.connection, params=values)
+        return df.drop(columns="axis")
+
+
+def run_key(**settings) -> str:
+    """Stable hash of the settings of a run (JSON values, or objects whose
+    str identifies them), the same in every process and Python session"""
+    text = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _quote(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _finite(value):
+    # NaN is stored as NULL by sqlite3, make it explicit
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _to_sql(value):
+    # NumPy scalars are not accepted by sqlite3
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def read_summaries(axis: str = None, metric: str = None, path: str = DEFAULT_PATH) -> pd.DataFrame:
+    """Shortcut for ResultsStore(path).read_summaries(axis, metric)"""
+    with ResultsStore(path) as store:
+        return store.read_summaries(axis, metric)
+
+
+def read_results(axis: str = None, path: str = DEFAULT_PATH, **filters) -> pd.DataFrame:
+    """Shortcut for ResultsStore(path).read(axis, **filters)"""
+    with ResultsStore(path) as store:
+        return store.read(axis, **filters)
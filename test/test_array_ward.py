@@ -0,0 +1,105 @@
+from agents_enviroments.array_ward import ArrayWard
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.patient import Patient
+from agents_enviroments.ward import Ward
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams
+import numpy as np
+import unittest
+
+
+def make_sequence(seed, time=60):
+    rng = np.random.default_rng(seed)
+    return [[(int(rng.random() < 0.2), rng.gamma(7)) for _ in range(rng.poisson(5))]
+            for _ in range(time)]
+
+
+def run(ward_cls, sequence, strategies):
+    # No transmission, certain healing and no isolation on admission so
+    # both wards follow the same deterministic path
+    params = Parameters(C=0, V=1, m=0.9, k=0.4, treatment_prob=1, isolation_prob=0,
+                        screen_interval=4, result_length=2)
+    ward = ward_cls([Bay() for _ in range(4)] +
+                    [IsolationBay() for _ in range(3)], params=params)
+    history = []
+    for day in sequence:
+        ward.remove_patients()
+        ward.screen_patients()
+        ward.get_patient_results()
+        ward.admit_patients([Patient(colonisation_status=col, length_stay=stay)
+                             for col, stay in day])
+        ward.generate_transmission()
+        ward.generate_treatment()
+        for strategy in strategies:
+            strategy.move_patients(ward)
+        history.append(ward.history_dict())
+        ward.forward_time()
+    return ward, history
+
+
+class TestArrayWard(unittest.TestCase):
+
+    def test_matches_ward(self):
+        sequence = make_sequence(3)
+        for strategies in [[], [GroupInfectedStrategy(), IsolateInfectedStrategy()]]:
+            ward, expected = run(Ward, sequence, strategies)
+            array_ward, history = run(ArrayWard, sequence, strategies)
+            self.assertEqual(history, expected)
+            self.assertEqual(array_ward.primary_cases, ward.primary_cases)
+            self.assertEqual([[p.length_stay for p in bay.patients] for bay in array_ward.bays],
+                             [[p.length_stay for p in bay.patients] for bay in ward.bays])
+
+    def test_matches_ward_distribution(self):
+        # With transmission, isolation on admission and uncertain healing,
+        # the two wards draw their random numbers in a different order (slot
+        # order against the order of the Ward counters), so seeded runs are
+        # not identical but the totals of a run have the same distribution
+        params = Parameters(C=0.6, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.3,
+                            screen_interval=3, result_length=2)
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        totals = {}
+        for ward_cls, options in ((Ward, {"transmission_mode": "hazard"}), (ArrayWard, {})):
+            runs = []
+            for seed in range(40):
+                ward = ward_cls([Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                                params=params, streams=RandomStreams(seed), **options)
+                records = [ward.step([Patient(colonisation_status=col, length_stay=stay)
+                                      for col, stay in day], strategies)
+                           for day in make_sequence(100 + seed)]
+                runs.append(np.sum(records, axis=0))
+            totals[ward_cls] = np.array(runs)
+        ward, array_ward = totals[Ward], totals[ArrayWard]
+        # Transmission, screening, detection and healing all happen
+        self.assertTrue((ward[:, 2:] > 0).all())
+        difference = np.abs(ward.mean(axis=0) - array_ward.mean(axis=0))
+        std_error = np.sqrt((ward.var(axis=0, ddof=1) + array_ward.var(axis=0, ddof=1)) / 40)
+        np.testing.assert_array_less(difference, 4 * std_error + 1e-9)
+
+    def test_patient_view(self):
+        array_ward, _ = run(ArrayWard, make_sequence(5, time=10), [])
+        patient = array_ward.patients[0]
+        patient.detection_status = 1
+        patient.result_time = None
+        self.assertEqual(array_ward.table.detection[patient.slot], 1)
+        self.assertEqual(patient.result_time, None)
+        self.assertIn(patient, patient.location.detected)
+        other_bay = array_ward.bays[-1]
+        bay = patient.location
+        bay.remove_patient(patient)
+        self.assertIsNone(patient.location)
+        other_bay.add_patient(patient)
+        self.assertIs(patient.location, other_bay)
+
+    def test_bays_not_attached(self):
+        params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=1, isolation_prob=0,
+                            screen_interval=4, result_length=2)
+        bays = [Bay() for _ in range(2)] + [IsolationBay()]
+        ArrayWard(bays, params=params)
+        self.assertEqual([bay.ward for bay in bays], [None] * 3)
+        ward = Ward(bays, params=params)
+        self.assertEqual([bay.ward for bay in bays], [ward] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+from agents_enviroments.batch import BatchSimulation
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy, \
+    MovementStrategy
+from agents_enviroments.patient import Patient
+from agents_enviroments.ward import Ward
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams
+import numpy as np
+import unittest
+
+
+def make_sequence(seed, time=60):
+    rng = np.random.default_rng(seed)
+    return [[Patient(colonisation_status=int(rng.random() < 0.2), length_stay=rng.gamma(7))
+             for _ in range(rng.poisson(5))] for _ in range(time)]
+
+
+def make_bays():
+    return [Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)]
+
+
+class TestBatchSimulation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.params = Parameters(C=0, V=1, m=0.9, k=0.4, treatment_prob=1, isolation_prob=0,
+                                 screen_interval=4, result_length=2)
+
+    def test_matches_ward(self):
+        # Without transmission, healing failures or isolation on admission
+        # every replicate follows the same path as the object Ward
+        sequence = make_sequence(3)
+        simulation = BatchSimulation(make_bays(), self.params,
+                                     replicates=5, seed=1)
+        results = simulation.run(sequence)
+        ward = Ward(make_bays(), params=self.params)
+        screens = detections = healed = 0
+        for patients in sequence:
+            ward.remove_patients()
+            ward.screen_patients()
+            ward.get_patient_results()
+            ward.admit_patients(patients=patients)
+            ward.generate_transmission()
+            ward.generate_treatment()
+            screens += len(ward.screened_patients)
+            detections += len(ward.new_detected_patients)
+            healed += len(ward.healed_patients)
+            ward.forward_time()
+        np.testing.assert_array_equal(
+            results["primary_cases"], ward.primary_cases)
+        np.testing.assert_array_equal(results["total_screens"], screens)
+        np.testing.assert_array_equal(
+            results["total_detection"], detections)
+        np.testing.assert_array_equal(results["total_healed"], healed)
+        np.testing.assert_array_equal(results["secondary_cases"], 0)
+
+    def test_matches_ward_distribution(self):
+        # With transmission, isolation and uncertain healing the replicates
+        # draw in bed order and the Ward in the order of its counters, so
+        # only the means over seeds agree
+        params = Parameters(C=0.6, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.3,
+                            screen_interval=3, result_length=2)
+        seeds = list(range(40))
+        strategies = [IsolateInfectedStrategy()]
+        results = BatchSimulation(make_bays(), params, strategies=strategies,
+                                  seed=seeds).run(make_sequence(13))
+        batch = np.stack([results[name] for name in
+                          ("secondary_cases", "total_screens", "total_detection", "total_healed")],
+                         axis=1)
+        runs = []
+        for seed in seeds:
+            ward = Ward(make_bays(), params=params, transmission_mode="hazard",
+                        streams=RandomStreams(seed))
+            # The Ward updates the patients it admits, each run gets its own
+            records = np.sum([ward.step(patients, strategies)
+                              for patients in make_sequence(13)], axis=0)
+            runs.append(records[[2, 5, 4, 6]])
+        runs = np.array(runs)
+        self.assertTrue((batch > 0).all())
+        difference = np.abs(batch.mean(axis=0) - runs.mean(axis=0))
+        std_error = np.sqrt((batch.var(axis=0, ddof=1) + runs.var(axis=0, ddof=1)) / len(seeds))
+        np.testing.assert_array_less(difference, 4 * std_error + 1e-9)
+
+    def test_unbatched_strategy_rejected(self):
+        class Unbatched(MovementStrategy):
+            def move_patients(self, ward):
+                pass
+
+        with self.assertRaises(TypeError):
+            BatchSimulation(make_bays(), self.params, strategies=[Unbatched()])
+
+    def test_strategies(self):
+        params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0,
+                            screen_interval=4, result_length=2)
+        group = BatchSimulation(make_bays(), params, replicates=8, seed=7,
+                                strategies=[GroupInfectedStrategy()])
+        both = BatchSimulation(make_bays(), params, replicates=8, seed=7,
+                               strategies=[GroupInfectedStrategy(), IsolateInfectedStrategy()])
+        for patients in make_sequence(5):
+            group.step(patients)
+            both.step(patients)
+            for simulation in (group, both):
+                self.assertTrue(
+                    (simulation.bay_counts(simulation.occupied) <= simulation.bay_capacity).all())
+            # Detected patients fill the general bays one after another
+            detected = group.bay_counts(
+                group.occupied & (group.detection == 1))[:, :4]
+            partial = (detected > 0) & (detected < group.bay_capacity[:4])
+            self.assertTrue((partial.sum(axis=1) <= 1).all())
+        self.assertGreater(both.results["total_detection"].sum(), 0)
+
+    def test_reproducible(self):
+        params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.9, isolation_prob=0.1,
+                            screen_interval=4, result_length=2)
+        sequence = make_sequence(11)
+        first = BatchSimulation(make_bays(), params, seed=[3, 4, 5]).run(sequence)
+        second = BatchSimulation(make_bays(), params, seed=[3, 4, 5]).run(sequence)
+        np.testing.assert_array_equal(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
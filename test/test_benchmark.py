@@ -0,0 +1,39 @@
+from benchmark import HEAVY_IMPORTS, IMPORT_BUDGETS, PHASES, compare, import_time, run_benchmarks
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        results = run_benchmarks(repeats=2, quick=True, pattern="16_bays")
+        names = {f"ward/16_bays/load_1/{phase}" for phase in PHASES}
+        self.assertLessEqual(names, set(results["benchmarks"]))
+        # Strategies that moved patients are also timed per move
+        self.assertLessEqual(set(results["benchmarks"]) - names,
+                             {f"ward/16_bays/load_1/{strategy}/per_move"
+                              for strategy in ("GroupInfectedStrategy", "IsolateInfectedStrategy")})
+        for result in results["benchmarks"].values():
+            self.assertEqual(result["repeats"], 2)
+            self.assertLessEqual(result["min"], result["median"])
+        self.assertEqual(results["meta"]["transmission_mode"], "pairwise")
+
+    def test_compare(self):
+        baseline = {"benchmarks": {"a": {"median": 1.0}, "b": {"median": 1.0},
+                                   "c": {"median": 1.0}, "d": {"median": 1.0}}}
+        new = {"benchmarks": {"a": {"median": 1.05}, "b": {"median": 1.5},
+                              "c": {"median": 0.5}}}
+        rows = compare(baseline, new, threshold=0.1)
+        self.assertEqual([(row[0], row[4]) for row in rows],
+                         [("a", ""), ("b", "regression"), ("c", "improvement")])
+
+    def test_imports(self):
+        # Workers import these modules, plotting and analysis stay out of them
+        for module in IMPORT_BUDGETS:
+            seconds, modules = import_time(module)
+            self.assertGreater(seconds, 0)
+            self.assertIn("numpy", modules)
+            self.assertEqual([name for name in modules if name.split(".")[0] in HEAVY_IMPORTS], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+from agents_enviroments.continuous_ward import ContinuousWard
+from agents_enviroments.sum_tree import SumTree
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.patient import Patient
+from agents_enviroments.ward import bay_hazard
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams
+import numpy as np
+import unittest
+
+
+def make_sequence(seed, time=60):
+    rng = np.random.default_rng(seed)
+    return [[Patient(colonisation_status=int(rng.random() < 0.2), length_stay=rng.gamma(7))
+             for _ in range(rng.poisson(5))] for _ in range(time)]
+
+
+def make_bays():
+    return [Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)]
+
+
+class TestSumTree(unittest.TestCase):
+
+    def test_find(self):
+        tree = SumTree(5)
+        for index, weight in enumerate([1, 0, 2, 0, 3]):
+            tree[index] = weight
+        self.assertEqual(tree.total, 6)
+        self.assertEqual([tree.find(u) for u in [0, 0.99, 1, 2.99, 3, 5.99]],
+                         [0, 0, 2, 2, 4, 4])
+        tree[4] = 0
+        self.assertEqual(tree.total, 3)
+        self.assertEqual(tree.find(2.999), 2)
+
+
+class TestContinuousWard(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.1,
+                                 screen_interval=4, result_length=2)
+
+    def test_rates_match_hazard(self):
+        ward = ContinuousWard(make_bays(), self.params)
+        ward.run(make_sequence(1, time=10))
+        n_bay = np.array([bay.num_of_patients for bay in ward.bays])
+        colonised = np.array([bay.num_of_colonised for bay in ward.bays])
+        detected = np.array([bay.num_of_decolonising for bay in ward.bays])
+        hazard = bay_hazard(self.params, n_bay, colonised - detected,
+                            detected, ward.total_patients)
+        self.assertAlmostEqual(sum(ward.rates()),
+                               ((n_bay - colonised) * hazard).sum())
+
+    def test_history_by_day(self):
+        sequence = make_sequence(2)
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        for method in ("ssa", "tau"):
+            ward = ContinuousWard(make_bays(), self.params, method=method,
+                                  tau_tol=0.5, streams=RandomStreams(3))
+            history = ward.run(make_sequence(2), strategies)
+            ward.check_counters()
+            self.assertEqual(len(history.time), len(sequence))
+            self.assertEqual(history.new_infections.sum(),
+                             ward.secondary_cases)
+            self.assertGreater(history.screened.sum(), 0)
+            self.assertEqual(history.total[-1], ward.total_patients)
+            again = ContinuousWard(make_bays(), self.params, method=method,
+                                   tau_tol=0.5, streams=RandomStreams(3))
+            np.testing.assert_array_equal(
+                again.run(make_sequence(2), strategies).to_numpy(), history.to_numpy())
+
+    def test_no_transmission(self):
+        params = Parameters(C=0, V=1, m=0.9, k=0.4, treatment_prob=1, isolation_prob=0,
+                            screen_interval=4, result_length=2)
+        ward = ContinuousWard(make_bays(), params, streams=RandomStreams(1))
+        history = ward.run(make_sequence(4))
+        self.assertEqual(history.new_infections.sum(), 0)
+        self.assertGreater(history.removed.sum(), 0)
+        # Certain healing ends treatment TREATMENT_DAYS after detection
+        self.assertGreater(history.healed.sum(), 0)
+        self.assertEqual(history.healed[:7].sum(), 0)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            ContinuousWard(make_bays(), self.params, method="other")
+
+
+if __name__ == '__main__':
+    unittest.main()
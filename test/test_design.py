@@ -0,0 +1,106 @@
+from design import Choice, Design, IntRange, Uniform, evaluate, latin_hypercube, sobol, sobol_indices
+from results_store import ResultsStore
+import main
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_sobol_stratified(self):
+        points = sobol(64, 16, np.random.default_rng(0))
+        for column in points.T:
+            self.assertEqual(len(set((column * 64).astype(int))), 64)
+        # The first two dimensions fill every elementary box of volume 1 / 16
+        points = sobol(16, 2)
+        for bits in range(5):
+            boxes = {(int(x * 2 ** bits), int(y * 2 ** (4 - bits))) for x, y in points}
+            self.assertEqual(len(boxes), 16)
+
+    def test_sobol_first_points(self):
+        np.testing.assert_array_equal(sobol(4, 3), [[0, 0, 0], [0.5, 0.5, 0.5],
+                                                    [0.75, 0.25, 0.25], [0.25, 0.75, 0.75]])
+
+    def test_sobol_too_many_dimensions(self):
+        with self.assertRaises(ValueError):
+            sobol(8, 17)
+
+    def test_latin_hypercube_stratified(self):
+        points = latin_hypercube(50, 3, np.random.default_rng(0))
+        for column in points.T:
+            self.assertEqual(sorted((column * 50).astype(int)), list(range(50)))
+
+    def test_factors(self):
+        self.assertEqual(Uniform(1, 3)(0.5), 2)
+        self.assertEqual(IntRange(2, 5)(0.99), 5)
+        self.assertEqual(IntRange(2, 5)(0), 2)
+        self.assertEqual(Choice(["a", "b"])(1.0), "b")
+        with self.assertRaises(ValueError):
+            Uniform(1, 1)
+
+
+class TestSensitivity(unittest.TestCase):
+
+    def ishigami(self, method):
+        uniform = Uniform(-np.pi, np.pi)
+        design = Design({"x1": uniform, "x2": uniform, "x3": uniform}, method=method, seed=3)
+        points = design.saltelli(4096)
+        x = np.array([[point[name] for name in design.names] for point in points])
+        values = np.sin(x[:, 0]) + 7 * np.sin(x[:, 1]) ** 2 + \
+            0.1 * x[:, 2] ** 4 * np.sin(x[:, 0])
+        return sobol_indices(values, design.names)
+
+    def test_ishigami(self):
+        expected = {"x1": (0.314, 0.558), "x2": (0.442, 0.442), "x3": (0.0, 0.244)}
+        for method in ("sobol", "lhs"):
+            indices = self.ishigami(method)
+            for name, (first, total) in expected.items():
+                self.assertAlmostEqual(indices[name]["first"], first, delta=0.03)
+                self.assertAlmostEqual(indices[name]["total"], total, delta=0.03)
+
+    def test_saltelli_blocks(self):
+        design = Design({"C": Uniform(0.1, 1), "strategies": Choice([[], ["s"]])}, seed=0)
+        points = design.saltelli(8)
+        self.assertEqual(len(points), 8 * 4)
+        a, b, ab = points[:8], points[8:16], points[24:]
+        for i in range(8):
+            self.assertEqual(ab[i], {"C": a[i]["C"], "strategies": b[i]["strategies"]})
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_matches_run_and_uses_cache(self):
+        points = [{"C": 0.3, "interval_result": [5, 2]}, {"k": 0.4},
+                  {"C": 0.3, "interval_result": [5, 2]}]
+        means = evaluate(points, [0, 1], metric="secondary_cases", output=self.path)
+        rows = [main.run(seed, {"C": 0.3, "screen_interval": 5, "result_length": 2})
+                for seed in (0, 1)]
+        self.assertEqual(means[0], np.mean([row["secondary_cases"] for row in rows]))
+        self.assertEqual(means[0], means[2])
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.read("design")), 4)
+        # Every run is now in the store
+        again = evaluate(points, [0, 1], metric="secondary_cases", output=self.path)
+        np.testing.assert_array_equal(means, again)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.read("design")), 4)
+
+    def test_get_params_several_keys(self):
+        params, strategies = main.get_parameters(
+            {"interval_result": [3, 1], "C": 0.5, "treatment_prob": 0.5})
+        self.assertEqual((params.screen_interval, params.result_length), (3, 1))
+        self.assertEqual((params.C, params.treatment_prob, params.isolation_prob), (0.5, 0.5, 0.01))
+        self.assertEqual(strategies, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+from agents_enviroments.history import History
+import numpy as np
+import unittest
+
+
+class TestHistory(unittest.TestCase):
+
+    def day(self, i):
+        return {"new_patients": i, "colonized": 2 * i, "new_infections": 1, "screened_patients": 3,
+                "new_detected_patients": 0, "removed_patients": i, "healed_patients": 0, "total": 10 + i}
+
+    def test_record_and_grow(self):
+        history = History(horizon=2)
+        for i in range(5):
+            history.add_from_dict(self.day(i))
+        np.testing.assert_array_equal(history.time, np.arange(5))
+        np.testing.assert_array_equal(history.new_patients, np.arange(5))
+        np.testing.assert_array_equal(history.colonized, 2 * np.arange(5))
+        self.assertEqual(history.screened.sum(), 15)
+        self.assertEqual(list(history.to_frame()["total"]), [10, 11, 12, 13, 14])
+        # Columns are views of the recorded days
+        self.assertTrue(np.shares_memory(history.removed, history.data))
+
+    def test_add_and_reset(self):
+        history = History()
+        history.add("healed_patients", 4)
+        history.add_from_dict({"total": 3})
+        self.assertEqual(list(history.healed), [4])
+        self.assertEqual(list(history.total), [3])
+        with self.assertRaises(ValueError):
+            history.add("unknown", 1)
+        history.reset()
+        self.assertEqual(len(history.to_numpy()), 0)
+        # Separate histories do not share their time
+        self.assertEqual(len(History().time), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+from agents_enviroments.hospital import Hospital
+from agents_enviroments.patient_table import TRANSFER_DTYPE, decode_patients, encode_patients
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.patient import Patient
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams
+from agents_enviroments.ward import Ward
+from unittest import mock
+import numpy as np
+import unittest
+
+
+def make_sequence(seed, time=40):
+    rng = np.random.default_rng(seed)
+    return [[Patient(colonisation_status=int(rng.random() < 0.2), length_stay=rng.gamma(7))
+             for _ in range(rng.poisson(4))] for _ in range(time)]
+
+
+class TestHospital(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.1,
+                                 screen_interval=4, result_length=2)
+        self.transfer = np.array([[0, 0.05, 0.02],
+                                  [0.05, 0, 0.05],
+                                  [0.1, 0, 0]])
+
+    def make_hospital(self, workers=1, transfer=None):
+        wards = [Ward([Bay() for _ in range(3)] + [IsolationBay() for _ in range(2)],
+                      self.params, streams=RandomStreams(seed)) for seed in range(3)]
+        if transfer is None:
+            transfer = self.transfer
+        return Hospital(wards, transfer, [GroupInfectedStrategy(), IsolateInfectedStrategy()],
+                        workers=workers)
+
+    def test_encode_decode(self):
+        patient = Patient(colonisation_status=1, detection_status=2, length_stay=6.5)
+        patient.hidden_detection_status = 1
+        patient.result_time = 3
+        patient.time = 2
+        rows = encode_patients([patient], [1], source=0)
+        self.assertEqual(rows.dtype, TRANSFER_DTYPE)
+        copy, = decode_patients(rows)
+        self.assertNotEqual(copy.id, patient.id)
+        for attr in ("colonisation_status", "detection_status", "decolonisation_status",
+                     "hidden_detection_status", "time", "length_stay", "result_time",
+                     "treatment_time"):
+            self.assertEqual(getattr(copy, attr), getattr(patient, attr), attr)
+
+    def test_no_transfers(self):
+        sequences = [make_sequence(seed) for seed in range(3)]
+        hospital = self.make_hospital(transfer=np.zeros((3, 3)))
+        history = hospital.run(sequences)
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        for seed, ward_history in enumerate(hospital.histories):
+            ward = Ward([Bay() for _ in range(3)] + [IsolationBay() for _ in range(2)],
+                        self.params, streams=RandomStreams(seed))
+            for patients in make_sequence(seed):
+                expected = ward.step(patients, strategies)
+            self.assertEqual(tuple(ward_history.to_numpy()[-1])[1:], tuple(expected))
+        self.assertEqual(hospital.transfers.sum(), 0)
+        total = sum(ward_history.total for ward_history in hospital.histories)
+        np.testing.assert_array_equal(history.total, total)
+
+    def test_transfers(self):
+        sequences = [make_sequence(seed) for seed in range(3)]
+        hospital = self.make_hospital()
+        history = hospital.run(sequences)
+        self.assertGreater(hospital.transfers.sum(), 0)
+        self.assertEqual(np.trace(hospital.transfers), 0)
+        self.assertEqual(hospital.transfers[2, 1], 0)
+        for ward in hospital.wards:
+            ward.check_counters()
+        # Transfers are not new patients of the hospital
+        arrivals = sum(ward_history.new_patients.sum()
+                       for ward_history in hospital.histories)
+        transfers_in = hospital.transfers.sum() - hospital.blocked.sum() - \
+            len(hospital.in_transit)
+        self.assertEqual(history.new_patients.sum(), arrivals - transfers_in)
+        self.assertEqual(hospital.secondary_cases,
+                         sum(ward.secondary_cases for ward in hospital.wards))
+
+    def test_primary_cases(self):
+        # Hand count: arrivals (not transfers) colonised when admitted
+        params = Parameters(C=3, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.1,
+                            screen_interval=4, result_length=2)
+        wards = [Ward([Bay() for _ in range(3)] + [IsolationBay() for _ in range(2)],
+                      params, streams=RandomStreams(seed)) for seed in range(2)]
+        hospital = Hospital(wards, [[0, 0.3], [0.3, 0]])
+        sequences = [make_sequence(seed) for seed in range(2)]
+        arrivals = {patient.id for sequence in sequences for day in sequence for patient in day}
+        primary = []
+        admit_patient = Ward.admit_patient
+
+        def admit(ward, patient):
+            colonised = patient.colonisation_status == 1
+            admitted = admit_patient(ward, patient)
+            if admitted is not None and patient.id in arrivals:
+                primary.append(colonised)
+            return admitted
+
+        with mock.patch.object(Ward, "admit_patient", admit):
+            hospital.run(sequences)
+        self.assertGreater(hospital.transfers.sum(), 0)
+        self.assertGreater(hospital.secondary_cases, 0)
+        self.assertEqual(hospital.primary_cases, sum(primary))
+
+    def test_workers(self):
+        serial = self.make_hospital()
+        serial.run([make_sequence(seed) for seed in range(3)])
+        parallel = self.make_hospital(workers=2)
+        parallel.run([make_sequence(seed) for seed in range(3)])
+        np.testing.assert_array_equal(serial.history.to_numpy(),
+                                      parallel.history.to_numpy())
+        for serial_history, parallel_history in zip(serial.histories, parallel.histories):
+            np.testing.assert_array_equal(serial_history.to_numpy(),
+                                          parallel_history.to_numpy())
+        np.testing.assert_array_equal(serial.transfers, parallel.transfers)
+        self.assertEqual(serial.primary_cases, parallel.primary_cases)
+
+    def test_invalid_transfer(self):
+        with self.assertRaises(ValueError):
+            self.make_hospital(transfer=np.ones((2, 2)))
+        with self.assertRaises(ValueError):
+            self.make_hospital(transfer=np.full((3, 3), 0.6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
-from agents_enviroments.movement_strategy import change_patient_location
-from agents_enviroments.bay import Bay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy, change_patient_location
+from agents_enviroments.bay import Bay, IsolationBay
 from agents_enviroments.patient import Patient
 from agents_enviroments.ward import Ward
 from agents_enviroments.parameters import Parameters
@@ -37,6 +37,34 @@ class TestMovementStrategy(unittest.TestCase):
         self.assertFalse(any(check3))
         self.assertFalse(any(check4))
 
+    def test_group_infected(self):
+        params = Parameters(
+            C=0.3, V=1, m=0.4, k=0.4, treatment_prob=0.9, isolation_prob=0.01, screen_interval=4, result_length=2)
+        ward = Ward(bays=[Bay(), Bay(), Bay()], params=params, debug=True)
+        patients = [Patient(detection_status=int(i % 3 == 0)) for i in range(15)]
+        ward.admit_patients(patients)
+        ward.move_patients(GroupInfectedStrategy())
+        self.assertEqual(sorted(bay.num_of_detected for bay in ward.bays), [0, 0, 5])
+        # Patients are moved, not copied
+        self.assertEqual({patient.id for patient in ward.patients},
+                         {patient.id for patient in patients})
+        self.assertTrue(all(patient.location.get_patient(patient.id) is patient
+                            for patient in patients))
+
+    def test_isolate_infected(self):
+        params = Parameters(
+            C=0.3, V=1, m=0.4, k=0.4, treatment_prob=0.9, isolation_prob=0, screen_interval=4, result_length=2)
+        isobays = [IsolationBay() for _ in range(2)]
+        ward = Ward(bays=[Bay(), Bay()] + isobays, params=params, debug=True)
+        # Patients awaiting a result are isolated too
+        patients = [Patient(detection_status=status) for status in (0, 2, 0, 1, 1)]
+        ward.admit_patients(patients)
+        ward.move_patients(IsolateInfectedStrategy())
+        self.assertEqual([bay.patients for bay in isobays],
+                         [[patients[3]], [patients[1]]])
+        self.assertEqual(ward.isolation_candidates(), [patients[4]])
+        self.assertEqual(ward.free_isobays(), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,160 @@
+from online_stats import PointSummary, QuantileSketch, RunningStats
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+from results_store import ResultsStore
+import main
+import json
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        values = np.random.default_rng(0).gamma(2, size=101)
+        stats = RunningStats().update(values)
+        self.assertEqual(stats.count, 101)
+        self.assertAlmostEqual(stats.mean, values.mean())
+        self.assertAlmostEqual(stats.variance, values.var(ddof=1))
+        self.assertAlmostEqual(stats.half_width(0.95),
+                               1.959964 * values.std(ddof=1) / np.sqrt(101), places=5)
+
+    def test_merge(self):
+        values = np.random.default_rng(1).normal(size=50)
+        merged = RunningStats().update(values[:20]).merge(
+            RunningStats().update(values[20:]))
+        self.assertEqual(merged.count, 50)
+        self.assertAlmostEqual(merged.mean, values.mean())
+        self.assertAlmostEqual(merged.variance, values.var(ddof=1))
+        self.assertTrue(np.isnan(RunningStats().update([1.0]).variance))
+        self.assertEqual((merged.min, merged.max), (values.min(), values.max()))
+
+    def test_state(self):
+        stats = RunningStats().update([1.0, 4.0, 2.0])
+        copy = RunningStats.from_state(json.loads(json.dumps(stats.state())))
+        self.assertEqual(copy.to_dict(), stats.to_dict())
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_relative_error(self):
+        values = np.random.default_rng(2).lognormal(size=5000)
+        sketch = QuantileSketch(0.01).update(values)
+        for q in (0.05, 0.5, 0.95):
+            expected = np.quantile(values, q, method="lower")
+            self.assertLess(abs(sketch.quantile(q) - expected), 0.0101 * expected)
+
+    def test_merge_and_state(self):
+        values = np.random.default_rng(3).normal(size=1000)
+        sketch = QuantileSketch().update(values[:400]).merge(QuantileSketch().update(values[400:]))
+        whole = QuantileSketch().update(values)
+        self.assertEqual(sketch.state(), whole.state())
+        copy = QuantileSketch.from_state(json.loads(json.dumps(whole.state())))
+        self.assertEqual(copy.count, 1000)
+        self.assertEqual(copy.quantile(0.3), whole.quantile(0.3))
+        self.assertEqual(QuantileSketch().update([0, 0, 0, 5]).quantile(0.5), 0)
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))
+
+
+class TestPointSummary(unittest.TestCase):
+
+    def test_report_and_resume(self):
+        metrics = {"ratio": lambda row: row["a"] / row["b"] if row["b"] else None}
+        rows = [{"seed": seed, "a": seed, "b": seed % 3} for seed in range(30)]
+        summary = PointSummary(metrics).update(rows[:10])
+        resumed = PointSummary.from_state(json.loads(json.dumps(summary.state())), metrics)
+        resumed.update(rows)
+        report, = resumed.report()
+        ratios = [row["a"] / row["b"] for row in rows if row["b"]]
+        self.assertEqual((report["runs"], report["count"]), (30, 20))
+        self.assertAlmostEqual(report["mean"], np.mean(ratios))
+        self.assertEqual((report["min"], report["max"]), (min(ratios), max(ratios)))
+
+
+class TestAdaptiveSweep(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_stops_at_tolerance(self):
+        seeds = list(range(6))
+        loose, = main.adaptive_sweep({"k": [0.4]}, seeds, tolerance=1e9, chunk_size=2,
+                                     output=self.path)
+        self.assertEqual(loose["runs"], 2)
+        self.assertTrue(loose["converged"])
+        strict, = main.adaptive_sweep({"C": [0.3]}, seeds, tolerance=0, chunk_size=2,
+                                      output=self.path)
+        self.assertEqual(strict["runs"], 6)
+        self.assertFalse(strict["converged"])
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.read("k")), 2)
+            rows = store.read("C")
+        self.assertEqual(list(rows["seed"]), seeds)
+        ratio = rows["secondary_cases"] / rows["primary_cases"]
+        self.assertAlmostEqual(strict["mean"], ratio.mean())
+
+    def test_equal_points_run_once(self):
+        seeds = list(range(4))
+        submit = ProcessPoolExecutor.submit
+        with mock.patch.object(ProcessPoolExecutor, "submit", autospec=True,
+                               side_effect=submit) as submitted:
+            C, k = main.adaptive_sweep({"C": [0.3], "k": [0.4]}, seeds, tolerance=0,
+                                       chunk_size=2, output=self.path)
+        # Both are the default parameters, each seed is simulated once
+        self.assertEqual(sorted(seed for call in submitted.call_args_list
+                                for seed in call.args[3]), seeds)
+        self.assertEqual((C["runs"], C["mean"]), (k["runs"], k["mean"]))
+        with ResultsStore(self.path) as store:
+            self.assertEqual(list(store.read("C")["run_key"]),
+                             list(store.read("k")["run_key"]))
+
+
+class TestSweepSummaries(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_summaries_match_rows(self):
+        main.sweep({"k": [0.4, 0.8]}, seeds=[1, 2, 3], chunk_size=2, output=self.path)
+        with ResultsStore(self.path) as store:
+            rows = store.read("k")
+            summaries = store.read_summaries("k", "secondary_cases")
+        self.assertEqual(list(summaries["value"]), [0.4, 0.8])
+        self.assertEqual(list(summaries["runs"]), [3, 3])
+        means = rows.groupby("k")["secondary_cases"].mean()
+        np.testing.assert_allclose(summaries["mean"], means.values)
+        self.assertEqual(list(summaries["max"]), list(rows.groupby("k")["secondary_cases"].max()))
+        # Updating a point does not move it to the end
+        main.sweep({"k": [0.4]}, seeds=[4], output=self.path)
+        with ResultsStore(self.path) as store:
+            summaries = store.read_summaries("k", "secondary_cases")
+        self.assertEqual(list(summaries["value"]), [0.4, 0.8])
+        self.assertEqual(list(summaries["runs"]), [4, 3])
+
+    def test_summary_only(self):
+        mods = {"strategies": [[]], "interval_result": [[4, 2]]}
+        main.sweep(mods, seeds=[1, 2], chunk_size=1, output=self.path, keep_rows=False)
+        with ResultsStore(self.path) as store:
+            self.assertTrue(store.read().empty)
+            summaries = store.read_summaries(metric="total_screens")
+        self.assertEqual(list(summaries["value"]), ["4_2", "NoStrategies"])
+        # Both points are the default parameters, simulated once
+        self.assertEqual(summaries["mean"][0], summaries["mean"][1])
+        with mock.patch("main.run_chunk", side_effect=AssertionError("simulated again")):
+            main.sweep(mods, seeds=[2, 1], output=self.path, keep_rows=False)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(list(store.read_summaries(metric="total_screens")["runs"]), [2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
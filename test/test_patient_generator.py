@@ -0,0 +1,90 @@
+from agents_enviroments.patient import Arrivals, Patient, PatientGenerator
+import numpy as np
+import os
+import tempfile
+import unittest
+from unittest import mock
+import main
+
+
+class TestPatientGenerator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        np.random.seed(1)
+        self.generator = PatientGenerator()
+        self.generator.set_var(poisson_lambda=5, gamma_k=7, gamma_scale=1)
+
+    def test_generate_arrivals(self):
+        self.generator.set_col_length_dist(gamma_k=50, gamma_scale=1)
+        arrivals = self.generator.generate_arrivals(colonized_prob=0.3, time=200)
+        self.assertIsInstance(arrivals, Arrivals)
+        self.assertEqual(len(arrivals), 200)
+        self.assertEqual(arrivals.admissions.sum(), len(arrivals.colonisation))
+        self.assertAlmostEqual(arrivals.admissions.mean(), 5, delta=0.5)
+        colonised = arrivals.colonisation == 1
+        # Colonised patients use the longer length of stay distribution
+        self.assertGreater(arrivals.length_stay[colonised].mean(), 40)
+        self.assertLess(arrivals.length_stay[~colonised].mean(), 10)
+
+    def test_sequence_materialises_patients(self):
+        sequence = self.generator.generate_sequence(colonized_prob=0, time=30)
+        self.assertEqual(len(sequence), 30)
+        self.assertTrue(all(isinstance(patient, Patient)
+                        for patients in sequence for patient in patients))
+        self.assertEqual(list(self.generator.admission_dist),
+                         [len(patients) for patients in sequence])
+        # The distributions only describe the last sequence
+        self.generator.generate_sequence(colonized_prob=0, time=10)
+        self.assertEqual(len(self.generator.admission_dist), 10)
+
+    def test_arrivals_are_reusable(self):
+        arrivals = self.generator.generate_arrivals(colonized_prob=0.5, time=10)
+        first, second = arrivals.to_patients(), arrivals.to_patients()
+        self.assertEqual([[p.length_stay for p in day] for day in first],
+                         [[p.length_stay for p in day] for day in second])
+        self.assertIsNot(sum(first, [])[0], sum(second, [])[0])
+
+    def test_save_load(self):
+        arrivals = self.generator.generate_arrivals(colonized_prob=0.5, time=10)
+        with tempfile.TemporaryDirectory() as directory:
+            arrivals.save(directory)
+            loaded = Arrivals.load(directory)
+            self.assertIsInstance(loaded.length_stay, np.memmap)
+            self.assertFalse(loaded.length_stay.flags.writeable)
+            for name in ("offsets", "colonisation", "length_stay"):
+                np.testing.assert_array_equal(getattr(loaded, name),
+                                              getattr(arrivals, name))
+            self.assertEqual([p.length_stay for p in loaded.patients(3)],
+                             [p.length_stay for p in arrivals.patients(3)])
+            del loaded
+
+
+class TestArrivalsCache(unittest.TestCase):
+
+    def test_generated_once(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(main._arrivals, clear=True):
+            arrivals = main.get_arrivals(3, cache_dir=directory)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            np.testing.assert_array_equal(arrivals.length_stay,
+                                          main.generate_arrivals(3).length_stay)
+            self.assertIs(main.get_arrivals(3, cache_dir=directory), arrivals)
+            main._arrivals.clear()
+            with mock.patch("main.generate_arrivals") as generate:
+                loaded = main.get_arrivals(3, cache_dir=directory)
+            generate.assert_not_called()
+            np.testing.assert_array_equal(loaded.offsets, arrivals.offsets)
+            main.get_arrivals(4, cache_dir=directory)
+            self.assertEqual(len(os.listdir(directory)), 2)
+            # A new format version generates the sequences again
+            with mock.patch("main.ARRIVALS_VERSION", main.ARRIVALS_VERSION + 1), \
+                    mock.patch("main.generate_arrivals", wraps=main.generate_arrivals) as generate:
+                main.get_arrivals(3, cache_dir=directory)
+            generate.assert_called_once_with(3)
+            self.assertEqual(len(os.listdir(directory)), 3)
+            main._arrivals.clear()
+            del arrivals, loaded
+
+
+if __name__ == '__main__':
+    unittest.main()
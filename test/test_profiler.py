@@ -0,0 +1,83 @@
+from agents_enviroments.profiler import Profiler, profile_phase
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.patient import Patient
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.random_streams import RandomStreams, UniformBuffer
+from agents_enviroments.ward import Ward
+import numpy as np
+import unittest
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_nested_phases(self):
+        profiler = Profiler()
+        for _ in range(2):
+            with profiler.phase("run"):
+                with profiler.phase("step"):
+                    profiler.count("pairs", 3)
+        with profile_phase(None, "nothing"):
+            pass
+        self.assertEqual(dict(profiler.calls), {"run;step": 2, "run": 2})
+        self.assertEqual(profiler.counters["pairs"], 6)
+        own = profiler.self_times()
+        self.assertAlmostEqual(own["run"] + own["run;step"],
+                               profiler.times["run"])
+        lines = profiler.collapsed().splitlines()
+        self.assertEqual([line.split()[0] for line in lines],
+                         ["run", "run;step"])
+
+    def test_merge(self):
+        profiler = Profiler()
+        with profiler.phase("run"):
+            profiler.count("pairs")
+        total = Profiler().merge(profiler.to_dict()).merge(profiler)
+        self.assertEqual(total.calls["run"], 2)
+        self.assertEqual(total.counters["pairs"], 2)
+        self.assertAlmostEqual(total.times["run"], 2 * profiler.times["run"])
+
+    def test_drawn(self):
+        buffer = UniformBuffer(np.random.default_rng(0), block_size=4)
+        buffer.next()
+        buffer.take(6)
+        buffer.next()
+        self.assertEqual(buffer.drawn, 8)
+
+
+class TestProfiledStep(unittest.TestCase):
+
+    def run_ward(self, profiler):
+        params = Parameters(
+            C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.2, screen_interval=4, result_length=2)
+        ward = Ward([Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                    params=params, streams=RandomStreams(9))
+        ward.profiler = profiler
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        rng = np.random.default_rng(4)
+        records = []
+        for _ in range(40):
+            patients = [Patient(colonisation_status=int(rng.random() < 0.2),
+                                length_stay=rng.gamma(7)) for _ in range(rng.poisson(5))]
+            records.append(ward.step(patients, strategies))
+        return ward, records
+
+    def test_same_records(self):
+        profiler = Profiler()
+        ward, records = self.run_ward(profiler)
+        _, expected = self.run_ward(None)
+        self.assertEqual(records, expected)
+        self.assertEqual(profiler.calls["step"], 40)
+        self.assertEqual(profiler.calls["step;GroupInfectedStrategy"], 40)
+        self.assertEqual(profiler.counters["admit_patients.patients"],
+                         sum(record.new_patients for record in records))
+        self.assertEqual(profiler.counters["generate_transmission.draws.transmission"],
+                         ward.streams.transmission.drawn)
+        # Each pair evaluated takes one draw, at most the susceptible x colonised bound
+        self.assertGreaterEqual(profiler.counters["generate_transmission.pairs_bound"],
+                                profiler.counters["generate_transmission.draws.transmission"])
+        self.assertGreater(profiler.counters["generate_transmission.draws.transmission"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
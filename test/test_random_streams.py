@@ -0,0 +1,56 @@
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.patient import PatientGenerator
+from agents_enviroments.random_streams import RandomStreams, UniformBuffer
+from agents_enviroments.ward import Ward
+import numpy as np
+import unittest
+
+
+def run_ward(seed):
+    params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.3,
+                        screen_interval=4, result_length=2)
+    generator = PatientGenerator(rng=RandomStreams(10).arrivals)
+    generator.set_var(poisson_lambda=5, gamma_k=7, gamma_scale=1)
+    ward = Ward([Bay(), Bay(), IsolationBay()], params, streams=RandomStreams(seed))
+    history = []
+    for patients in generator.generate_arrivals(colonized_prob=0.2, time=40):
+        ward.remove_patients()
+        ward.screen_patients()
+        ward.get_patient_results()
+        ward.admit_patients(patients)
+        ward.generate_transmission()
+        ward.generate_treatment()
+        history.append(ward.history_dict())
+        ward.forward_time()
+    return history
+
+
+class TestRandomStreams(unittest.TestCase):
+
+    def test_buffer_independent_of_block_size(self):
+        small = UniformBuffer(np.random.default_rng(5), block_size=3)
+        large = UniformBuffer(np.random.default_rng(5), block_size=1000)
+        values = [small.next(), *small.take(7), small.next(), *small.take(2)]
+        expected = [large.next(), *large.take(7), large.next(), *large.take(2)]
+        np.testing.assert_array_equal(values, expected)
+        np.testing.assert_array_equal(
+            values, np.random.default_rng(5).random(11))
+
+    def test_streams_are_independent(self):
+        streams = RandomStreams(3)
+        first = streams.transmission.take(5)
+        self.assertFalse(np.allclose(first, streams.treatment.take(5)))
+        np.testing.assert_array_equal(
+            first, RandomStreams(3).transmission.take(5))
+
+    def test_run_ignores_global_state(self):
+        np.random.seed(1)
+        first = run_ward(7)
+        np.random.seed(2)
+        self.assertEqual(first, run_ward(7))
+        self.assertNotEqual(first, run_ward(8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+from online_stats import PointSummary
+from results_store import ResultsStore, run_key
+from unittest import mock
+import main
+import os
+import tempfile
+import unittest
+
+
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_append_and_filter(self):
+        with ResultsStore(self.path, batch_size=3) as store:
+            rows = [{"secondary_cases": i, "strategy": "NoStrategies", "k": k, "seed": i}
+                    for i, k in enumerate([0.1, 0.2, 0.1, 0.3])]
+            store.add("k", rows[:2])
+            self.assertEqual(len(store.buffer), 2)
+            self.assertEqual(len(store.read()), 2)
+            store.add("k", rows[2:])
+            store.add("strategies", [{"secondary_cases": 9, "strategy": "GroupInfectedStrategy",
+                                      "k": 0.4, "seed": 0, "total_healed": 2}])
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.read()), 5)
+            self.assertEqual(list(store.read("k", k=0.1)["seed"]), [0, 2])
+            self.assertEqual(len(store.read("k", k=[0.2, 0.3])), 2)
+            strategies = store.read("strategies")
+            self.assertEqual(list(strategies["total_healed"]), [2])
+            with self.assertRaises(ValueError):
+                store.read(unknown=1)
+
+
+class TestRunCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_run_key(self):
+        self.assertEqual(run_key(seed=1, params={"C": 0.3, "k": 0.4}),
+                         run_key(params={"k": 0.4, "C": 0.3}, seed=1))
+        self.assertNotEqual(run_key(seed=1), run_key(seed=2))
+        self.assertEqual(main.get_run_key({"C": 0.3}, 5),
+                         main.get_run_key({"k": 0.4}, 5))
+        self.assertNotEqual(main.get_run_key({"C": 0.3}, 5),
+                            main.get_run_key({"C": 0.3}, 5, batch=True))
+
+    def test_keys_and_gc(self):
+        with ResultsStore(self.path) as store:
+            self.assertEqual(store.cached_rows(["a"]), {})
+            store.add("k", [{"seed": 1, "k": 0.1, "run_key": "a"},
+                            {"seed": 2, "k": 0.1, "run_key": "b"}])
+            store.add("C", [{"seed": 1, "C": 0.3, "run_key": "c"}])
+            self.assertEqual(store.saved_keys("k", ["a", "c", "d"]), {"a"})
+            self.assertEqual(store.cached_rows(["a", "c", "d"]),
+                             {"a": {"seed": 1, "k": 0.1, "run_key": "a"},
+                              "c": {"seed": 1, "C": 0.3, "run_key": "c"}})
+            self.assertEqual(store.gc(["a", "c"]), 1)
+            self.assertEqual(list(store.read()["run_key"]), ["a", "c"])
+
+    def test_gc_version(self):
+        with ResultsStore(self.path) as store:
+            store.add("k", [{"seed": 1, "run_key": "a"},
+                            {"seed": 2, "run_key": "b", "model_version": 2, "point_key": "p"},
+                            {"seed": 3, "run_key": "c", "model_version": 3, "point_key": "p"},
+                            {"seed": 4, "run_key": "d", "model_version": 3, "point_key": "q"}])
+            report = PointSummary({"m": lambda row: row["seed"]}).report()
+            store.add_summary("k", 0.1, "p", report, {"seeds": [2, 3]})
+            store.add_summary("k", 0.2, "q", report, {"seeds": [4]})
+            self.assertEqual(store.gc(version=3), 2)
+            self.assertEqual(list(store.read()["run_key"]), ["c", "d"])
+            # The summary of the point of "b" counted a deleted row
+            self.assertIsNone(store.summary_state("k", "p"))
+            self.assertEqual(store.summary_state("k", "q"), {"seeds": [4]})
+            self.assertEqual(list(store.read_summaries()["point_key"]), ["q"])
+
+    def test_sweep_skips_saved_runs(self):
+        mods = {"k": [0.4], "C": [0.3]}
+        main.sweep(mods, seeds=[1, 2], workers=1, chunk_size=1, output=self.path)
+        with ResultsStore(self.path) as store:
+            results = store.read()
+            k, C = store.read("k"), store.read("C")
+        self.assertEqual(len(results), 4)
+        self.assertEqual(list(k["secondary_cases"]), list(C["secondary_cases"]))
+        with mock.patch("main.run_chunk", side_effect=AssertionError("simulated again")):
+            main.sweep(mods, seeds=[1, 2], workers=1, output=self.path)
+            main.sweep({"V": [1.0]}, seeds=[2, 1], workers=1, output=self.path)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(list(store.read("V")["seed"]), [2, 1])
+            self.assertEqual(len(store.read()), 6)
+        # All the runs are of the current model version
+        self.assertEqual(main.gc(output=self.path), 0)
+        self.assertEqual(main.get_sweep_keys({"k": [0.4]}, []), [])
+        # Rows are kept by run key, whatever their axis
+        keep = main.get_sweep_keys({"k": [0.4]}, seeds=[1])
+        self.assertEqual(main.gc(keep, output=self.path), 3)
+        self.assertEqual(main.gc(keep, output=self.path), 0)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.read_summaries()), 0)
+        # The summary starts again from the rows left
+        main.sweep({"k": [0.4]}, seeds=[1], workers=1, output=self.path)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(set(store.read_summaries()["runs"]), {1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.patient import Patient
+from agents_enviroments.ward import Ward
+from agents_enviroments.array_ward import ArrayWard
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.random_streams import RandomStreams
+from agents_enviroments.parameters import Parameters
+from agents_enviroments.snapshot import WardSnapshot
+import main
+import numpy as np
+import pickle
+import unittest
+
+
+class TestWardSnapshot(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.params = Parameters(
+            C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.2, screen_interval=4, result_length=2)
+        self.strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        rng = np.random.default_rng(4)
+        self.sequence = [[(int(rng.random() < 0.2), rng.gamma(7)) for _ in range(rng.poisson(5))]
+                         for _ in range(60)]
+
+    def make_ward(self, transmission_mode: str) -> Ward:
+        ward = Ward([Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                    params=self.params, transmission_mode=transmission_mode,
+                    streams=RandomStreams(9))
+        self.run_days(ward, self.sequence[:30])
+        return ward
+
+    def run_days(self, ward: Ward, days) -> list:
+        return [ward.step([Patient(colonisation_status=c, length_stay=ls) for c, ls in day],
+                          self.strategies) for day in days]
+
+    def test_restore_continues_run(self):
+        for transmission_mode in ("pairwise", "hazard"):
+            ward = self.make_ward(transmission_mode)
+            snapshot = pickle.loads(pickle.dumps(WardSnapshot(ward)))
+            restored = snapshot.restore()
+            self.assertEqual(restored.time, ward.time)
+            records = [self.run_days(run_ward, self.sequence[30:])
+                       for run_ward in (ward, restored)]
+            restored.check_counters()
+            self.assertEqual(*records)
+            self.assertEqual(ward.secondary_cases, restored.secondary_cases)
+
+    def test_branches_are_independent(self):
+        snapshot = WardSnapshot(self.make_ward("pairwise"))
+        first, second = snapshot.restore(), snapshot.restore()
+        self.run_days(first, self.sequence[30:])
+        self.assertEqual(self.run_days(second, self.sequence[30:]),
+                         self.run_days(snapshot.restore(), self.sequence[30:]))
+        self.assertEqual(snapshot.restore(streams=RandomStreams(1)).streams.seed.entropy, 1)
+
+    def test_new_params(self):
+        snapshot = WardSnapshot(self.make_ward("pairwise"))
+        params = Parameters(**{**self.params.__dict__, "screen_interval": 2})
+        ward = snapshot.restore(params)
+        self.assertIs(ward.params, params)
+        self.run_days(ward, self.sequence[30:])
+        ward.check_counters()
+
+    def test_export_state(self):
+        ward = self.make_ward("pairwise")
+        state = ward.export_state()
+        restored = Ward.from_state(pickle.loads(pickle.dumps(state)))
+        restored.check_counters()
+        again = restored.export_state()
+        np.testing.assert_array_equal(again["patients"], state["patients"])
+        for name, order in state["orders"].items():
+            np.testing.assert_array_equal(again["orders"][name], order)
+        self.assertIsNot(restored.bays[0], ward.bays[0])
+
+    def test_subclass_rejected(self):
+        ward = ArrayWard([Bay(), IsolationBay()], params=self.params)
+        with self.assertRaises(TypeError):
+            WardSnapshot(ward)
+
+
+class TestRunForked(unittest.TestCase):
+
+    def test_matches_run(self):
+        mods = [{}, {"strategies": [IsolateInfectedStrategy()]}, {"interval_result": [3, 1]}]
+        rows = main.run_forked(2, mods, days=30)
+        self.assertEqual([row["burn_in"] for row in rows], [30] * 3)
+        self.assertEqual([row["strategy"] for row in rows],
+                         ["NoStrategies", "IsolateInfectedStrategy", "NoStrategies"])
+        # Without a change the branch carries on the seed's run
+        snapshot = main.burn_in(2, 30)
+        row = main.run(2, {})
+        self.assertEqual(rows[0]["primary_cases"] + snapshot.primary_cases,
+                         row["primary_cases"])
+        self.assertEqual(rows[0]["secondary_cases"] + snapshot.secondary_cases,
+                         row["secondary_cases"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+from agents_enviroments.timing_wheel import TimingWheel
+import unittest
+
+
+class TestTimingWheel(unittest.TestCase):
+
+    def test_pop_by_day(self):
+        wheel = TimingWheel(size=4)
+        wheel.add(2, "a")
+        wheel.add(6, "b")
+        wheel.add(2, "c")
+        self.assertEqual(len(wheel), 3)
+        self.assertEqual(wheel.pop(1), [])
+        # "b" shares the bucket of day 2 but is due a round later
+        self.assertEqual(wheel.pop(2), ["a", "c"])
+        self.assertEqual(wheel.pop(6), ["b"])
+        self.assertEqual(len(wheel), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
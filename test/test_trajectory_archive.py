@@ -0,0 +1,78 @@
+from agents_enviroments.history import History
+from results_store import ResultsStore
+from trajectory_archive import METRICS, TrajectoryArchive, write_trajectory
+from unittest import mock
+import main
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestTrajectoryArchive(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "trajectories")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def history(self, value: int, days: int = 5) -> History:
+        history = History(horizon=days)
+        for day in range(days):
+            history.add_record([value + day] * len(METRICS))
+        return history
+
+    def test_reserve_write_commit(self):
+        archive = TrajectoryArchive(self.path, days=5)
+        rows = archive.reserve(["a", "b"])
+        self.assertEqual(rows, {"a": 0, "b": 1})
+        for key, row in rows.items():
+            write_trajectory(archive.data_path, row, self.history(10 * row))
+        archive.commit({"a": 0})
+        # The file grows and keeps the rows written so far
+        self.assertEqual(archive.reserve(["c", "d", "e"]), {"c": 2, "d": 3, "e": 4})
+        self.assertEqual(archive.shape, (5, 5, len(METRICS)))
+        reopened = TrajectoryArchive(self.path)
+        self.assertEqual((reopened.days, len(reopened)), (5, 1))
+        self.assertIn("a", reopened)
+        self.assertNotIn("b", reopened)
+        data = reopened.open()
+        self.assertIsInstance(data, np.memmap)
+        np.testing.assert_array_equal(data[1, :, 0], [10, 11, 12, 13, 14])
+        np.testing.assert_array_equal(reopened.trajectories(["a"], "colonized"), [[0, 1, 2, 3, 4]])
+        # Rows not committed are handed out again
+        self.assertEqual(reopened.reserve(["b"]), {"b": 1})
+        with self.assertRaises(ValueError):
+            TrajectoryArchive(self.path, days=6)
+        with self.assertRaises(ValueError):
+            TrajectoryArchive(os.path.join(self.directory.name, "missing"))
+
+    def test_sweep(self):
+        output = os.path.join(self.directory.name, "results.sqlite")
+        main.sweep({"k": [0.4]}, seeds=[1, 2], output=output)
+        # Saved runs are simulated again for their trajectory, not saved twice
+        main.sweep({"k": [0.4], "C": [0.6]}, seeds=[1, 2], chunk_size=1, output=output,
+                   trajectories=self.path)
+        with ResultsStore(output) as store:
+            rows = store.read()
+        self.assertEqual(len(rows), 4)
+        archive = TrajectoryArchive(self.path)
+        self.assertEqual(len(archive), 4)
+        history = History()
+        with mock.patch("main.History", return_value=history):
+            main.run(2, {"C": 0.6})
+        key = main.get_run_key({"C": 0.6}, 2)
+        expected = np.stack([history.to_numpy()[metric] for metric in METRICS], axis=1)
+        np.testing.assert_array_equal(archive.trajectories([key])[0], expected)
+        self.assertEqual(archive.trajectories([key], "new_infections").sum(),
+                         rows.set_index("run_key").loc[key, "secondary_cases"])
+        with mock.patch("main.run_chunk", side_effect=AssertionError("simulated again")):
+            main.sweep({"C": [0.6]}, seeds=[1, 2], output=output, trajectories=self.path)
+        with self.assertRaises(ValueError):
+            main.sweep({"C": [0.6]}, seeds=[1], batch=True, output=output, trajectories=self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
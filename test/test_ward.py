@@ -0,0 +1,263 @@
+from agents_enviroments.bay import Bay, IsolationBay
+from agents_enviroments.patient import Patient
+from agents_enviroments.ward import Ward, bay_hazard
+from agents_enviroments.movement_strategy import GroupInfectedStrategy, IsolateInfectedStrategy
+from agents_enviroments.random_streams import RandomStreams
+from agents_enviroments.array_ward import ArrayWard
+from agents_enviroments.history import History
+from agents_enviroments.parameters import Parameters
+from copy import deepcopy
+from unittest import mock
+import numpy as np
+import unittest
+
+
+class TestHazardTransmission(unittest.TestCase):
+
+    def setUp(self) -> None:
+        np.random.seed(42)
+        self.params = Parameters(
+            C=0.3, V=1, m=0.7, k=0.4, treatment_prob=0.9, isolation_prob=0.5, screen_interval=4, result_length=2)
+        self.ward = Ward(bays=[Bay(), Bay(), Bay(), IsolationBay()],
+                         params=self.params, transmission_mode="hazard")
+        patients = []
+        for i in range(16):
+            patient = Patient(colonisation_status=int(i % 3 == 0))
+            if i % 6 == 0:
+                patient.decolonisation_status = 1
+            patients.append(patient)
+        self.ward.admit_patients(patients)
+
+    def test_hazard_matches_pair_sum(self):
+        bays = self.ward.bays
+        n_bay = [bay.num_of_patients for bay in bays]
+        undetected = [sum(p.colonisation_status == 1 and p.decolonisation_status == 0
+                          for p in bay.patients) for bay in bays]
+        detected = [sum(p.colonisation_status == 1 and p.decolonisation_status == 1
+                        for p in bay.patients) for bay in bays]
+        hazard = bay_hazard(self.params, n_bay, undetected,
+                            detected, self.ward.total_patients)
+        for i, bay in enumerate(bays):
+            for suc_patient in bay.patients:
+                if suc_patient.colonisation_status:
+                    continue
+                pair_sum = sum(self.ward.transmission_prob(col_patient, suc_patient)
+                               for col_patient in self.ward.col_patients)
+                self.assertAlmostEqual(hazard[i], pair_sum)
+
+    def test_hazard_mode_counts_secondary_cases(self):
+        suceptible = len(self.ward.suc_patients)
+        self.ward.generate_transmission()
+        self.assertEqual(self.ward.secondary_cases,
+                         len(self.ward.new_infections))
+        self.assertEqual(len(self.ward.suc_patients),
+                         suceptible - len(self.ward.new_infections))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Ward(bays=[Bay()], params=self.params, transmission_mode="other")
+
+
+class TestCounters(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.params = Parameters(
+            C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.2, screen_interval=4, result_length=2)
+
+    def run_ward(self, transmission_mode):
+        # debug recounts every bay and the ward after each phase
+        ward = Ward(bays=[Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                    params=self.params, transmission_mode=transmission_mode,
+                    streams=RandomStreams(5), debug=True)
+        rng = np.random.default_rng(3)
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        for _ in range(60):
+            ward.remove_patients()
+            ward.screen_patients()
+            ward.get_patient_results()
+            ward.admit_patients([Patient(colonisation_status=int(rng.random() < 0.2),
+                                         length_stay=rng.gamma(7)) for _ in range(rng.poisson(5))])
+            ward.generate_transmission()
+            ward.generate_treatment()
+            for strategy in strategies:
+                ward.move_patients(strategy)
+            ward.forward_time()
+        return ward
+
+    def test_counters_match_recount(self):
+        for mode in ("pairwise", "hazard"):
+            ward = self.run_ward(mode)
+            self.assertGreater(ward.total_patients, 0)
+            self.assertGreater(ward.secondary_cases, 0)
+
+    def test_status_change_updates_counters(self):
+        bay = Bay()
+        ward = Ward(bays=[bay], params=self.params)
+        patient = Patient()
+        bay.add_patient(patient)
+        patient.colonisation_status = 1
+        patient.decolonisation_status = 1
+        self.assertEqual(ward.total_col_patients, 1)
+        self.assertEqual(bay.num_of_decolonising, 1)
+        self.assertEqual(ward.suc_patients, [])
+        bay.remove_patient(patient)
+        # A discharged patient no longer changes the counters
+        patient.detection_status = 1
+        self.assertEqual(bay.num_of_detected, 0)
+        self.assertEqual(ward.total_patients, 0)
+        ward.check_counters()
+
+    def test_discharge_drops_treatment(self):
+        params = Parameters(C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.05, isolation_prob=0.2,
+                            screen_interval=2, result_length=1)
+        ward = Ward(bays=[Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                    params=params, streams=RandomStreams(5))
+        rng = np.random.default_rng(3)
+        in_treatment = 0
+        for day in range(80):
+            # Arrivals stop after 30 days, everyone is discharged by the end
+            patients = [Patient(colonisation_status=int(rng.random() < 0.3),
+                                length_stay=rng.gamma(7)) for _ in range(rng.poisson(5) * (day < 30))]
+            ward.step(patients, [IsolateInfectedStrategy()])
+            in_treatment = max(in_treatment, len(ward._in_treatment))
+        self.assertGreater(in_treatment, 0)
+        self.assertEqual(ward.total_patients, 0)
+        self.assertEqual(ward._in_treatment, {})
+        self.assertEqual(ward._pending_treatment, {})
+
+    def test_unchanged_status_skips_counters(self):
+        bay = Bay()
+        Ward(bays=[bay], params=self.params)
+        patient = Patient()
+        bay.add_patient(patient)
+        with mock.patch.object(bay, "update_patient") as update:
+            # A failed infection draw and a write of the same value
+            self.assertIsNone(patient.infect_prob(0, RandomStreams(1).transmission))
+            patient.detection_status = 0
+            update.assert_not_called()
+            patient.infect_prob(1, RandomStreams(1).transmission)
+            update.assert_called_once()
+
+    def test_admission_order(self):
+        bays = [IsolationBay(), Bay(capacity=1), IsolationBay()]
+        self.params.isolation_prob = 1
+        ward = Ward(bays=bays, params=self.params, debug=True)
+        ward.admit_patients([Patient() for _ in range(4)])
+        self.assertEqual([bay.num_of_patients for bay in bays], [1, 1, 1])
+        self.params.isolation_prob = 0
+        ward = Ward(bays=bays[::-1], params=self.params, debug=True)
+        self.assertEqual(ward.free_isobays(), [])
+        for bay in bays:
+            bay.remove_patient(bay.patients[0])
+        ward.admit_patients([Patient() for _ in range(2)])
+        self.assertEqual([bay.num_of_patients for bay in bays], [0, 1, 0])
+        ward.check_counters()
+
+    def test_check_counters_detects_mismatch(self):
+        bay = Bay()
+        ward = Ward(bays=[bay], params=self.params)
+        bay.add_patient(Patient())
+        bay.num_of_detected = 1
+        with self.assertRaises(Exception):
+            ward.check_counters()
+
+
+class TestSchedule(unittest.TestCase):
+
+    def run_ward(self, ward, days=40):
+        rng = np.random.default_rng(7)
+        for _ in range(days):
+            ward.remove_patients()
+            ward.screen_patients()
+            ward.get_patient_results()
+            ward.admit_patients([Patient(colonisation_status=int(rng.random() < 0.3),
+                                         length_stay=rng.gamma(7)) for _ in range(rng.poisson(4))])
+            ward.generate_transmission()
+            ward.generate_treatment()
+            ward.forward_time()
+
+    def test_result_longer_than_interval(self):
+        params = Parameters(
+            C=0.3, V=1, m=0.9, k=0.4, treatment_prob=0.9, isolation_prob=0, screen_interval=3, result_length=5)
+        ward = Ward(bays=[Bay() for _ in range(4)], params=params,
+                    streams=RandomStreams(1), debug=True)
+        self.run_ward(ward)
+        self.assertGreater(ward.primary_cases, 0)
+        for patient in ward.patients:
+            if patient.detection_status == 2:
+                self.assertLessEqual(patient.result_time - patient.time, 5)
+
+    def test_patient_follows_ward_clock(self):
+        params = Parameters(
+            C=0, V=1, m=0.9, k=0.4, treatment_prob=0.9, isolation_prob=0, screen_interval=4, result_length=2)
+        ward = Ward(bays=[Bay()], params=params)
+        patient = Patient(length_stay=3.5)
+        patient.time = 1
+        ward.admit_patient(patient)
+        ward.forward_time()
+        self.assertEqual(patient.time, 2)
+        ward.remove_patients()
+        ward.forward_time()
+        ward.remove_patients()
+        # Discharged when int(length_stay - time) == 0
+        self.assertEqual(ward.patients_removed, [patient])
+        ward.forward_time()
+        self.assertEqual(patient.time, 3)
+
+
+class TestStep(unittest.TestCase):
+
+    def test_step_matches_phases(self):
+        params = Parameters(
+            C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.2, screen_interval=4, result_length=2)
+        for ward_cls in (Ward, ArrayWard):
+            histories = []
+            for fused in (False, True):
+                ward = ward_cls([Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                                params=params, streams=RandomStreams(9))
+                strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+                rng = np.random.default_rng(4)
+                history = History()
+                for _ in range(50):
+                    patients = [Patient(colonisation_status=int(rng.random() < 0.2),
+                                        length_stay=rng.gamma(7)) for _ in range(rng.poisson(5))]
+                    if fused:
+                        history.add_record(ward.step(patients, strategies))
+                        continue
+                    ward.remove_patients()
+                    ward.screen_patients()
+                    ward.get_patient_results()
+                    ward.admit_patients(patients)
+                    ward.generate_transmission()
+                    ward.generate_treatment()
+                    for strategy in strategies:
+                        strategy.move_patients(ward)
+                    history.add_from_dict(ward.history_dict())
+                    ward.forward_time()
+                histories.append(history.to_numpy())
+            np.testing.assert_array_equal(*histories)
+            self.assertGreater(histories[0]["new_infections"].sum(), 0)
+
+    def test_copy_continues_run(self):
+        params = Parameters(
+            C=0.5, V=1, m=0.9, k=0.4, treatment_prob=0.5, isolation_prob=0.2, screen_interval=4, result_length=2)
+        ward = Ward([Bay() for _ in range(4)] + [IsolationBay() for _ in range(3)],
+                    params=params, streams=RandomStreams(9))
+        strategies = [GroupInfectedStrategy(), IsolateInfectedStrategy()]
+        rng = np.random.default_rng(4)
+        sequence = [[(int(rng.random() < 0.2), rng.gamma(7)) for _ in range(rng.poisson(5))]
+                    for _ in range(40)]
+        for day in sequence[:20]:
+            ward.step([Patient(colonisation_status=c, length_stay=ls)
+                      for c, ls in day], strategies)
+        copy = deepcopy(ward)
+        records = []
+        for run_ward in (ward, copy):
+            records.append([run_ward.step([Patient(colonisation_status=c, length_stay=ls)
+                                           for c, ls in day], strategies) for day in sequence[20:]])
+            run_ward.check_counters()
+        self.assertEqual(*records)
+
+
+if __name__ == '__main__':
+    unittest.main()
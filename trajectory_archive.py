@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Dict, Iterable, List
+import numpy as np
+from agents_enviroments.history import HISTORY_KEYS, History
+
+DEFAULT_DIRECTORY = "trajectories"
+# History columns of a trajectory, in the order of its last axis
+METRICS = list(HISTORY_KEYS.values())
+DTYPE = np.int32
+DATA_FILE = "trajectories.npy"
+INDEX_FILE = "index.json"
+
+
+class TrajectoryArchive:
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, days: int = None):
+        """Daily History of many runs in one preallocated .npy file.
+
+        The data is a (runs, days, metrics) array of DTYPE, with the
+        History columns METRICS on the last axis. Rows are handed out by
+        the parent process (`reserve`) before the runs start, each worker
+        writes the history of its runs in place at their rows
+        (`write_trajectory`) through a memory map, and the parent records
+        the rows of the runs that came back in the index (`commit`), which
+        maps run keys (see `results_store.run_key`) to rows. A row that is
+        not in the index was never finished.
+
+        Readers open the data with `open` (a read-only memory map) and
+        slice it without loading the whole file.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Directory of the data and index files, by default
+            "trajectories"
+        days : int, optional
+            Days of a trajectory, needed to create an archive, an existing
+            one keeps its own
+        """
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                index = json.load(file)
+            if days is not None and days != index["days"]:
+                raise ValueError(f"Archive has {index['days']} days, got {days}")
+            if index["metrics"] != METRICS:
+                raise ValueError(f"Archive has metrics {index['metrics']}, expected {METRICS}")
+            self.days = index["days"]
+            self.rows: Dict[str, int] = index["rows"]
+            self.capacity = index["capacity"]
+        else:
+            if days is None:
+                raise ValueError(f"No archive in {directory}, days are needed to create one")
+            os.makedirs(directory, exist_ok=True)
+            self.days = days
+            self.rows = {}
+            self.capacity = 0
+        # Rows handed out by reserve, committed or not
+        self.next_row = max(self.rows.values(), default=-1) + 1
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def shape(self) -> tuple:
+        return self.capacity, self.days, len(METRICS)
+
+    def reserve(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Hand out a row to each run key, growing the file when it is full.
+
+        Only call it while no worker writes to the archive, growing
+        replaces the file.
+        """
+        keys = list(keys)
+        rows = {key: self.next_row + i for i, key in enumerate(keys)}
+        self.next_row += len(keys)
+        if self.next_row > self.capacity:
+            self._grow(max(self.next_row, 2 * self.capacity))
+        return rows
+
+    def _grow(self, capacity: int):
+        """Preallocate `capacity` rows, keeping the rows written so far"""
+        staging = self.data_path + ".tmp"
+        data = np.lib.format.open_memmap(staging, mode="w+", dtype=DTYPE,
+                                         shape=(capacity, self.days, len(METRICS)))
+        if self.capacity:
+            old = np.load(self.data_path, mmap_mode="r")
+            data[:len(old)] = old
+            del old
+        data.flush()
+        del data
+        os.replace(staging, self.data_path)
+        self.capacity = capacity
+        self._write_index()
+
+    def commit(self, rows: Dict[str, int]):
+        """Record the rows of finished runs in the index"""
+        self.rows.update(rows)
+        self._write_index()
+
+    def _write_index(self):
+        # Written aside and renamed so readers never see half an index
+        staging = self.index_path + ".tmp"
+        with open(staging, "w") as file:
+            json.dump({"days": self.days, "metrics": METRICS, "capacity": self.capacity,
+                       "rows": self.rows}, file)
+        os.replace(staging, self.index_path)
+
+    def open(self) -> np.ndarray:
+        """Read-only memory map of the (runs, days, metrics) data"""
+        return np.load(self.data_path, mmap_mode="r")
+
+    def trajectories(self, keys: List[str], metric: str = None) -> np.ndarray:
+        """Trajectories of some run keys, of one metric or of all of them"""
+        data = self.open()
+        rows = [self.rows[key] for key in keys]
+        if metric is None:
+            return np.asarray(data[rows])
+        return np.asarray(data[rows, :, METRICS.index(metric)])
+
+
+def write_trajectory(path: str, row: int, history: History):
+    """Write the recorded days of a run at its row of an archive data file
+    (runs inside the workers)"""
+    data = np.load(path, mmap_mode="r+")
+    days = min(history.current_time, data.shape[1])
+    values = history.to_numpy()[:days]
+    data[row, :days] = np.stack([values[metric] for metric in METRICS], axis=1)
+    data.flush()
+    del data